@@ -0,0 +1,62 @@
+"""
+Parse time, retained memory and dedup ratio of parsing with and without
+hash-consing of AST nodes, on a generated program and on one that repeats the
+same subexpressions the way generated scripts do.
+
+    python benchmarks/ast_interning_bench.py [statements]
+"""
+
+import sys
+import tracemalloc
+
+from bench_utils import best_of, generate_program
+from lexer import Lexer
+from tiny_parser import Parser
+
+
+def generate_repetitive_program(statements: int) -> str:
+    lines = []
+    for i in range(statements):
+        if i % 3 == 0:
+            lines.append(f"let v{i % 50} = x * 2 + 1 - (y * 2 + 1);")
+        elif i % 3 == 1:
+            lines.append('let config = {"retries": 3, "name": "generated"};')
+        else:
+            lines.append("let step = fn(x) { if (x < 10) { x * 2 + 1 } else { x } };")
+    return "\n".join(lines) + "\n"
+
+
+def measure(source: str, intern_nodes: bool) -> int:
+    tracemalloc.start()
+    program = Parser(Lexer(source), intern_nodes=intern_nodes).parse_program()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del program
+    return size
+
+
+if __name__ == "__main__":
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+    for name, source in (
+        ("generated", generate_program(statements)),
+        ("repetitive", generate_repetitive_program(statements)),
+    ):
+        parser = Parser(Lexer(source), intern_nodes=True)
+        parser.parse_program()
+        stats = parser.intern_table.stats()
+        print(
+            f"{name}: {len(source) / 1024:.0f} KiB, {stats['nodes']} nodes, "
+            f"{stats['unique']} unique ({stats['dedup_ratio']:.1f}x dedup)"
+        )
+
+        for intern_nodes in (False, True):
+            elapsed = best_of(
+                lambda: Parser(
+                    Lexer(source), intern_nodes=intern_nodes
+                ).parse_program(),
+                repeat=3,
+            )
+            size = measure(source, intern_nodes)
+            label = "interned" if intern_nodes else "plain"
+            print(f"  {label:>8}: {elapsed * 1000:8.2f} ms  {size / 1024:8.0f} KiB")
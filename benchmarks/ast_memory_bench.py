@@ -0,0 +1,113 @@
+"""
+Memory per node of parsed programs: slotted nodes holding an index into the
+program's position table, versus plain dataclass nodes holding their `Token`
+as the AST used to.
+
+    python benchmarks/ast_memory_bench.py [statements]
+"""
+
+import sys
+import tracemalloc
+from dataclasses import fields, make_dataclass
+from typing import Dict, List, Tuple
+
+from bench_utils import generate_program  # puts src on sys.path
+
+import abstract_syntaxt_tree as ast
+from lexer import Lexer, Token
+from tiny_parser import Parser
+
+NODE_CLASSES = [
+    ast.IntegerLiteral,
+    ast.BooleanLiteral,
+    ast.Identifier,
+    ast.StringLiteral,
+    ast.PrefixExpression,
+    ast.InfixExpression,
+    ast.LetStatement,
+    ast.ReturnStatement,
+    ast.BlockStatement,
+    ast.Function,
+    ast.CallExpression,
+    ast.IfExpression,
+    ast.HashLiteral,
+    ast.ArrayLiteral,
+    ast.IndexExpression,
+    ast.Program,
+]
+
+# The same nodes without slots, holding a token instead of a position.
+TOKEN_NODE_CLASSES = {
+    cls: make_dataclass(
+        cls.__name__,
+        [("token", Token)]
+        + [
+            (field.name, field.type)
+            for field in fields(cls)
+            if field.name not in ("position", "positions")
+        ],
+    )
+    for cls in NODE_CLASSES
+}
+
+
+def measure(build) -> Tuple[object, int]:
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def count_nodes(program: ast.Program) -> int:
+    count = 0
+    stack: List[object] = [program]
+    while stack:
+        node = stack.pop()
+        count += 1
+        for field in fields(node):
+            value = getattr(node, field.name)
+            if isinstance(value, ast.Node):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(value)
+            elif isinstance(value, dict):
+                for pair in value.items():
+                    stack.extend(pair)
+    return count
+
+
+def with_tokens(node: ast.Node, positions: ast.PositionTable) -> object:
+    cls = TOKEN_NODE_CLASSES[type(node)]
+    values: Dict[str, object] = {"token": positions.token(node.position)}
+    for field in fields(node):
+        if field.name in ("position", "positions"):
+            continue
+        value = getattr(node, field.name)
+        if isinstance(value, ast.Node):
+            value = with_tokens(value, positions)
+        elif isinstance(value, list):
+            value = [with_tokens(item, positions) for item in value]
+        elif isinstance(value, dict):
+            value = {
+                with_tokens(key, positions): with_tokens(item, positions)
+                for key, item in value.items()
+            }
+        values[field.name] = value
+    return cls(**values)
+
+
+if __name__ == "__main__":
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    source = generate_program(statements)
+
+    program, slotted_size = measure(lambda: Parser(Lexer(source)).parse_program())
+    count = count_nodes(program)
+    _, token_size = measure(lambda: with_tokens(program, program.positions))
+
+    print(f"source: {len(source) / 1024:.0f} KiB, {count} nodes")
+    print(f"  Token per node:  {token_size / count:6.1f} bytes/node")
+    print(
+        f"  position table:  {slotted_size / count:6.1f} bytes/node "
+        f"({token_size / slotted_size:.1f}x smaller)"
+    )
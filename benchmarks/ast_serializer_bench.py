@@ -0,0 +1,31 @@
+"""
+Time to get a program by loading its serialized form, with and without token
+positions, versus lexing and parsing the source.
+
+    python benchmarks/ast_serializer_bench.py [statements]
+"""
+
+import sys
+
+from bench_utils import best_of, generate_program  # puts src on sys.path
+from ast_serializer import dump, load
+from lexer import Lexer
+from tiny_parser import Parser
+
+if __name__ == "__main__":
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    source = generate_program(statements)
+    program = Parser(Lexer(source)).parse_program()
+    data = dump(program, source)
+    print(
+        f"source: {len(source) / 1024:.0f} KiB, serialized: {len(data) / 1024:.0f} KiB"
+    )
+
+    parse_time = best_of(lambda: Parser(Lexer(source)).parse_program(), repeat=3)
+    print(f"  lex + parse:          {parse_time * 1000:8.2f} ms")
+    for name, positions in (("load", False), ("load with positions", True)):
+        load_time = best_of(lambda: load(data, source, positions), repeat=3)
+        print(
+            f"  {name + ':':<21} {load_time * 1000:8.2f} ms"
+            f" ({parse_time / load_time:.1f}x)"
+        )
@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+from typing import Callable
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+
+def best_of(fn: Callable[[], object], repeat: int = 5) -> float:
+    """
+    Run `fn` `repeat` times and return the fastest wall-clock time in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def generate_program(statements: int) -> str:
+    """
+    Machine-generated looking program with `statements` top-level statements.
+    """
+    lines = []
+    for i in range(statements):
+        if i % 4 == 0:
+            lines.append(f"let value_{i} = {i} * 60 * 60 + (value_{i - 1} - 24);")
+        elif i % 4 == 1:
+            lines.append(f'let name_{i} = "generated string number {i}";')
+        elif i % 4 == 2:
+            lines.append(
+                f"let fn_{i} = fn(x, y) {{ if (x < y) {{ return x; }} else {{ y }} }};"
+            )
+        else:
+            lines.append(f"let table_{i} = [{i}, {i + 1}, value_{i - 3}] != {i};")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,60 @@
+"""
+Evaluation time of recursion-heavy programs with the tree-walking `Evaluator`
+and with the `ClosureCompiler`, on programs as parsed and resolved.
+
+    python benchmarks/closure_compiler_bench.py [n]
+"""
+
+import sys
+
+from bench_utils import best_of  # puts src on sys.path
+
+import eval
+from closure_compiler import ClosureCompiler
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment
+from resolver import resolve
+from tiny_parser import Parser
+
+PROGRAMS = {
+    "fib": """
+        let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };
+        fib({n});
+    """,
+    "sum": """
+        let sum = fn(n, acc) { if (n == 0) { return acc; } sum(n - 1, acc + n) };
+        let repeat = fn(k) { if (k > 0) { sum(400, 0); repeat(k - 1) } };
+        repeat({n} * 10);
+    """,
+    "ackermann": """
+        let ack = fn(m, n) {
+            if (m == 0) { return n + 1; }
+            if (n == 0) { return ack(m - 1, 1); }
+            ack(m - 1, ack(m, n - 1))
+        };
+        ack(2, {n} * 10);
+    """,
+}
+
+
+if __name__ == "__main__":
+    eval.DEBUG = False
+    sys.setrecursionlimit(100_000)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 18
+
+    for name, template in PROGRAMS.items():
+        source = template.replace("{n}", str(n))
+        print(name)
+        for label, program in (
+            ("as parsed", Parser(Lexer(source)).parse_program()),
+            ("resolved", resolve(Parser(Lexer(source)).parse_program())),
+        ):
+            walked = best_of(lambda: Evaluator().eval(program, Environment()), repeat=3)
+            compiled = best_of(
+                lambda: ClosureCompiler().eval(program, Environment()), repeat=3
+            )
+            print(
+                f"  {label:>9}: Evaluator {walked * 1000:8.2f} ms  "
+                f"ClosureCompiler {compiled * 1000:8.2f} ms ({walked / compiled:.1f}x)"
+            )
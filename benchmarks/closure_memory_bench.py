@@ -0,0 +1,66 @@
+"""
+Memory retained by long-lived callbacks and time to call them, with closures
+keeping the whole defining `Environment` and with resolved closures capturing
+only the cells of the variables they use.
+
+    python benchmarks/closure_memory_bench.py [callbacks]
+"""
+
+import sys
+import tracemalloc
+
+from bench_utils import best_of  # puts src on sys.path
+
+import eval
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment
+from resolver import resolve
+from tiny_parser import Parser
+
+UNUSED_LOCALS = 20
+
+
+def generate_callback_program(callbacks: int) -> str:
+    unused = " ".join(f"let unused{i} = n + {i};" for i in range(UNUSED_LOCALS))
+    lines = [
+        f"let make = fn(n) {{ {unused} let count = n * 2; fn(x) {{ x + count }} }};"
+    ]
+    lines.extend(f"let callback{i} = make({i});" for i in range(callbacks))
+    return "\n".join(lines) + "\n"
+
+
+def generate_calls(callbacks: int) -> str:
+    return "\n".join(f"callback{i}(1);" for i in range(callbacks)) + "\n"
+
+
+def measure(program, calls) -> tuple:
+    # Memory retained by the environment the callbacks live in.
+    tracemalloc.start()
+    env = Environment()
+    Evaluator().eval(program, env)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    elapsed = best_of(lambda: Evaluator().eval(calls, env), repeat=3)
+    return size, elapsed
+
+
+if __name__ == "__main__":
+    eval.DEBUG = False
+    callbacks = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+
+    source = generate_callback_program(callbacks)
+    calls = Parser(Lexer(generate_calls(callbacks))).parse_program()
+
+    program = Parser(Lexer(source)).parse_program()
+    env_size, env_time = measure(program, calls)
+    resolved_size, resolved_time = measure(resolve(program), calls)
+
+    print(f"{callbacks} callbacks, {UNUSED_LOCALS} unused locals each")
+    print(f"  whole Environment: {env_size / 1024:8.0f} KiB  {env_time * 1000:8.2f} ms")
+    print(
+        f"  captured cells:    {resolved_size / 1024:8.0f} KiB  "
+        f"{resolved_time * 1000:8.2f} ms "
+        f"({env_size / resolved_size:.1f}x smaller)"
+    )
@@ -0,0 +1,101 @@
+"""
+Cost of dispatching a node to its handler in `Evaluator.eval`, per node type,
+with the type-keyed table and with the chain of `isinstance` checks it
+replaced.
+
+    python benchmarks/dispatch_bench.py [evaluations]
+"""
+
+import sys
+import time
+
+from bench_utils import generate_program  # puts src on sys.path
+
+import abstract_syntaxt_tree as ast
+import eval
+import object as obj
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment
+from tiny_parser import Parser
+
+
+class IsinstanceChainEvaluator(Evaluator):
+    """
+    `Evaluator.eval` as it was, trying each node type in turn.
+    """
+
+    def eval(self, node, env, depth=0):
+        if isinstance(node, ast.Program):
+            return self.eval_program(node, env, depth)
+        if isinstance(node, ast.IntegerLiteral):
+            return self.eval_integer_literal(node, env, depth)
+        if isinstance(node, ast.BooleanLiteral):
+            return self.eval_boolean_literal(node, env, depth)
+        if isinstance(node, ast.StringLiteral):
+            return self.eval_string_literal(node, env, depth)
+        if isinstance(node, ast.PrefixExpression):
+            return self.eval_prefix_expression(node, env, depth)
+        if isinstance(node, ast.InfixExpression):
+            return self.eval_infix_expression(node, env, depth)
+        if isinstance(node, ast.IfExpression):
+            return self.eval_if_expression(node, env, depth)
+        if isinstance(node, ast.BlockStatement):
+            return self.eval_block_statement(node, env, depth)
+        if isinstance(node, ast.ReturnStatement):
+            return self.eval_return_statement(node, env, depth)
+        if isinstance(node, ast.LetStatement):
+            return self.eval_let_statement(node, env, depth)
+        if isinstance(node, ast.Identifier):
+            return self.eval_identifier(node, env, depth)
+        if isinstance(node, ast.Function):
+            return self.eval_function_literal(node, env, depth)
+        if isinstance(node, ast.CallExpression):
+            return self.eval_call_expression(node, env, depth)
+
+
+def noop(node: ast.Node, env: Environment, depth: int) -> obj.Object:
+    return obj.NULL
+
+
+def dispatch_time(evaluator: Evaluator, node: ast.Node, evaluations: int) -> float:
+    """
+    Seconds per evaluation spent dispatching `node`, with every handler
+    replaced by one that does nothing.
+    """
+    env = Environment()
+    evaluate = evaluator.eval
+    start = time.perf_counter()
+    for _ in range(evaluations):
+        evaluate(node, env)
+    return (time.perf_counter() - start) / evaluations
+
+
+def without_handlers(evaluator: Evaluator) -> Evaluator:
+    for name in set(Evaluator.handlers.values()):
+        setattr(evaluator, name, noop)
+    return evaluator
+
+
+if __name__ == "__main__":
+    eval.DEBUG = False
+    evaluations = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    program = Parser(Lexer(generate_program(8))).parse_program()
+    samples = {}
+    stack = [program]
+    while stack:
+        node = stack.pop()
+        samples.setdefault(type(node), node)
+        stack.extend(ast.CHILDREN[type(node)](node))
+    samples[ast.CallExpression] = Parser(Lexer("f(1)")).parse_program().statements[0]
+
+    chain = without_handlers(IsinstanceChainEvaluator())
+    table = without_handlers(Evaluator())
+    print(f"{'node':>18}  {'isinstance':>10}  {'table':>8}")
+    for node_type, node in sorted(samples.items(), key=lambda item: item[0].__name__):
+        before = dispatch_time(chain, node, evaluations)
+        after = dispatch_time(table, node, evaluations)
+        print(
+            f"{node_type.__name__:>18}  {before * 1e9:7.0f} ns  {after * 1e9:5.0f} ns"
+        )
@@ -0,0 +1,35 @@
+"""
+Latency of a one-line edit with `Document.edit` versus lexing and parsing the
+whole edited source again.
+
+    python benchmarks/incremental_bench.py [statements]
+"""
+
+import sys
+
+from bench_utils import best_of, generate_program
+from incremental import Document
+from lexer import Lexer
+from tiny_parser import Parser
+
+if __name__ == "__main__":
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    source = generate_program(statements)
+    document = Document(source)
+    offset = source.index(f"let value_{statements // 2 // 4 * 4} =")
+
+    def full():
+        Parser(Lexer(source)).parse_program()
+
+    def incremental():
+        # Change `let` to `lex` and back, keeping the document the same size.
+        document.edit(offset + 2, 1, "x")
+        document.edit(offset + 2, 1, "t")
+
+    print(
+        f"source: {len(document.statements)} statements, {len(source) / 1024:.0f} KiB"
+    )
+    full_time = best_of(full, repeat=3)
+    edit_time = best_of(incremental, repeat=10) / 2
+    print(f"  full parse: {full_time * 1000:8.2f} ms")
+    print(f"  edit:       {edit_time * 1000:8.2f} ms ({full_time / edit_time:.0f}x)")
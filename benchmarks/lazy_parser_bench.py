@@ -0,0 +1,55 @@
+"""
+Parse time of a large library of functions, parsing every function body up
+front versus lazily, and with a few of the lazy bodies used afterwards.
+
+    python benchmarks/lazy_parser_bench.py [functions]
+"""
+
+import sys
+
+from bench_utils import best_of
+from lexer import Lexer
+from tiny_parser import Parser
+
+
+def generate_library(functions: int) -> str:
+    lines = []
+    for i in range(functions):
+        lines.append(
+            f"let fn_{i} = fn(x, y) {{\n"
+            f"    let total = x * {i} + y / 2 - (x - y);\n"
+            f'    let items = [x, y, total, {{"key": {i}}}];\n'
+            f"    if (total > {i}) {{ return fn(z) {{ z + total }}; }}"
+            f" else {{ return items[0]; }}\n"
+            f"}};"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def parse_and_use(source: str, used: int):
+    program = Parser(Lexer(source), lazy_functions=True).parse_program()
+    for stmt in program.statements[:used]:
+        stmt.expr.body.statements
+
+
+if __name__ == "__main__":
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    source = generate_library(functions)
+    print(f"library: {functions} functions, {len(source) / 1024:.0f} KiB")
+
+    eager = best_of(lambda: Parser(Lexer(source)).parse_program(), repeat=3)
+    print(f"  eager:                  {eager * 1000:8.2f} ms")
+    for percent in (0, 5, 100):
+        used = functions * percent // 100
+        lazy = best_of(lambda: parse_and_use(source, used), repeat=3)
+        print(
+            f"  lazy, {percent:>3}% bodies used: {lazy * 1000:8.2f} ms"
+            f" ({eager / lazy:.1f}x)"
+        )
+    validate = best_of(
+        lambda: Parser(
+            Lexer(source), lazy_functions=True, validate=True
+        ).parse_program(),
+        repeat=3,
+    )
+    print(f"  lazy, validated:        {validate * 1000:8.2f} ms")
@@ -0,0 +1,35 @@
+"""
+Lexer throughput in tokens/sec.
+
+    python benchmarks/lexer_bench.py [statements]
+"""
+
+import sys
+
+from bench_utils import best_of, generate_program
+from lexer import CharLexer, Lexer, TokenType
+
+
+def drain(lexer_class) -> int:
+    lexer = lexer_class(source)
+    count = 0
+    while lexer.next_token().token_type != TokenType.Eof:
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    source = generate_program(statements)
+    tokens = drain(Lexer)
+
+    print(f"source: {len(source) / 1024:.0f} KiB, {tokens} tokens")
+    baseline = None
+    for lexer_class in (CharLexer, Lexer):
+        elapsed = best_of(lambda: drain(lexer_class), repeat=3)
+        rate = tokens / elapsed
+        baseline = baseline or rate
+        print(
+            f"{lexer_class.__name__:>10}: {elapsed:.3f}s "
+            f"{rate:,.0f} tokens/sec ({rate / baseline:.1f}x)"
+        )
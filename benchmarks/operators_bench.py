@@ -0,0 +1,131 @@
+"""
+Evaluation time of infix expressions, and of arithmetic-heavy programs, with
+`Evaluator`, whose infix operators are looked up in the `operators` table, and
+with the chain of operator string comparisons it replaced.
+
+    python benchmarks/operators_bench.py [n]
+"""
+
+import sys
+
+from bench_utils import best_of  # puts src on sys.path
+
+import eval
+import object as obj
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment
+from tiny_parser import Parser
+
+PROGRAMS = {
+    "arithmetic": """
+        let poly = fn(x) { 3 * x * x * x - 2 * x * x + 7 * x - 5 };
+        let loop = fn(i, acc) { if (i > 0) { loop(i - 1, acc + poly(i) - poly(i - 1)) } else { acc } };
+        loop({n}, 0);
+    """,
+    "comparisons": """
+        let clamp = fn(x) { if (x < 10) { 10 } else { if (x > 90) { 90 } else { x } } };
+        let loop = fn(i, acc) { if (i > 0) { loop(i - 1, acc + clamp(i) * 2 - clamp(100 - i)) } else { acc } };
+        loop({n}, 0);
+    """,
+    "strings": """
+        let loop = fn(i, s) { if (i > 0) { loop(i - 1, s + "a" + "b") } else { s == "" } };
+        loop({n}, "");
+    """,
+}
+
+
+class LadderEvaluator(Evaluator):
+    """
+    `Evaluator.eval_infix_expression` as it was, comparing the operator with
+    each one in turn on every evaluation.
+    """
+
+    def eval_infix_expression(self, infix_expr, env, depth):
+        left = self.eval(infix_expr.left_expr, env, depth + 1)
+        if isinstance(left, obj.ErrorObject):
+            return left
+        right = self.eval(infix_expr.right_expr, env, depth + 1)
+        if isinstance(right, obj.ErrorObject):
+            return right
+
+        if left.__class__.__name__ != right.__class__.__name__:
+            return obj.ErrorObject("type mismatch")
+
+        operator = infix_expr.operator
+        if operator == "+":
+            if isinstance(left, obj.IntegerObject):
+                return obj.IntegerObject(left.value + right.value)
+            elif isinstance(left, obj.StringObject):
+                return obj.StringObject(left.value + right.value)
+        elif operator == "-":
+            if isinstance(left, obj.IntegerObject):
+                return obj.IntegerObject(left.value - right.value)
+        elif operator == "/":
+            if isinstance(left, obj.IntegerObject):
+                return obj.IntegerObject(left.value / right.value)
+        elif operator == "*":
+            if isinstance(left, obj.IntegerObject):
+                return obj.IntegerObject(left.value * right.value)
+        elif operator == "==":
+            if (
+                isinstance(left, obj.IntegerObject)
+                or isinstance(left, obj.BooleanObject)
+                or isinstance(left, obj.StringObject)
+            ):
+                return obj.BooleanObject(left.value == right.value)
+        elif operator == "!=":
+            if (
+                isinstance(left, obj.IntegerObject)
+                or isinstance(left, obj.BooleanObject)
+                or isinstance(left, obj.StringObject)
+            ):
+                return obj.BooleanObject(left.value != right.value)
+        elif operator == "<":
+            if isinstance(left, obj.IntegerObject):
+                return obj.BooleanObject(left.value < right.value)
+        elif operator == ">":
+            if isinstance(left, obj.IntegerObject):
+                return obj.BooleanObject(left.value > right.value)
+        else:
+            return None
+        return obj.ErrorObject(f"unrecognized operator '{operator}'")
+
+
+def infix_time(evaluator: Evaluator, source: str, evaluations: int) -> float:
+    """
+    Seconds per evaluation of the infix expression `source`.
+    """
+    node = Parser(Lexer(source)).parse_program().statements[0]
+    env = Environment()
+    evaluate = evaluator.eval_infix_expression
+
+    def run():
+        for _ in range(evaluations):
+            evaluate(node, env, 0)
+
+    return best_of(run) / evaluations
+
+
+if __name__ == "__main__":
+    eval.DEBUG = False
+    sys.setrecursionlimit(100_000)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    for source in ("1 + 2", "1 - 2", "1 * 2", "1 == 2", "1 != 2", "1 < 2", "1 > 2"):
+        ladder = infix_time(LadderEvaluator(), source, n * 20)
+        table = infix_time(Evaluator(), source, n * 20)
+        print(
+            f"{source:>12}: ladder {ladder * 1e9:6.0f} ns  "
+            f"table {table * 1e9:6.0f} ns ({ladder / table:.2f}x)"
+        )
+
+    for name, template in PROGRAMS.items():
+        source = template.replace("{n}", str(n))
+        program = Parser(Lexer(source)).parse_program()
+        ladder = best_of(lambda: LadderEvaluator().eval(program, Environment()))
+        table = best_of(lambda: Evaluator().eval(program, Environment()))
+        print(
+            f"{name:>12}: ladder {ladder * 1000:8.2f} ms  "
+            f"table {table * 1000:8.2f} ms ({ladder / table:.2f}x)"
+        )
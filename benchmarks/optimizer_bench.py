@@ -0,0 +1,45 @@
+"""
+Evaluation time of a program with constant subexpressions, as parsed and after
+`optimize`, and the time `optimize` itself takes.
+
+    python benchmarks/optimizer_bench.py [statements]
+"""
+
+import sys
+
+from bench_utils import best_of  # puts src on sys.path
+
+import eval
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment
+from optimizer import optimize
+from tiny_parser import Parser
+
+
+def generate_constant_program(statements: int) -> str:
+    lines = []
+    for i in range(statements):
+        if i % 3 == 0:
+            lines.append(f"let seconds_{i} = {i} * 60 * 60 * 24 + -5;")
+        elif i % 3 == 1:
+            lines.append(f'let label_{i} = "item " + "number " + "{i}";')
+        else:
+            lines.append(
+                f"let flag_{i} = if (1 < 2) {{ (seconds_{i - 2} - 0) * 1 }} else {{ 0 }};"
+            )
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    eval.DEBUG = False
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    program = Parser(Lexer(generate_constant_program(statements))).parse_program()
+    optimized = optimize(program)
+
+    optimize_time = best_of(lambda: optimize(program), repeat=3)
+    plain = best_of(lambda: Evaluator().eval(program, Environment()), repeat=3)
+    folded = best_of(lambda: Evaluator().eval(optimized, Environment()), repeat=3)
+    print(f"optimize:            {optimize_time * 1000:8.2f} ms")
+    print(f"eval as parsed:      {plain * 1000:8.2f} ms")
+    print(f"eval optimized:      {folded * 1000:8.2f} ms ({plain / folded:.1f}x)")
@@ -0,0 +1,34 @@
+"""
+Parallel lexing throughput against the number of worker processes.
+
+    python benchmarks/parallel_lexer_bench.py [statements]
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from bench_utils import best_of, generate_program
+from lexer import TokenStream
+from parallel_lexer import lex_parallel
+
+if __name__ == "__main__":
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    source = generate_program(statements)
+    count = len(TokenStream.from_source(source))
+    print(f"source: {len(source) / 1024:.0f} KiB, {count} tokens")
+
+    serial = best_of(lambda: TokenStream.from_source(source), repeat=3)
+    print(f"  serial: {serial:.3f}s {count / serial:,.0f} tokens/sec")
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            elapsed = best_of(
+                lambda: lex_parallel(source, workers, executor, min_size=0), repeat=3
+            )
+        print(
+            f"{workers:>3} proc: {elapsed:.3f}s {count / elapsed:,.0f} tokens/sec "
+            f"({serial / elapsed:.1f}x)"
+        )
+        workers *= 2
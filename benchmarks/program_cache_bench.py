@@ -0,0 +1,27 @@
+"""
+Cost of getting a parsed program from a `ProgramCache` versus lexing and
+parsing the source again.
+
+    python benchmarks/program_cache_bench.py [statements]
+"""
+
+import sys
+
+from bench_utils import best_of, generate_program
+from lexer import Lexer
+from program_cache import ProgramCache
+from tiny_parser import Parser
+
+if __name__ == "__main__":
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    source = generate_program(statements)
+    cache = ProgramCache()
+    parsed = cache.parse(source)
+
+    parse_time = best_of(lambda: Parser(Lexer(source)).parse_program(), repeat=20)
+    hit_time = best_of(lambda: cache.parse(source), repeat=20)
+    print(
+        f"source: {len(source) / 1024:.1f} KiB, program: {parsed.size / 1024:.0f} KiB"
+    )
+    print(f"  parse:     {parse_time * 1e6:10.1f} us")
+    print(f"  cache hit: {hit_time * 1e6:10.1f} us ({parse_time / hit_time:.0f}x)")
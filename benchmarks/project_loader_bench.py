@@ -0,0 +1,47 @@
+"""
+Time to load a project of many source files serially and with a growing number
+of worker processes.
+
+    python benchmarks/project_loader_bench.py [files] [statements per file]
+"""
+
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from bench_utils import best_of, generate_program
+from project_loader import find_sources, load_project
+
+if __name__ == "__main__":
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    statements = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(file_count):
+            # Vary the sizes, as in a real project.
+            source = generate_program(statements * (1 + i % 5) // 3)
+            with open(os.path.join(directory, f"module_{i}.tiny"), "w") as f:
+                f.write(source)
+        paths = find_sources(directory)
+        size = sum(os.path.getsize(path) for path in paths)
+        print(f"project: {file_count} files, {size / 1024:.0f} KiB")
+
+        serial = best_of(lambda: load_project(paths, min_size=size + 1), repeat=3)
+        print(f"  serial: {serial:.3f}s")
+
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                elapsed = best_of(
+                    lambda: load_project(paths, workers, executor, min_size=0),
+                    repeat=3,
+                )
+            print(f"{workers:>3} proc: {elapsed:.3f}s ({serial / elapsed:.1f}x)")
+            workers *= 2
+
+        project = load_project(paths, min_size=0)
+        slowest = sorted(project.timings().items(), key=lambda item: -item[1])[:3]
+        print("slowest files:")
+        for path, seconds in slowest:
+            print(f"  {os.path.basename(path)}: {seconds * 1000:.1f} ms")
@@ -0,0 +1,50 @@
+"""
+Evaluation time of calls to deeply nested closures, with variables looked up by
+name through `Environment`s and with the program resolved to `Frame` slots.
+
+    python benchmarks/resolver_bench.py [calls]
+"""
+
+import sys
+
+from bench_utils import best_of  # puts src on sys.path
+
+import eval
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment
+from resolver import resolve
+from tiny_parser import Parser
+
+NESTING = 8
+
+
+def generate_closure_program(calls: int) -> str:
+    params = [f"p{i}" for i in range(NESTING)]
+    body = " + ".join(params * 4)
+    source = f"fn({params[-1]}) {{ let local = {body}; local * 2 }}"
+    for param in reversed(params[:-1]):
+        source = f"fn({param}) {{ let unused_{param} = {param}; {source} }}"
+
+    lines = [f"let make = {source};"]
+    lines.append("let f = make" + "".join(f"({i})" for i in range(NESTING - 1)) + ";")
+    lines.extend(f"f({i});" for i in range(calls))
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    eval.DEBUG = False
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    source = generate_closure_program(calls)
+
+    program = Parser(Lexer(source)).parse_program()
+    by_name = best_of(lambda: Evaluator().eval(program, Environment()), repeat=3)
+    resolve_time = best_of(lambda: resolve(program), repeat=3)
+    by_slot = best_of(lambda: Evaluator().eval(program, Environment()), repeat=3)
+
+    print(f"{calls} calls, closures nested {NESTING} deep")
+    print(f"  Environment lookups: {by_name * 1000:8.2f} ms")
+    print(
+        f"  Frame slots:         {by_slot * 1000:8.2f} ms ({by_name / by_slot:.1f}x), "
+        f"resolve {resolve_time * 1000:.2f} ms"
+    )
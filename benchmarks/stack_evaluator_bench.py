@@ -0,0 +1,85 @@
+"""
+Evaluation time of call-heavy programs with the recursive `Evaluator` and with
+the `StackEvaluator`, and the deepest non-tail recursion each of them reaches
+under Python's default recursion limit.
+
+    python benchmarks/stack_evaluator_bench.py [n]
+"""
+
+import sys
+
+from bench_utils import best_of  # puts src on sys.path
+
+import eval
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment
+from resolver import resolve
+from stack_evaluator import StackEvaluator
+from tiny_parser import Parser
+
+PROGRAMS = {
+    "fib": """
+        let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };
+        fib({n});
+    """,
+    "sum": """
+        let sum = fn(n, acc) { if (n == 0) { return acc; } sum(n - 1, acc + n) };
+        let repeat = fn(k) { if (k > 0) { sum(400, 0); repeat(k - 1) } };
+        repeat({n} * 10);
+    """,
+    "arrays": """
+        let build = fn(n, acc) { if (n == 0) { acc } else { build(n - 1, [n, acc]) } };
+        let total = fn(list) { if (list[0]) { list[0] + total(list[1]) } else { 0 } };
+        let repeat = fn(k) { if (k > 0) { total(build(100, [0])); repeat(k - 1) } };
+        repeat({n} * 10);
+    """,
+}
+
+COUNT = "let count = fn(n) { if (n == 0) { 0 } else { 1 + count(n - 1) } }; count({n})"
+
+
+def deepest(evaluator, limit: int = 1_000_000) -> int:
+    """
+    Deepest recursion `count` evaluates without failing, to within 1%.
+    """
+    low, high = 0, limit
+    while high - low > max(1, low // 100):
+        middle = (low + high) // 2
+        program = Parser(Lexer(COUNT.replace("{n}", str(middle)))).parse_program()
+        try:
+            res = evaluator.eval(program, Environment())
+        except RecursionError:
+            res = None
+        if res is not None and f"{res!r}" == f"{middle}":
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+if __name__ == "__main__":
+    eval.DEBUG = False
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 18
+
+    for name, template in PROGRAMS.items():
+        source = template.replace("{n}", str(n))
+        print(name)
+        for label, program in (
+            ("as parsed", Parser(Lexer(source)).parse_program()),
+            ("resolved", resolve(Parser(Lexer(source)).parse_program())),
+        ):
+            sys.setrecursionlimit(100_000)
+            walked = best_of(lambda: Evaluator().eval(program, Environment()), repeat=3)
+            stacked = best_of(
+                lambda: StackEvaluator().eval(program, Environment()), repeat=3
+            )
+            print(
+                f"  {label:>9}: Evaluator {walked * 1000:8.2f} ms  "
+                f"StackEvaluator {stacked * 1000:8.2f} ms ({walked / stacked:.1f}x)"
+            )
+
+    sys.setrecursionlimit(1000)
+    print("deepest recursion, with a recursion limit of 1000")
+    print(f"  Evaluator      {deepest(Evaluator()):>9}")
+    print(f"  StackEvaluator {deepest(StackEvaluator()):>9}")
@@ -0,0 +1,54 @@
+"""
+Parse times of the recursive `Parser` and the explicit-stack `StackParser` on
+deeply nested and on long flat expressions.
+
+    python benchmarks/stack_parser_bench.py
+"""
+
+from bench_utils import best_of, generate_program
+from lexer import Lexer
+from stack_parser import StackParser
+from tiny_parser import Parser
+
+
+def nested_groups(depth: int) -> str:
+    return "(" * depth + "1" + " + 1)" * depth
+
+
+def nested_prefixes(depth: int) -> str:
+    return "-!" * depth + "x"
+
+
+def nested_calls(depth: int) -> str:
+    return "f(" * depth + "1" + ", [2])" * depth
+
+
+def operator_chain(length: int) -> str:
+    return " + ".join(f"a * {i}" for i in range(length))
+
+
+def bench(name: str, source: str) -> None:
+    times = []
+    for parser_class in (Parser, StackParser):
+        try:
+            times.append(
+                best_of(lambda: parser_class(Lexer(source)).parse_program(), repeat=3)
+            )
+        except RecursionError:
+            times.append(None)
+
+    recursive, stack = times
+    recursive = "RecursionError" if recursive is None else f"{recursive * 1000:.2f} ms"
+    print(f"  {name:<24} Parser: {recursive:>16}  StackParser: {stack * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    for depth in (100, 10_000, 100_000):
+        print(f"nesting depth {depth}:")
+        bench("grouped expressions", nested_groups(depth))
+        bench("prefix expressions", nested_prefixes(depth))
+        bench("call expressions", nested_calls(depth))
+
+    print("flat input:")
+    bench("operator chain", operator_chain(100_000))
+    bench("generated program", generate_program(5_000))
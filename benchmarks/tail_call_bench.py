@@ -0,0 +1,57 @@
+"""
+Time and peak memory of a tail-recursive tiny loop in `Evaluator`, which makes
+tail calls from a trampoline: the time grows with the number of iterations,
+the memory and the Python stack do not. Try 10000000 iterations.
+
+    python benchmarks/tail_call_bench.py [iterations]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import bench_utils  # noqa: F401  puts src on sys.path
+
+import eval
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment
+from resolver import resolve
+from tiny_parser import Parser
+
+SOURCE = """
+    let loop = fn(n, acc) { if (n == 0) { return acc; } loop(n - 1, acc + 1) };
+    loop({n}, 0);
+"""
+
+
+def run(iterations: int, resolved: bool) -> None:
+    program = Parser(Lexer(SOURCE.replace("{n}", str(iterations)))).parse_program()
+    if resolved:
+        program = resolve(program)
+
+    start = time.perf_counter()
+    res = Evaluator().eval(program, Environment())
+    elapsed = time.perf_counter() - start
+
+    # Measured apart, as tracing slows evaluation down several times.
+    tracemalloc.start()
+    Evaluator().eval(program, Environment())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert res.value == iterations, res
+    print(
+        f"{'resolved' if resolved else 'as parsed':>9} {iterations:>10}: "
+        f"{elapsed:7.2f} s  {elapsed / iterations * 1e6:5.2f} µs/iteration  "
+        f"peak {peak / 1024:7.1f} KiB"
+    )
+
+
+if __name__ == "__main__":
+    eval.DEBUG = False
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"recursion limit: {sys.getrecursionlimit()}")
+    for resolved in (False, True):
+        for n in (iterations // 100, iterations // 10, iterations):
+            run(n, resolved)
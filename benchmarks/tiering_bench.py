@@ -0,0 +1,60 @@
+"""
+Evaluation time of a short script and of long-running recursive ones with the
+plain `Evaluator` and with the `TieredEvaluator`, and its tier transitions.
+
+    python benchmarks/tiering_bench.py [n]
+"""
+
+import sys
+
+from bench_utils import best_of  # puts src on sys.path
+
+import eval
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment
+from resolver import resolve
+from tiering import TieredEvaluator
+from tiny_parser import Parser
+
+PROGRAMS = {
+    "short": """
+        let double = fn(x) { x * 2 };
+        let greet = fn(name) { "hello " + name };
+        double(21); greet("tiny");
+    """,
+    "fib": """
+        let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };
+        fib({n});
+    """,
+    "strings": """
+        let build = fn(i, s) { if (i == 0) { return s; } build(i - 1, s + "ab") };
+        let repeat = fn(k) { if (k > 0) { build(200, ""); repeat(k - 1) } };
+        repeat({n} * 5);
+    """,
+}
+
+
+if __name__ == "__main__":
+    eval.DEBUG = False
+    sys.setrecursionlimit(100_000)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 18
+
+    for name, template in PROGRAMS.items():
+        source = template.replace("{n}", str(n))
+        program = resolve(Parser(Lexer(source)).parse_program())
+
+        plain = best_of(lambda: Evaluator().eval(program, Environment()), repeat=3)
+        tiered = best_of(
+            lambda: TieredEvaluator().eval(program, Environment()), repeat=3
+        )
+        evaluator = TieredEvaluator()
+        evaluator.eval(program, Environment())
+        transitions = ", ".join(
+            f"{counter} {count}" for counter, count in evaluator.stats().items()
+        )
+        print(
+            f"{name:>8}: Evaluator {plain * 1000:8.2f} ms  "
+            f"tiered {tiered * 1000:8.2f} ms ({plain / tiered:.1f}x)"
+        )
+        print(f"          {transitions}")
@@ -0,0 +1,38 @@
+"""
+Memory per token and build time of a list of `Token`s versus a `TokenStream`.
+
+    python benchmarks/token_stream_bench.py [statements]
+"""
+
+import sys
+import tracemalloc
+
+from bench_utils import best_of, generate_program
+from lexer import Lexer, TokenStream
+
+
+def measure(build) -> int:
+    tracemalloc.start()
+    tokens = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tokens
+    return size
+
+
+if __name__ == "__main__":
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    source = generate_program(statements)
+    count = len(TokenStream.from_source(source))
+    print(f"source: {len(source) / 1024:.0f} KiB, {count} tokens")
+
+    for name, build in (
+        ("list[Token]", lambda: list(Lexer(source))),
+        ("TokenStream", lambda: TokenStream.from_source(source)),
+    ):
+        size = measure(build)
+        elapsed = best_of(build, repeat=3)
+        print(
+            f"{name:>12}: {size / count:6.1f} bytes/token, "
+            f"{elapsed:.3f}s ({count / elapsed:,.0f} tokens/sec)"
+        )
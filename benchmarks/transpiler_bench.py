@@ -0,0 +1,49 @@
+"""
+Time of calls to recursive arithmetic functions evaluated by `Evaluator` and
+transpiled to Python, and the time transpiling them takes.
+
+    python benchmarks/transpiler_bench.py [n]
+"""
+
+import sys
+
+from bench_utils import best_of  # puts src on sys.path
+
+import eval
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment, IntegerObject
+from tiny_parser import Parser
+from transpiler import Transpiler
+
+FUNCTIONS = {
+    "fib": "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };",
+    "sum": """
+        let sum = fn(n, acc) { if (n == 0) { return acc; } sum(n - 1, acc + n * n) };
+        let repeat = fn(k) { if (k > 0) { sum(200, 0); repeat(k - 1) } else { 0 } };
+    """,
+}
+
+CALLS = {"fib": "fib", "sum": "repeat"}
+
+
+if __name__ == "__main__":
+    eval.DEBUG = False
+    sys.setrecursionlimit(100_000)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 18
+
+    for name, source in FUNCTIONS.items():
+        env = Environment()
+        Evaluator().eval(Parser(Lexer(source)).parse_program(), env)
+        call = Parser(Lexer(f"{CALLS[name]}({n});")).parse_program()
+        func = env.get(CALLS[name])
+
+        interpreted = best_of(lambda: Evaluator().eval(call, env), repeat=3)
+        transpile_time = best_of(lambda: Transpiler().transpile_object(func), repeat=3)
+        transpiled = Transpiler().transpile_object(func)
+        python = best_of(lambda: transpiled([IntegerObject(n)], func.env), repeat=3)
+        print(
+            f"{name:>4}: Evaluator {interpreted * 1000:8.2f} ms  "
+            f"Python {python * 1000:8.2f} ms ({interpreted / python:.0f}x), "
+            f"transpile {transpile_time * 1000:.2f} ms"
+        )
@@ -0,0 +1,66 @@
+"""
+Evaluation time of `Evaluator` against compiling to bytecode and running it on
+the `VM`, on recursive calls, closures and string building.
+
+    python benchmarks/vm_bench.py [n]
+"""
+
+import sys
+
+from bench_utils import best_of  # puts src on sys.path
+
+import eval
+from bytecode import compile_program
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment
+from tiny_parser import Parser
+from vm import VM
+
+PROGRAMS = {
+    "fib": """
+        let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };
+        fib({n});
+    """,
+    "closures": """
+        let counter = fn(start) {
+            let step = fn(x) { x + start };
+            fn(k, acc) { if (k == 0) { acc } else { step(acc) } }
+        };
+        let loop = fn(i, acc) {
+            if (i == 0) { return acc; }
+            let add = counter(i);
+            loop(i - 1, add(1, acc))
+        };
+        let repeat = fn(k) { if (k > 0) { loop(300, 0); repeat(k - 1) } };
+        repeat({n} * 5);
+    """,
+    "strings": """
+        let build = fn(i, s) {
+            if (i == 0) { return s; }
+            build(i - 1, s + "ab" + "c")
+        };
+        let repeat = fn(k) { if (k > 0) { build(300, ""); repeat(k - 1) } };
+        repeat({n} * 5);
+    """,
+}
+
+
+if __name__ == "__main__":
+    eval.DEBUG = False
+    sys.setrecursionlimit(100_000)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 18
+
+    for name, template in PROGRAMS.items():
+        source = template.replace("{n}", str(n))
+        program = Parser(Lexer(source)).parse_program()
+
+        walked = best_of(lambda: Evaluator().eval(program, Environment()), repeat=3)
+        compile_time = best_of(lambda: compile_program(program), repeat=3)
+        bytecode = compile_program(program)
+        run = best_of(lambda: VM().run(bytecode, Environment()), repeat=3)
+        print(
+            f"{name:>8}: Evaluator {walked * 1000:8.2f} ms  "
+            f"VM {run * 1000:8.2f} ms ({walked / run:.1f}x), "
+            f"compile {compile_time * 1000:.2f} ms"
+        )
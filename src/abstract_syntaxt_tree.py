@@ -1,17 +1,111 @@
 from abc import ABC
-from dataclasses import dataclass
-from typing import Dict, List, Optional
-
-from lexer import Token
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from lexer import TOKEN_CODES, TOKEN_TYPES, LineIndex, SourceToken, Token, TokenType
+
+# Position of nodes whose source position is not known.
+NO_POSITION = -1
+# Where the variable of an identifier is kept, see `resolver`: looked up by
+# name, in a slot of the frame, in a cell in a slot of the frame, or in a cell of
+# the function's closure.
+UNRESOLVED = -1
+LOCAL = 0
+CELL = 1
+FREE = 2
+
+
+class PositionTable:
+    """
+    Tokens that the nodes of a program were parsed from, shared by all of its
+    nodes. A node only holds its index in the table as `position`.
+
+    Tokens are stored column-wise: type, literal and offset in the source. The
+    line index an offset is resolved through is recorded once per run of tokens
+    from the same lexer, so positions stay lazy and follow edits the same way
+    `SourceToken`s do. Tokens without an offset keep their line and column in
+    `fixed`.
+    """
+
+    def __init__(self):
+        self.token_types = array("B")
+        self.literals: List[str] = []
+        self.offsets = array("i")
+        # Position at which each run of tokens from one line index starts.
+        self.runs: List[int] = []
+        self.line_indexes: List[Optional[LineIndex]] = []
+        self.fixed: Dict[int, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def add(self, token: Token) -> int:
+        if not isinstance(token, SourceToken):
+            return self.add_fixed(
+                token.token_type, token.literal, token.line, token.column
+            )
+
+        position = len(self.offsets)
+        if not self.line_indexes or self.line_indexes[-1] is not token.line_index:
+            self.runs.append(position)
+            self.line_indexes.append(token.line_index)
+        self.token_types.append(TOKEN_CODES[token.token_type])
+        self.literals.append(token.literal)
+        self.offsets.append(token.offset)
+        return position
+
+    def add_fixed(
+        self, token_type: TokenType, literal: str, line: int, column: int
+    ) -> int:
+        position = len(self.offsets)
+        self.token_types.append(TOKEN_CODES[token_type])
+        self.literals.append(literal)
+        self.offsets.append(NO_POSITION)
+        self.fixed[position] = (line, column)
+        return position
+
+    def line_index(self, position: int) -> Optional[LineIndex]:
+        return self.line_indexes[bisect_right(self.runs, position) - 1]
+
+    def token(self, position: int) -> Token:
+        """
+        The token at `position`, rebuilt from the table.
+        """
+        if position < 0:
+            raise ValueError("node has no source position")
+
+        token_type = TOKEN_TYPES[self.token_types[position]]
+        literal = self.literals[position]
+        if position in self.fixed:
+            line, column = self.fixed[position]
+            return Token(line, column, token_type, literal)
+        return SourceToken(
+            self.line_index(position), self.offsets[position], token_type, literal
+        )
+
+    def line_column(self, position: int) -> Tuple[int, int]:
+        if position < 0:
+            raise ValueError("node has no source position")
+        if position in self.fixed:
+            return self.fixed[position]
+        return self.line_index(position).position(self.offsets[position])
 
 
 class Node(ABC):
-    pass
+    """
+    Nodes are slotted dataclasses. Instead of the token they were parsed from,
+    they hold its `position` in the `PositionTable` of their program; positions
+    are not compared by `==`.
+    """
+
+    __slots__ = ()
 
 
-@dataclass
+@dataclass(slots=True)
 class IntegerLiteral(Node):
-    token: Token
+    position: int = field(compare=False)
     value: int
 
     def __hash__(self) -> int:
@@ -24,9 +118,9 @@ class IntegerLiteral(Node):
         return f"{self.value}"
 
 
-@dataclass
+@dataclass(slots=True)
 class BooleanLiteral(Node):
-    token: Token
+    position: int = field(compare=False)
     value: bool
 
     def __hash__(self) -> int:
@@ -39,18 +133,22 @@ class BooleanLiteral(Node):
         return f"{self.value}"
 
 
-@dataclass
+@dataclass(slots=True)
 class Identifier(Node):
-    token: Token
+    position: int = field(compare=False)
     name: str
+    # Where the variable the identifier refers to is kept, and its index in the
+    # frame or closure. Set by `resolver`.
+    scope: int = field(default=UNRESOLVED, compare=False)
+    slot: int = field(default=UNRESOLVED, compare=False)
 
     def __repr__(self):
         return self.name
 
 
-@dataclass
+@dataclass(slots=True)
 class LetStatement(Node):
-    token: Token
+    position: int = field(compare=False)
     ident: Identifier
     expr: Node
 
@@ -58,27 +156,28 @@ class LetStatement(Node):
         return f"let {self.ident} = {self.expr}"
 
 
-@dataclass
+@dataclass(slots=True)
 class ReturnStatement(Node):
-    token: Token
+    position: int = field(compare=False)
     expr: Node
 
     def __repr__(self):
         return f"return {self.expr}"
 
 
-@dataclass
+@dataclass(slots=True)
 class Program(Node):
-    token: Token
+    position: int = field(compare=False)
     statements: List[Node]
+    positions: PositionTable = field(default_factory=PositionTable, compare=False)
 
     def __repr__(self):
         return "; ".join([f"{stmt}" for stmt in self.statements])
 
 
-@dataclass
+@dataclass(slots=True)
 class PrefixExpression(Node):
-    token: Token
+    position: int = field(compare=False)
     operator: str
     expr: Node
 
@@ -86,39 +185,100 @@ class PrefixExpression(Node):
         return f"({self.operator}{self.expr})"
 
 
-@dataclass
+@dataclass(slots=True)
 class InfixExpression(Node):
-    token: Token
+    position: int = field(compare=False)
     left_expr: Node
     operator: str
     right_expr: Node
+    # Implementations of `operator` by operand types, from `operators`. Set by
+    # the evaluator the first time the expression is evaluated.
+    operations: Optional[dict] = field(default=None, compare=False, repr=False)
 
     def __repr__(self):
         return f"({self.left_expr} {self.operator} {self.right_expr})"
 
 
-@dataclass
+@dataclass(slots=True)
 class BlockStatement(Node):
-    token: Token
+    position: int = field(compare=False)
     statements: List[Node]
 
     def __repr__(self):
         return f"{{{'; '.join([f'{stmt}' for stmt in self.statements])}}}"
 
 
-@dataclass
+class LazyBlockStatement(BlockStatement):
+    """
+    Block whose statements are parsed the first time they are accessed, by
+    calling `parse`. Used for function bodies when parsing lazily.
+    """
+
+    __slots__ = ("parse", "_statements")
+
+    def __init__(self, position: int, parse: Callable[[], List[Node]]):
+        self.position = position
+        self.parse: Optional[Callable[[], List[Node]]] = parse
+        self._statements: List[Node] = []
+
+    @property
+    def parsed(self) -> bool:
+        return self.parse is None
+
+    @property
+    def statements(self) -> List[Node]:
+        # Read once, as another thread sharing the node may parse it meanwhile.
+        parse = self.parse
+        if parse is not None:
+            self._statements = parse()
+            self.parse = None
+        return self._statements
+
+    @statements.setter
+    def statements(self, statements: List[Node]) -> None:
+        self._statements = statements
+        self.parse = None
+
+    def __eq__(self, other: "BlockStatement") -> bool:
+        return isinstance(other, BlockStatement) and self.statements == other.statements
+
+
+@dataclass(slots=True)
+class FrameLayout:
+    """
+    Variables of a resolved function: the slots of its frame and the cells its
+    closure captures.
+    """
+
+    # Names of the parameters, which take the first slots, and local variables.
+    names: Tuple[str, ...]
+    # Slots holding a cell, for variables that nested functions capture.
+    cells: Tuple[int, ...]
+    # Where the cell of each closure variable is taken from when the function is
+    # created: a slot of the creating frame, or `~index` in its closure.
+    captures: Tuple[int, ...]
+    # Indexes in the closure of the variables a name refers to when the one it
+    # was resolved to is not assigned yet, innermost first. Only names that
+    # shadow a variable of an enclosing function have them.
+    fallbacks: Dict[str, Tuple[int, ...]]
+
+
+@dataclass(slots=True)
 class Function(Node):
-    token: Token
+    position: int = field(compare=False)
     paramters: List[Identifier]
     body: BlockStatement
+    # Set by `resolver`; None for functions whose variables are looked up by
+    # name.
+    layout: Optional["FrameLayout"] = field(default=None, compare=False)
 
     def __repr__(self):
         return f"fn({', '.join([f'{param}' for param in self.paramters])}) {self.body}"
 
 
-@dataclass
+@dataclass(slots=True)
 class CallExpression(Node):
-    token: Token
+    position: int = field(compare=False)
     func: Node  # can be either Function or Identifier
     arguments: List[Node]
 
@@ -126,9 +286,9 @@ class CallExpression(Node):
         return f"{self.func}({', '.join([f'{arg}' for arg in self.arguments])})"
 
 
-@dataclass
+@dataclass(slots=True)
 class IfExpression(Node):
-    token: Token
+    position: int = field(compare=False)
     condition: Node
     consequence: Node
     alternative: Optional[Node] = None
@@ -140,9 +300,9 @@ class IfExpression(Node):
             return f"if ({self.condition}) {self.consequence}"
 
 
-@dataclass
+@dataclass(slots=True)
 class HashLiteral(Node):
-    token: Token
+    position: int = field(compare=False)
     pairs: Dict[Node, Node]
 
     def __repr__(self):
@@ -152,18 +312,18 @@ class HashLiteral(Node):
         return f"{{{','.join([pair for pair in pairs])}}}"
 
 
-@dataclass
+@dataclass(slots=True)
 class ArrayLiteral(Node):
-    token: Token
+    position: int = field(compare=False)
     expressions: List[Node]
 
     def __repr__(self):
         return f"[{', '.join([f'{expr}' for expr in self.expressions])}]"
 
 
-@dataclass
+@dataclass(slots=True)
 class IndexExpression(Node):
-    token: Token
+    position: int = field(compare=False)
     left_expr: Node
     index: Node
 
@@ -171,9 +331,9 @@ class IndexExpression(Node):
         return f"{self.left_expr}[{self.index}]"
 
 
-@dataclass
+@dataclass(slots=True)
 class StringLiteral(Node):
-    token: Token
+    position: int = field(compare=False)
     value: str
 
     def __hash__(self) -> int:
@@ -184,3 +344,33 @@ class StringLiteral(Node):
 
     def __repr__(self):
         return f'"{self.value}"'
+
+
+def no_children(node: Node) -> Sequence[Node]:
+    return ()
+
+
+# Child nodes of each node type, left to right.
+CHILDREN: Dict[type, Callable[[Node], Sequence[Node]]] = {
+    IntegerLiteral: no_children,
+    BooleanLiteral: no_children,
+    Identifier: no_children,
+    StringLiteral: no_children,
+    PrefixExpression: lambda node: (node.expr,),
+    InfixExpression: lambda node: (node.left_expr, node.right_expr),
+    LetStatement: lambda node: (node.ident, node.expr),
+    ReturnStatement: lambda node: (node.expr,),
+    BlockStatement: lambda node: node.statements,
+    LazyBlockStatement: lambda node: node.statements if node.parsed else (),
+    Function: lambda node: node.paramters + [node.body],
+    CallExpression: lambda node: [node.func] + node.arguments,
+    IfExpression: lambda node: (
+        (node.condition, node.consequence)
+        if node.alternative is None
+        else (node.condition, node.consequence, node.alternative)
+    ),
+    HashLiteral: lambda node: [child for pair in node.pairs.items() for child in pair],
+    ArrayLiteral: lambda node: node.expressions,
+    IndexExpression: lambda node: (node.left_expr, node.index),
+    Program: lambda node: node.statements,
+}
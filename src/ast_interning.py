@@ -0,0 +1,106 @@
+from typing import Callable, Dict, Hashable, Optional, Tuple, Union
+
+import abstract_syntaxt_tree as ast
+
+
+class InternTable:
+    """
+    Hash-consing table: structurally equal nodes are built once and shared.
+
+    Nodes are keyed on their type, their own values and the identities of their
+    children. Children are interned before their parents, so equal subtrees are
+    already the same objects and identities are enough to compare them. The
+    table keeps every node it returns alive, so the identities in its keys are
+    never reused by other objects.
+
+    Shared nodes must be treated as immutable, and keep the position of their
+    first occurrence. Lazily parsed blocks, and functions with such a body, are
+    never shared, and neither is anything that is not an expression or statement.
+    """
+
+    def __init__(self):
+        self.nodes: Dict[Tuple[Hashable, ...], ast.Node] = {}
+        # Nodes passed to `intern` and the ones among them that were replaced by
+        # an equal node built earlier.
+        self.lookups = 0
+        self.hits = 0
+
+        self.keys: Dict[type, Callable[[ast.Node], Optional[Tuple]]] = {
+            ast.IntegerLiteral: lambda node: (node.value,),
+            ast.BooleanLiteral: lambda node: (node.value,),
+            ast.Identifier: lambda node: (node.name,),
+            ast.StringLiteral: lambda node: (node.value,),
+            ast.PrefixExpression: lambda node: (node.operator, id(node.expr)),
+            ast.InfixExpression: lambda node: (
+                id(node.left_expr),
+                node.operator,
+                id(node.right_expr),
+            ),
+            ast.LetStatement: lambda node: (id(node.ident), id(node.expr)),
+            ast.ReturnStatement: lambda node: (id(node.expr),),
+            ast.BlockStatement: lambda node: tuple(map(id, node.statements)),
+            ast.Function: self.function_key,
+            ast.CallExpression: lambda node: (
+                id(node.func),
+                tuple(map(id, node.arguments)),
+            ),
+            ast.IfExpression: lambda node: (
+                id(node.condition),
+                id(node.consequence),
+                id(node.alternative),
+            ),
+            ast.HashLiteral: lambda node: tuple(
+                (id(key), id(value)) for key, value in node.pairs.items()
+            ),
+            ast.ArrayLiteral: lambda node: tuple(map(id, node.expressions)),
+            ast.IndexExpression: lambda node: (id(node.left_expr), id(node.index)),
+        }
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @staticmethod
+    def function_key(node: ast.Function) -> Optional[Tuple]:
+        if isinstance(node.body, ast.LazyBlockStatement):
+            return None
+        return (tuple(map(id, node.paramters)), id(node.body))
+
+    def intern(self, node: ast.Node) -> ast.Node:
+        """
+        Return the node built earlier that is structurally equal to `node`, or
+        `node` itself, which is then shared from now on. Anything that cannot be
+        shared, errors included, is returned as it is.
+        """
+        key_of = self.keys.get(type(node))
+        if key_of is None:
+            return node
+        key = key_of(node)
+        if key is None:
+            return node
+
+        key = (type(node),) + key
+        shared = self.nodes.get(key)
+        if shared is node:
+            # Interned already, on the way up from a nested parse.
+            return node
+
+        self.lookups += 1
+        if shared is None:
+            self.nodes[key] = node
+            return node
+
+        self.hits += 1
+        return shared
+
+    def clear(self) -> None:
+        self.nodes.clear()
+        self.lookups = 0
+        self.hits = 0
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {
+            "nodes": self.lookups,
+            "unique": len(self.nodes),
+            "shared": self.hits,
+            "dedup_ratio": self.lookups / len(self.nodes) if self.nodes else 1.0,
+        }
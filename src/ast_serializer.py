@@ -0,0 +1,456 @@
+import hashlib
+import os
+import struct
+import tempfile
+import zlib
+from array import array
+from itertools import chain
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import abstract_syntaxt_tree as ast
+from lexer import TOKEN_CODES, TOKEN_TYPES, Lexer, TokenType
+from tiny_parser import ParseError, Parser
+
+MAGIC = b"TAST"
+FORMAT_VERSION = 1
+# magic, format version, hash of the source, number of strings, number of codes,
+# number of positions, compressed size of the program section
+HEADER = struct.Struct("<4sI32sIIII")
+SUFFIX = "c"
+
+# Node opcodes. A program is stored in post-order: the codes of a node follow
+# those of its children, so a loader only keeps a stack of finished nodes.
+INT = 0  # value
+BIG_INT = 1  # string index of the digits
+TRUE = 2
+FALSE = 3
+IDENT = 4  # string index
+STRING = 5  # string index
+PREFIX = 6  # string index of the operator
+INFIX = 7  # string index of the operator
+LET = 8
+RETURN = 9
+BLOCK = 10  # number of statements
+FUNCTION = 11  # number of parameters
+CALL = 12  # number of arguments
+IF = 13
+IF_ELSE = 14
+HASH = 15  # number of pairs
+ARRAY = 16  # number of elements
+INDEX = 17
+PROGRAM = 18  # number of statements
+
+INT_MIN = -(2**31)
+INT_MAX = 2**31 - 1
+
+# Fields of a node's token in the positions table.
+POSITION_FIELDS = 4
+
+
+class Writer:
+    """
+    Walks a program in pre-order with the children of each node visited right to
+    left, which is exactly the reverse of the post-order the loader needs: each
+    node is visited once, recording its codes and returning its children.
+    """
+
+    def __init__(self):
+        # Codes and position of every node, in reverse post-order.
+        self.records: List[Tuple[int, ...]] = []
+        self.node_positions: List[int] = []
+        self.table = ast.PositionTable()
+        self.strings: Dict[str, int] = {}
+
+        self.encoders: Dict[type, Callable[[ast.Node], Sequence[ast.Node]]] = {
+            ast.IntegerLiteral: self.integer,
+            ast.BooleanLiteral: self.boolean,
+            ast.Identifier: self.identifier,
+            ast.StringLiteral: self.string_literal,
+            ast.PrefixExpression: self.prefix,
+            ast.InfixExpression: self.infix,
+            ast.LetStatement: self.let,
+            ast.ReturnStatement: self.return_statement,
+            ast.BlockStatement: self.block,
+            ast.LazyBlockStatement: self.block,
+            ast.Function: self.function,
+            ast.CallExpression: self.call,
+            ast.IfExpression: self.if_expression,
+            ast.HashLiteral: self.hash_literal,
+            ast.ArrayLiteral: self.array_literal,
+            ast.IndexExpression: self.index,
+            ast.Program: self.program,
+        }
+
+    def string(self, value: str) -> int:
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def write(self, program: ast.Program) -> None:
+        # No recursion, so any program the parser can build can be written.
+        records = self.records
+        node_positions = self.node_positions
+        encoders = self.encoders
+        stack: List[ast.Node] = [program]
+        while stack:
+            node = stack.pop()
+            encoder = encoders.get(type(node))
+            if encoder is None:
+                raise TypeError(f"cannot serialize {type(node).__name__}")
+            stack.extend(encoder(node))
+            node_positions.append(node.position)
+
+        self.table = program.positions
+        records.reverse()
+        node_positions.reverse()
+
+    def codes(self) -> array:
+        return array("i", chain.from_iterable(self.records))
+
+    def positions(self) -> array:
+        table = self.table
+        positions = array("i")
+        for position in self.node_positions:
+            if position < 0:
+                # Loaded without positions.
+                positions.extend(
+                    (TOKEN_CODES[TokenType.Illegal], self.string(""), 0, 0)
+                )
+                continue
+            positions.extend(
+                (
+                    table.token_types[position],
+                    self.string(table.literals[position]),
+                    *table.line_column(position),
+                )
+            )
+        return positions
+
+    def integer(self, node: ast.IntegerLiteral) -> Sequence[ast.Node]:
+        if INT_MIN <= node.value <= INT_MAX:
+            self.records.append((INT, node.value))
+        else:
+            self.records.append((BIG_INT, self.string(str(node.value))))
+        return ()
+
+    def boolean(self, node: ast.BooleanLiteral) -> Sequence[ast.Node]:
+        self.records.append((TRUE,) if node.value else (FALSE,))
+        return ()
+
+    def identifier(self, node: ast.Identifier) -> Sequence[ast.Node]:
+        self.records.append((IDENT, self.string(node.name)))
+        return ()
+
+    def string_literal(self, node: ast.StringLiteral) -> Sequence[ast.Node]:
+        self.records.append((STRING, self.string(node.value)))
+        return ()
+
+    def prefix(self, node: ast.PrefixExpression) -> Sequence[ast.Node]:
+        self.records.append((PREFIX, self.string(node.operator)))
+        return (node.expr,)
+
+    def infix(self, node: ast.InfixExpression) -> Sequence[ast.Node]:
+        self.records.append((INFIX, self.string(node.operator)))
+        return (node.left_expr, node.right_expr)
+
+    def let(self, node: ast.LetStatement) -> Sequence[ast.Node]:
+        self.records.append((LET,))
+        return (node.ident, node.expr)
+
+    def return_statement(self, node: ast.ReturnStatement) -> Sequence[ast.Node]:
+        self.records.append((RETURN,))
+        return (node.expr,)
+
+    def block(self, node: ast.BlockStatement) -> Sequence[ast.Node]:
+        self.records.append((BLOCK, len(node.statements)))
+        return node.statements
+
+    def function(self, node: ast.Function) -> Sequence[ast.Node]:
+        self.records.append((FUNCTION, len(node.paramters)))
+        return node.paramters + [node.body]
+
+    def call(self, node: ast.CallExpression) -> Sequence[ast.Node]:
+        self.records.append((CALL, len(node.arguments)))
+        return [node.func] + node.arguments
+
+    def if_expression(self, node: ast.IfExpression) -> Sequence[ast.Node]:
+        if node.alternative is None:
+            self.records.append((IF,))
+            return (node.condition, node.consequence)
+        self.records.append((IF_ELSE,))
+        return (node.condition, node.consequence, node.alternative)
+
+    def hash_literal(self, node: ast.HashLiteral) -> Sequence[ast.Node]:
+        self.records.append((HASH, len(node.pairs)))
+        return [child for pair in node.pairs.items() for child in pair]
+
+    def array_literal(self, node: ast.ArrayLiteral) -> Sequence[ast.Node]:
+        self.records.append((ARRAY, len(node.expressions)))
+        return node.expressions
+
+    def index(self, node: ast.IndexExpression) -> Sequence[ast.Node]:
+        self.records.append((INDEX,))
+        return (node.left_expr, node.index)
+
+    def program(self, node: ast.Program) -> Sequence[ast.Node]:
+        self.records.append((PROGRAM, len(node.statements)))
+        return node.statements
+
+
+def source_hash(source: str) -> bytes:
+    return hashlib.sha256(source.encode("utf-8", "surrogatepass")).digest()
+
+
+def dump(
+    program: ast.Program, source: Optional[str] = None, positions: bool = True
+) -> bytes:
+    """
+    Serialize `program`. When `source` is given, its hash is stored so that
+    `load` can tell whether the program is still the one of a source. Without
+    `positions`, the program loads without tokens even when they are asked for.
+    """
+    writer = Writer()
+    writer.write(program)
+    codes = writer.codes()
+    positions = writer.positions() if positions else array("i")
+
+    # The program section holds the string lengths, the codes and the strings;
+    # the positions follow in a section of their own, so that loading without
+    # positions does not decompress them.
+    strings = list(writer.strings)
+    encoded = [string.encode("utf-8", "surrogatepass") for string in strings]
+    lengths = array("i", [len(string) for string in encoded])
+    program_section = zlib.compress(
+        lengths.tobytes() + codes.tobytes() + b"".join(encoded)
+    )
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        source_hash(source) if source is not None else bytes(32),
+        len(strings),
+        len(codes),
+        len(positions),
+        len(program_section),
+    )
+    return header + program_section + zlib.compress(positions.tobytes())
+
+
+def load(
+    data: bytes, source: Optional[str] = None, positions: bool = False
+) -> Optional[ast.Program]:
+    """
+    Load a program written by `dump`. Returns None if `data` is not a valid
+    program of this format version or, when `source` is given, was not dumped
+    from that source.
+
+    Nodes get their positions only when `positions` is set; otherwise their
+    `position` is `NO_POSITION` and the program's position table stays empty.
+    """
+    if len(data) < HEADER.size:
+        return None
+
+    (
+        magic,
+        version,
+        digest,
+        string_count,
+        code_count,
+        position_count,
+        program_size,
+    ) = HEADER.unpack_from(data)
+    if (
+        magic != MAGIC
+        or version != FORMAT_VERSION
+        or (source is not None and digest != source_hash(source))
+    ):
+        return None
+
+    itemsize = array("i").itemsize
+    program_end = HEADER.size + program_size
+    try:
+        section = zlib.decompress(data[HEADER.size : program_end])
+    except zlib.error:
+        return None
+
+    offset = itemsize * (string_count + code_count)
+    if len(section) < offset:
+        return None
+
+    lengths = array("i")
+    codes = array("i")
+    lengths.frombytes(section[: itemsize * string_count])
+    codes.frombytes(section[itemsize * string_count : offset])
+
+    strings = []
+    for length in lengths:
+        strings.append(
+            section[offset : offset + length].decode("utf-8", "surrogatepass")
+        )
+        offset += length
+    if offset != len(section):
+        return None
+
+    table = ast.PositionTable()
+    if positions:
+        fields = array("i")
+        try:
+            fields.frombytes(zlib.decompress(data[program_end:]))
+        except (zlib.error, ValueError):
+            return None
+        if len(fields) != position_count or position_count % POSITION_FIELDS:
+            return None
+
+        for i in range(0, len(fields), POSITION_FIELDS):
+            token_code, literal, line, column = fields[i : i + POSITION_FIELDS]
+            # Checked rather than caught, as negative indexes would not fail.
+            if not (0 <= token_code < len(TOKEN_TYPES) and 0 <= literal < len(strings)):
+                return None
+            table.add_fixed(TOKEN_TYPES[token_code], strings[literal], line, column)
+
+    try:
+        return build(codes.tolist(), strings, table)
+    except (IndexError, TypeError):
+        return None
+
+
+def build(
+    codes: List[int], strings: List[str], positions: ast.PositionTable
+) -> ast.Program:
+    """
+    Run the post-order `codes`. When `positions` is not empty, it holds the
+    positions of the nodes in the same order.
+    """
+    stack: List[ast.Node] = []
+    push = stack.append
+    pop = stack.pop
+    positioned = len(positions) > 0
+    position = ast.NO_POSITION
+
+    i = 0
+    end = len(codes)
+    while i < end:
+        code = codes[i]
+        if positioned:
+            position += 1
+
+        if code == IDENT:
+            push(ast.Identifier(position, strings[codes[i + 1]]))
+            i += 2
+        elif code == INT:
+            push(ast.IntegerLiteral(position, codes[i + 1]))
+            i += 2
+        elif code == INFIX:
+            right = pop()
+            stack[-1] = ast.InfixExpression(
+                position, stack[-1], strings[codes[i + 1]], right
+            )
+            i += 2
+        elif code == STRING:
+            push(ast.StringLiteral(position, strings[codes[i + 1]]))
+            i += 2
+        elif code == LET:
+            expr = pop()
+            stack[-1] = ast.LetStatement(position, stack[-1], expr)
+            i += 1
+        elif code == PREFIX:
+            stack[-1] = ast.PrefixExpression(position, strings[codes[i + 1]], stack[-1])
+            i += 2
+        elif code == TRUE or code == FALSE:
+            push(ast.BooleanLiteral(position, code == TRUE))
+            i += 1
+        elif code == RETURN:
+            stack[-1] = ast.ReturnStatement(position, stack[-1])
+            i += 1
+        elif code == CALL:
+            count = codes[i + 1]
+            arguments = stack[len(stack) - count :]
+            del stack[len(stack) - count :]
+            stack[-1] = ast.CallExpression(position, stack[-1], arguments)
+            i += 2
+        elif code == BLOCK or code == PROGRAM or code == ARRAY:
+            count = codes[i + 1]
+            nodes = stack[len(stack) - count :]
+            del stack[len(stack) - count :]
+            if code == BLOCK:
+                push(ast.BlockStatement(position, nodes))
+            elif code == PROGRAM:
+                push(ast.Program(position, nodes, positions))
+            else:
+                push(ast.ArrayLiteral(position, nodes))
+            i += 2
+        elif code == FUNCTION:
+            body = pop()
+            count = codes[i + 1]
+            params = stack[len(stack) - count :]
+            del stack[len(stack) - count :]
+            push(ast.Function(position, params, body))
+            i += 2
+        elif code == IF or code == IF_ELSE:
+            alternative = pop() if code == IF_ELSE else None
+            consequence = pop()
+            stack[-1] = ast.IfExpression(position, stack[-1], consequence, alternative)
+            i += 1
+        elif code == HASH:
+            count = 2 * codes[i + 1]
+            items = stack[len(stack) - count :]
+            del stack[len(stack) - count :]
+            push(ast.HashLiteral(position, dict(zip(items[::2], items[1::2]))))
+            i += 2
+        elif code == INDEX:
+            index = pop()
+            stack[-1] = ast.IndexExpression(position, stack[-1], index)
+            i += 1
+        elif code == BIG_INT:
+            push(ast.IntegerLiteral(position, int(strings[codes[i + 1]])))
+            i += 2
+        else:
+            raise TypeError(f"unknown node code {code}")
+
+    if len(stack) != 1:
+        raise TypeError(f"serialized data holds {len(stack)} nodes")
+    program = stack[0]
+    if not isinstance(program, ast.Program):
+        raise TypeError("serialized data does not hold a program")
+    return program
+
+
+def parse_file(
+    path: str, positions: bool = False
+) -> Tuple[ast.Program, List[ParseError]]:
+    """
+    Parse the source at `path`, loading the program from `path` + "c" when that
+    was dumped from the same source, and writing it there otherwise. Sources
+    that fail to parse are not written, so their errors are always reported.
+    """
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+
+    compiled_path = path + SUFFIX
+    try:
+        with open(compiled_path, "rb") as f:
+            program = load(f.read(), source, positions)
+    except FileNotFoundError:
+        program = None
+    if program is not None:
+        return program, []
+
+    parser = Parser(Lexer(source))
+    program = parser.parse_program()
+    if parser.errors:
+        return program, parser.errors
+
+    data = dump(program, source)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, compiled_path)
+    except OSError:
+        # A cache that cannot be written is only a missed speed-up.
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    return program, []
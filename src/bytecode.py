@@ -0,0 +1,526 @@
+from dataclasses import dataclass, field
+from enum import IntEnum, unique
+from typing import Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+import abstract_syntaxt_tree as ast
+import object as obj
+from program_cache import copy_program
+from resolver import resolve
+from tiny_parser import DeferredParseError
+
+
+@unique
+class Opcode(IntEnum):
+    """
+    Every instruction is an opcode followed by one operand, which is 0 for
+    opcodes that take none.
+    """
+
+    # Push constant `operand`.
+    CONSTANT = 0
+    # Push `null`, or the value of a statement that has none, like `let`.
+    NULL = 1
+    NONE = 2
+    POP = 3
+
+    # Pop the right operand, then the left one, and push the result.
+    ADD = 4
+    SUB = 5
+    MUL = 6
+    DIV = 7
+    EQ = 8
+    NE = 9
+    LT = 10
+    GT = 11
+    NEG = 12
+    NOT = 13
+
+    # Continue at instruction `operand`; `JUMP_IF_FALSE` pops the condition.
+    JUMP = 14
+    JUMP_IF_FALSE = 15
+
+    # Variables by name, constant `operand`.
+    GET_GLOBAL = 16
+    SET_GLOBAL = 17
+    # Variables of the current frame, by slot.
+    GET_LOCAL = 18
+    SET_LOCAL = 19
+    GET_CELL = 20
+    SET_CELL = 21
+    # Variables of the current closure, by index.
+    GET_FREE = 22
+
+    # Push a function with the code of constant `operand`.
+    CLOSURE = 23
+    # Call the function below `operand` arguments.
+    CALL = 24
+    RETURN = 25
+    # Fail with the error object constant `operand`.
+    ERROR = 26
+
+    # Pop `operand` elements, or `operand` keys and values, into an array or hash.
+    ARRAY = 27
+    HASH = 28
+    INDEX = 29
+
+    # Instructions `peephole` puts in place of the first instruction of a
+    # common sequence. They read the operands of the other instructions from
+    # where they are, and run the whole sequence at once, or only its first
+    # instruction when the other operand is not of the type of the constant.
+    # `CALL`, `RETURN`: replaces the call of the current function with the
+    # callee's.
+    TAIL_CALL = 30
+    # `EQ`, `LT` or `GT`, `JUMP_IF_FALSE`.
+    JUMP_IF_NOT_EQ = 31
+    JUMP_IF_NOT_LT = 32
+    JUMP_IF_NOT_GT = 33
+    # `GET_LOCAL`, `CONSTANT`, `ADD` or `SUB`.
+    LOCAL_CONSTANT_OP = 34
+    # `GET_LOCAL`, `CONSTANT`, `EQ`, `LT` or `GT`, `JUMP_IF_FALSE`, where the
+    # comparison is itself fused with the jump.
+    LOCAL_CONSTANT_JUMP = 35
+    # `CONSTANT`, `ADD` or `SUB`, like `LOCAL_CONSTANT_OP`.
+    CONSTANT_OP = 36
+
+
+INFIX_OPCODES: Dict[str, Opcode] = {
+    "+": Opcode.ADD,
+    "-": Opcode.SUB,
+    "*": Opcode.MUL,
+    "/": Opcode.DIV,
+    "==": Opcode.EQ,
+    "!=": Opcode.NE,
+    "<": Opcode.LT,
+    ">": Opcode.GT,
+}
+
+PREFIX_OPCODES: Dict[str, Opcode] = {"-": Opcode.NEG, "!": Opcode.NOT}
+
+NO_OPERAND = frozenset(
+    (Opcode.NULL, Opcode.NONE, Opcode.POP, Opcode.RETURN, Opcode.INDEX)
+    + (Opcode.JUMP_IF_NOT_EQ, Opcode.JUMP_IF_NOT_LT, Opcode.JUMP_IF_NOT_GT)
+    + tuple(INFIX_OPCODES.values())
+    + tuple(PREFIX_OPCODES.values())
+)
+
+# Operations of `LOCAL_CONSTANT_OP` and `CONSTANT_OP`, with the types of the
+# constants they are fused for.
+CONSTANT_OPERATIONS: Dict[int, Tuple[type, ...]] = {
+    Opcode.ADD.value: (obj.IntegerObject, obj.StringObject),
+    Opcode.SUB.value: (obj.IntegerObject,),
+}
+
+# Instructions whose operand is the slot of a local variable.
+LOCAL_OPCODES = frozenset(
+    (Opcode.GET_LOCAL, Opcode.SET_LOCAL)
+    + (Opcode.LOCAL_CONSTANT_OP, Opcode.LOCAL_CONSTANT_JUMP)
+)
+
+# Comparisons `JUMP_IF_FALSE` is fused with.
+COMPARE_JUMPS: Dict[int, Opcode] = {
+    Opcode.EQ.value: Opcode.JUMP_IF_NOT_EQ,
+    Opcode.LT.value: Opcode.JUMP_IF_NOT_LT,
+    Opcode.GT.value: Opcode.JUMP_IF_NOT_GT,
+}
+
+# Layout of functions whose body does not parse, and which use no variables.
+EMPTY_LAYOUT = ast.FrameLayout((), (), (), {})
+
+
+@dataclass
+class CompiledFunction:
+    # Opcodes and their operands, one after the other.
+    instructions: List[int]
+    layout: ast.FrameLayout
+    parameters: Tuple[str, ...]
+    # Constants of the program the function is part of, which its instructions
+    # refer to.
+    constants: List[object]
+    # Names of the closure variables the code reads, for lookups by name while
+    # they are not assigned yet.
+    free_names: Tuple[str, ...] = ()
+    # Values of the slots after the parameters when a call starts.
+    unassigned: List[None] = field(init=False)
+
+    def __post_init__(self):
+        self.unassigned = [None] * (len(self.layout.names) - len(self.parameters))
+
+
+@dataclass
+class Bytecode:
+    main: CompiledFunction
+    # Constants of the whole program: literals, names and functions.
+    constants: List[object] = field(default_factory=list)
+
+
+class Compiler:
+    """
+    Compiles a program to bytecode for `vm.VM`.
+
+    A copy of the program, from `program_cache.copy_program`, is resolved first,
+    with `resolver.resolve`, so variables of functions are kept in the slots of
+    their `object.Frame`s and only globals are looked up by name; lazily parsed
+    function bodies are parsed, and functions whose body does not parse fail
+    with the parse error when called. The program itself is left as it is, so
+    it may be shared, like the ones a `program_cache.ProgramCache` hands out.
+
+    The code of each function goes through `peephole`, which fuses common
+    sequences of instructions.
+
+    Evaluation is the same as `eval.Evaluator`'s, except that `return` always
+    returns from the function, wherever it appears.
+    """
+
+    def __init__(self):
+        self.constants: List[object] = []
+        # Index of each constant literal and name.
+        self.constant_indexes: Dict[Tuple[type, Hashable], int] = {}
+        # Instructions of the functions being compiled, innermost last, and the
+        # names of their closure variables.
+        self.code: List[int] = []
+        self.free_names: List[Dict[int, str]] = []
+
+        # Each compiles a node: it emits instructions, or returns the steps to
+        # take in order, either nodes to compile or functions to call.
+        self.compilers: Dict[type, Callable[[ast.Node], Optional[List[Step]]]] = {
+            ast.IntegerLiteral: self.literal,
+            ast.BooleanLiteral: self.literal,
+            ast.StringLiteral: self.literal,
+            ast.Identifier: self.identifier,
+            ast.PrefixExpression: self.prefix,
+            ast.InfixExpression: self.infix,
+            ast.LetStatement: self.let,
+            ast.ReturnStatement: self.return_statement,
+            ast.BlockStatement: self.block,
+            ast.LazyBlockStatement: self.block,
+            ast.Function: self.function,
+            ast.CallExpression: self.call,
+            ast.IfExpression: self.if_expression,
+            ast.HashLiteral: self.hash_literal,
+            ast.ArrayLiteral: self.array_literal,
+            ast.IndexExpression: self.index,
+            ast.Program: self.block,
+        }
+
+    def compile(self, program: ast.Program) -> Bytecode:
+        program = copy_program(program)
+        parse_bodies(program)
+        resolve(program)
+
+        self.code = []
+        self.free_names = [{}]
+        # No recursion, so that any program the parser can build can be
+        # compiled.
+        steps: List[Step] = [self.emit_return, program]
+        while steps:
+            step = steps.pop()
+            if isinstance(step, ast.Node):
+                more = self.compilers[type(step)](step)
+                if more:
+                    steps.extend(reversed(more))
+            else:
+                step()
+
+        main = CompiledFunction(self.code, EMPTY_LAYOUT, (), self.constants)
+        return Bytecode(main, self.constants)
+
+    def emit(self, opcode: Opcode, operand: int = 0) -> int:
+        """
+        Emit an instruction and return its position.
+        """
+        self.code += (opcode.value, operand)
+        return len(self.code) - 2
+
+    def emitter(self, opcode: Opcode, operand: int = 0) -> Callable[[], None]:
+        return lambda: self.emit(opcode, operand)
+
+    def emit_return(self) -> None:
+        self.emit(Opcode.RETURN)
+
+    def constant(self, value: object, key: Optional[Hashable] = None) -> int:
+        """
+        Index of `value` in the constants; values with a `key` are added once.
+        """
+        if key is not None:
+            key = (type(value), key)
+            index = self.constant_indexes.get(key)
+            if index is not None:
+                return index
+            self.constant_indexes[key] = len(self.constants)
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    def name(self, name: str) -> int:
+        return self.constant(name, name)
+
+    def literal(self, node: ast.Node) -> None:
+        if type(node) is ast.IntegerLiteral:
+            value = obj.IntegerObject(node.value)
+        elif type(node) is ast.BooleanLiteral:
+            value = obj.BooleanObject(node.value)
+        else:
+            value = obj.StringObject(node.value)
+        self.emit(Opcode.CONSTANT, self.constant(value, node.value))
+
+    def identifier(self, node: ast.Identifier) -> None:
+        if node.scope == ast.UNRESOLVED:
+            self.emit(Opcode.GET_GLOBAL, self.name(node.name))
+        elif node.scope == ast.LOCAL:
+            self.emit(Opcode.GET_LOCAL, node.slot)
+        elif node.scope == ast.CELL:
+            self.emit(Opcode.GET_CELL, node.slot)
+        else:
+            self.free_names[-1][node.slot] = node.name
+            self.emit(Opcode.GET_FREE, node.slot)
+
+    def prefix(self, node: ast.PrefixExpression) -> List["Step"]:
+        return [node.expr, self.emitter(PREFIX_OPCODES[node.operator])]
+
+    def infix(self, node: ast.InfixExpression) -> List["Step"]:
+        return [
+            node.left_expr,
+            node.right_expr,
+            self.emitter(INFIX_OPCODES[node.operator]),
+        ]
+
+    def let(self, node: ast.LetStatement) -> List["Step"]:
+        ident = node.ident
+        if ident.scope == ast.UNRESOLVED:
+            store = self.emitter(Opcode.SET_GLOBAL, self.name(ident.name))
+        elif ident.scope == ast.LOCAL:
+            store = self.emitter(Opcode.SET_LOCAL, ident.slot)
+        else:
+            store = self.emitter(Opcode.SET_CELL, ident.slot)
+        return [node.expr, store]
+
+    def return_statement(self, node: ast.ReturnStatement) -> List["Step"]:
+        return [node.expr, self.emit_return]
+
+    def block(self, node: Union[ast.BlockStatement, ast.Program]) -> List["Step"]:
+        # Statements leave their value on the stack; a block leaves the value of
+        # its last statement.
+        statements = node.statements
+        if not statements:
+            self.emit(Opcode.NULL)
+            return []
+
+        steps: List[Step] = []
+        last = len(statements) - 1
+        for i, statement in enumerate(statements):
+            steps.append(statement)
+            if type(statement) is ast.LetStatement:
+                # Leaves no value.
+                if i == last:
+                    steps.append(self.emitter(Opcode.NONE))
+            elif i != last:
+                steps.append(self.emitter(Opcode.POP))
+        return steps
+
+    def function(self, node: ast.Function) -> List["Step"]:
+        parameters = tuple(param.name for param in node.paramters)
+        outer_code = self.code
+
+        def begin() -> None:
+            self.code = []
+            self.free_names.append({})
+
+        def end() -> None:
+            self.emit(Opcode.RETURN)
+            peephole(self.code, self.constants)
+            free_names = self.free_names.pop()
+            function = CompiledFunction(
+                self.code,
+                node.layout,
+                parameters,
+                self.constants,
+                tuple(
+                    free_names.get(index, "")
+                    for index in range(len(node.layout.captures))
+                ),
+            )
+            self.code = outer_code
+            self.emit(Opcode.CLOSURE, self.constant(function))
+
+        error = parse_error(node.body)
+        if error is not None:
+            # Left unresolved by `resolve`, and uses no variables.
+            function = CompiledFunction(
+                [Opcode.ERROR.value, self.constant(error)],
+                EMPTY_LAYOUT,
+                parameters,
+                self.constants,
+            )
+            self.emit(Opcode.CLOSURE, self.constant(function))
+            return []
+
+        return [begin, node.body, end]
+
+    def call(self, node: ast.CallExpression) -> List["Step"]:
+        return [
+            node.func,
+            *node.arguments,
+            self.emitter(Opcode.CALL, len(node.arguments)),
+        ]
+
+    def if_expression(self, node: ast.IfExpression) -> List["Step"]:
+        jumps: List[int] = []
+
+        def jump_if_false() -> None:
+            jumps.append(self.emit(Opcode.JUMP_IF_FALSE))
+
+        def jump_to_end() -> None:
+            self.code[jumps.pop() + 1] = len(self.code) + 2
+            jumps.append(self.emit(Opcode.JUMP))
+
+        def end() -> None:
+            self.code[jumps.pop() + 1] = len(self.code)
+
+        alternative = node.alternative
+        return [
+            node.condition,
+            jump_if_false,
+            node.consequence,
+            jump_to_end,
+            alternative if alternative is not None else self.emitter(Opcode.NULL),
+            end,
+        ]
+
+    def hash_literal(self, node: ast.HashLiteral) -> List["Step"]:
+        steps: List[Step] = [child for pair in node.pairs.items() for child in pair]
+        steps.append(self.emitter(Opcode.HASH, len(node.pairs)))
+        return steps
+
+    def array_literal(self, node: ast.ArrayLiteral) -> List["Step"]:
+        return [*node.expressions, self.emitter(Opcode.ARRAY, len(node.expressions))]
+
+    def index(self, node: ast.IndexExpression) -> List["Step"]:
+        return [node.left_expr, node.index, self.emitter(Opcode.INDEX)]
+
+
+# A node to compile, or a function emitting instructions.
+Step = Union[ast.Node, Callable[[], None]]
+
+
+def peephole(code: List[int], constants: List[object]) -> None:
+    """
+    Replace the first instruction of common sequences in the code of a
+    function with one running the whole sequence, in place. The other
+    instructions are kept, so no position changes and jumps into a sequence
+    still run the rest of it.
+    """
+    jump = Opcode.JUMP.value
+    jump_if_false = Opcode.JUMP_IF_FALSE.value
+    ret = Opcode.RETURN.value
+    null = Opcode.NULL.value
+    pop = Opcode.POP.value
+    get_local = Opcode.GET_LOCAL.value
+    constant = Opcode.CONSTANT.value
+    size = len(code)
+
+    for ip in range(0, size - 2, 2):
+        opcode = code[ip]
+        if opcode != jump and opcode != jump_if_false:
+            continue
+        target = code[ip + 1]
+        if target + 2 < size and code[target] == null and code[target + 2] == pop:
+            # Skip pushing a value only to pop it, which is what an `if` without
+            # `else` does when its condition is false and it is a statement.
+            target += 4
+            code[ip + 1] = target
+        if opcode == jump and code[target] == ret:
+            # Return right away rather than jump to a return.
+            code[ip : ip + 2] = [ret, 0]
+
+    for ip in range(0, size - 2, 2):
+        opcode = code[ip]
+        following = code[ip + 2]
+        if opcode == Opcode.CALL and following == ret:
+            code[ip] = Opcode.TAIL_CALL.value
+        elif opcode in COMPARE_JUMPS and following == jump_if_false:
+            code[ip] = COMPARE_JUMPS[opcode].value
+        elif opcode == constant and type(constants[code[ip + 1]]) in (
+            CONSTANT_OPERATIONS.get(following, ())
+        ):
+            code[ip] = Opcode.CONSTANT_OP.value
+        elif opcode == get_local and following == constant and ip + 4 < size:
+            operation = code[ip + 4]
+            constant_type = type(constants[code[ip + 3]])
+            if constant_type in CONSTANT_OPERATIONS.get(operation, ()):
+                code[ip] = Opcode.LOCAL_CONSTANT_OP.value
+            elif (
+                constant_type is obj.IntegerObject
+                and operation in COMPARE_JUMPS
+                and ip + 6 < size
+                and code[ip + 6] == jump_if_false
+            ):
+                code[ip] = Opcode.LOCAL_CONSTANT_JUMP.value
+
+
+def parse_bodies(program: ast.Program) -> None:
+    """
+    Parse the lazily parsed function bodies of `program`, leaving the ones that
+    do not parse.
+    """
+    stack: List[ast.Node] = [program]
+    while stack:
+        node = stack.pop()
+        if type(node) is ast.LazyBlockStatement and parse_error(node) is not None:
+            continue
+        stack.extend(ast.CHILDREN[type(node)](node))
+
+
+def parse_error(body: ast.BlockStatement) -> Optional[obj.ErrorObject]:
+    """
+    The error a function body evaluates to, if it is lazily parsed and does not
+    parse.
+    """
+    try:
+        body.statements
+    except DeferredParseError as exc:
+        return obj.ErrorObject(f"{exc}")
+    return None
+
+
+def compile_program(program: ast.Program) -> Bytecode:
+    return Compiler().compile(program)
+
+
+def disassemble(bytecode: Bytecode) -> str:
+    """
+    Instructions of the program and, after them, of each function it defines,
+    one per line with their position and operand, and what the operand refers
+    to.
+    """
+    constants = bytecode.constants
+    lines: List[str] = []
+    functions: List[Tuple[str, CompiledFunction]] = [("main", bytecode.main)]
+    while functions:
+        label, function = functions.pop(0)
+        if lines:
+            lines.append("")
+        lines.append(f"{label}:")
+
+        code = function.instructions
+        for ip in range(0, len(code), 2):
+            opcode = Opcode(code[ip])
+            operand = code[ip + 1]
+            line = f"  {ip:04d} {opcode.name:<14} {operand}"
+            if opcode in (Opcode.CONSTANT, Opcode.CONSTANT_OP, Opcode.ERROR):
+                line += f" ({constants[operand]!r})"
+            elif opcode in (Opcode.GET_GLOBAL, Opcode.SET_GLOBAL):
+                line += f" ({constants[operand]})"
+            elif opcode in LOCAL_OPCODES:
+                line += f" ({function.layout.names[operand]})"
+            elif opcode in (Opcode.GET_CELL, Opcode.SET_CELL):
+                line += f" ({function.layout.names[operand]})"
+            elif opcode is Opcode.GET_FREE:
+                line += f" ({function.free_names[operand]})"
+            elif opcode is Opcode.CLOSURE:
+                nested = constants[operand]
+                name = f"fn#{operand}({', '.join(nested.parameters)})"
+                line += f" ({name})"
+                functions.append((name, nested))
+            elif opcode in NO_OPERAND:
+                line = f"  {ip:04d} {opcode.name}"
+            lines.append(line)
+    return "\n".join(lines)
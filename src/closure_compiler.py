@@ -0,0 +1,440 @@
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import abstract_syntaxt_tree as ast
+import object as obj
+from object import Environment, Frame
+from operators import binary_error, binary_operations
+from tiny_parser import DeferredParseError
+
+# Compiled node: evaluates the node in the environment it is given.
+Code = Callable[[Union[Environment, Frame]], Optional[obj.Object]]
+
+
+class ClosureCompiler:
+    """
+    Execution engine that compiles each node once into a Python closure which
+    evaluates it, instead of dispatching on the node's type every time it is
+    evaluated like `eval.Evaluator`. Closures are specialized on the node type,
+    the operator and, for resolved identifiers, where the variable is kept, and
+    call the closures of their children directly.
+
+    Results, errors included, are the same as `Evaluator`'s. Literals evaluate
+    to one object built when they are compiled, rather than a new equal object
+    each time.
+
+    Nodes are compiled as they are when `compile` is called, so programs are
+    resolved before they are compiled. Lazily parsed function bodies are
+    compiled the first time they run, and bodies of functions created by an
+    `Evaluator` the first time they are called.
+    """
+
+    def __init__(self):
+        # Each takes a node and the code of its children, and returns the code of
+        # the node.
+        self.builders: Dict[type, Callable[[ast.Node, List[Code]], Code]] = {
+            ast.IntegerLiteral: self.integer_literal,
+            ast.BooleanLiteral: self.boolean_literal,
+            ast.Identifier: self.identifier,
+            ast.StringLiteral: self.string_literal,
+            ast.PrefixExpression: self.prefix,
+            ast.InfixExpression: self.infix,
+            ast.LetStatement: self.let,
+            ast.ReturnStatement: self.return_statement,
+            ast.BlockStatement: self.block,
+            ast.LazyBlockStatement: self.lazy_block,
+            ast.Function: self.function,
+            ast.CallExpression: self.call,
+            ast.IfExpression: self.if_expression,
+            ast.ArrayLiteral: self.array_literal,
+            ast.HashLiteral: self.hash_literal,
+            ast.IndexExpression: self.index,
+            ast.Program: self.program,
+        }
+        # Code of function bodies compiled when called, by the identity of the
+        # body, which is kept alive with it.
+        self.bodies: Dict[int, Tuple[ast.Node, Code]] = {}
+
+    def eval(self, node: ast.Node, env: Environment) -> Optional[obj.Object]:
+        return self.compile(node)(env)
+
+    def compile(self, node: ast.Node) -> Code:
+        # Same walk as `optimizer.Optimizer`: children are compiled before their
+        # parents, without recursion.
+        children_of = ast.CHILDREN
+        order: List[ast.Node] = []
+        counts: List[int] = []
+        stack: List[ast.Node] = [node]
+        while stack:
+            node = stack.pop()
+            children = children_of[type(node)](node)
+            order.append(node)
+            counts.append(len(children))
+            stack.extend(children)
+
+        builders = self.builders
+        codes: List[Code] = []
+        for node, count in zip(reversed(order), reversed(counts)):
+            if count:
+                children = codes[len(codes) - count :]
+                del codes[len(codes) - count :]
+            else:
+                children = []
+            builder = builders.get(type(node))
+            if builder is None:
+                raise TypeError(f"no handler for node type '{type(node).__name__}'")
+            codes.append(builder(node, children))
+
+        (code,) = codes
+        return code
+
+    def body_code(self, func: obj.FunctionObject) -> Code:
+        code = func.code
+        if code is None:
+            compiled = self.bodies.get(id(func.body))
+            if compiled is None:
+                compiled = self.bodies[id(func.body)] = (
+                    func.body,
+                    self.compile(func.body),
+                )
+            code = compiled[1]
+        return code
+
+    def call_function(
+        self, func: obj.FunctionObject, args: List[obj.Object]
+    ) -> Optional[obj.Object]:
+        if func.layout is None:
+            call_env = Environment(func.env)
+            for param, arg in zip(func.arguments, args):
+                call_env.set(param.name, arg)
+        else:
+            call_env = Frame(func.layout, func.closure, func.env)
+            values = call_env.values
+            # Parameters take the first slots.
+            for slot, arg in enumerate(args[: len(func.arguments)]):
+                cell = values[slot]
+                if cell is None:
+                    values[slot] = arg
+                else:
+                    cell.value = arg
+
+        value = self.body_code(func)(call_env)
+        if type(value) is obj.ReturnObject:
+            return value.value
+        return value
+
+    def integer_literal(self, node: ast.IntegerLiteral, children: List[Code]) -> Code:
+        value = obj.IntegerObject(node.value)
+        return lambda env: value
+
+    def boolean_literal(self, node: ast.BooleanLiteral, children: List[Code]) -> Code:
+        value = obj.BooleanObject(node.value)
+        return lambda env: value
+
+    def string_literal(self, node: ast.StringLiteral, children: List[Code]) -> Code:
+        value = obj.StringObject(node.value)
+        return lambda env: value
+
+    def identifier(self, node: ast.Identifier, children: List[Code]) -> Code:
+        name = node.name
+        slot = node.slot
+
+        if node.scope == ast.UNRESOLVED:
+            return lambda env: env.get(name)
+
+        if node.scope == ast.LOCAL:
+
+            def local(env: Frame) -> obj.Object:
+                value = env.values[slot]
+                if value is None:
+                    return env.load(ast.LOCAL, slot, name)
+                return value
+
+            return local
+
+        if node.scope == ast.CELL:
+
+            def cell(env: Frame) -> obj.Object:
+                value = env.values[slot].value
+                if value is None:
+                    return env.load(ast.CELL, slot, name)
+                return value
+
+            return cell
+
+        def free(env: Frame) -> obj.Object:
+            value = env.closure[slot].value
+            if value is None:
+                return env.load(ast.FREE, slot, name)
+            return value
+
+        return free
+
+    def prefix(self, node: ast.PrefixExpression, children: List[Code]) -> Code:
+        (expr,) = children
+
+        if node.operator == "-":
+
+            def negate(env):
+                value = expr(env)
+                if type(value) is obj.IntegerObject:
+                    return obj.IntegerObject(-value.value)
+                if isinstance(value, obj.ErrorObject):
+                    return value
+                return obj.ErrorObject(
+                    f"unrecognized operator '-', got '{value.__class__.__name__}'"
+                )
+
+            return negate
+
+        if node.operator == "!":
+
+            def bang(env):
+                value = expr(env)
+                if type(value) is obj.IntegerObject:
+                    return obj.BooleanObject(value.value == 0)
+                if type(value) is obj.BooleanObject:
+                    return obj.BooleanObject(not value.value)
+                if isinstance(value, obj.ErrorObject):
+                    return value
+                return None
+
+            return bang
+
+        def unknown(env):
+            value = expr(env)
+            if isinstance(value, obj.ErrorObject):
+                return value
+            return obj.ErrorObject(
+                f"unrecognized operator '-', got '{value.__class__.__name__}'"
+            )
+
+        return unknown
+
+    def infix(self, node: ast.InfixExpression, children: List[Code]) -> Code:
+        left_code, right_code = children
+        operator = node.operator
+        operations = binary_operations(operator)
+
+        def infix(env):
+            left = left_code(env)
+            if isinstance(left, obj.ErrorObject):
+                return left
+            right = right_code(env)
+            if isinstance(right, obj.ErrorObject):
+                return right
+
+            by_right_type = operations.get(type(left))
+            if by_right_type is not None:
+                operation = by_right_type.get(type(right))
+                if operation is not None:
+                    return operation(left, right)
+            return binary_error(operator, left, right)
+
+        return infix
+
+    def let(self, node: ast.LetStatement, children: List[Code]) -> Code:
+        _, expr = children
+        ident = node.ident
+        name = ident.name
+        slot = ident.slot
+
+        if ident.scope == ast.UNRESOLVED:
+
+            def let(env):
+                value = expr(env)
+                if isinstance(value, obj.ErrorObject):
+                    return value
+                env.set(name, value)
+
+        elif ident.scope == ast.LOCAL:
+
+            def let(env):
+                value = expr(env)
+                if isinstance(value, obj.ErrorObject):
+                    return value
+                env.values[slot] = value
+
+        else:
+
+            def let(env):
+                value = expr(env)
+                if isinstance(value, obj.ErrorObject):
+                    return value
+                env.values[slot].value = value
+
+        return let
+
+    def return_statement(self, node: ast.ReturnStatement, children: List[Code]):
+        (expr,) = children
+
+        def return_statement(env):
+            value = expr(env)
+            if isinstance(value, obj.ErrorObject):
+                return value
+            return obj.ReturnObject(value)
+
+        return return_statement
+
+    def block(self, node: ast.BlockStatement, children: List[Code]) -> Code:
+        statements = tuple(children)
+
+        def block(env):
+            value = obj.NULL
+            for statement in statements:
+                value = statement(env)
+                if isinstance(value, (obj.ErrorObject, obj.ReturnObject)):
+                    return value
+            return value
+
+        return block
+
+    def lazy_block(self, node: ast.LazyBlockStatement, children: List[Code]) -> Code:
+        if node.parsed:
+            return self.block(node, children)
+
+        compiled: List[Code] = []
+
+        def lazy_block(env):
+            if not compiled:
+                try:
+                    node.statements
+                except DeferredParseError as exc:
+                    return obj.ErrorObject(f"{exc}")
+                compiled.append(
+                    self.block(node, [self.compile(s) for s in node.statements])
+                )
+            return compiled[0](env)
+
+        return lazy_block
+
+    def function(self, node: ast.Function, children: List[Code]) -> Code:
+        params = node.paramters
+        body = node.body
+        body_code = children[-1]
+        layout = node.layout
+
+        if layout is None:
+            return lambda env: obj.FunctionObject(params, body, env, code=body_code)
+
+        captures = layout.captures
+
+        def function(env):
+            # A resolved function only keeps the cells of the variables it uses.
+            if type(env) is Frame:
+                return obj.FunctionObject(
+                    params, body, env.env, layout, env.capture(captures), body_code
+                )
+            return obj.FunctionObject(params, body, env, layout, (), body_code)
+
+        return function
+
+    def call(self, node: ast.CallExpression, children: List[Code]) -> Code:
+        func_code = children[0]
+        arg_codes = tuple(children[1:])
+        call_function = self.call_function
+
+        def call(env):
+            func = func_code(env)
+            if isinstance(func, obj.ErrorObject):
+                return func
+
+            args: List[obj.Object] = []
+            for arg_code in arg_codes:
+                arg = arg_code(env)
+                if isinstance(arg, obj.ErrorObject):
+                    return arg
+                args.append(arg)
+
+            if not isinstance(func, obj.FunctionObject):
+                return obj.ErrorObject(f"not a function: '{func.__class__.__name__}'")
+
+            return call_function(func, args)
+
+        return call
+
+    def if_expression(self, node: ast.IfExpression, children: List[Code]) -> Code:
+        condition = children[0]
+        consequence = children[1]
+        alternative = children[2] if len(children) == 3 else None
+
+        def if_expression(env):
+            value = condition(env)
+            if isinstance(value, obj.ErrorObject):
+                return value
+            if is_truthy(value):
+                return consequence(env)
+            if alternative is not None:
+                return alternative(env)
+            return obj.NULL
+
+        return if_expression
+
+    def array_literal(self, node: ast.ArrayLiteral, children: List[Code]) -> Code:
+        expressions = tuple(children)
+
+        def array_literal(env):
+            elements = []
+            for expr in expressions:
+                value = expr(env)
+                if isinstance(value, obj.ErrorObject):
+                    return value
+                elements.append(value)
+            return obj.ArrayObject(elements)
+
+        return array_literal
+
+    def hash_literal(self, node: ast.HashLiteral, children: List[Code]) -> Code:
+        # Keys and values, one after the other.
+        expressions = tuple(children)
+
+        def hash_literal(env):
+            items = []
+            for expr in expressions:
+                value = expr(env)
+                if isinstance(value, obj.ErrorObject):
+                    return value
+                items.append(value)
+            return obj.build_hash(items)
+
+        return hash_literal
+
+    def index(self, node: ast.IndexExpression, children: List[Code]) -> Code:
+        left_code, index_code = children
+
+        def index(env):
+            left = left_code(env)
+            if isinstance(left, obj.ErrorObject):
+                return left
+            index = index_code(env)
+            if isinstance(index, obj.ErrorObject):
+                return index
+            return obj.index_value(left, index)
+
+        return index
+
+    def program(self, node: ast.Program, children: List[Code]) -> Code:
+        statements = tuple(children)
+
+        def program(env):
+            value = obj.NULL
+            for statement in statements:
+                value = statement(env)
+                if isinstance(value, obj.ErrorObject):
+                    return value
+                if isinstance(value, obj.ReturnObject):
+                    return value.value
+            return value
+
+        return program
+
+
+def is_truthy(value: Optional[obj.Object]) -> bool:
+    if type(value) is obj.BooleanObject:
+        return value.value is True
+    if type(value) is obj.IntegerObject:
+        return value.value != 0
+    return False
+
+
+def compile_program(program: ast.Program) -> Code:
+    return ClosureCompiler().compile(program)
@@ -1,7 +1,10 @@
 import abstract_syntaxt_tree as ast
 import object as obj
-from object import Environment
-from typing import Callable
+from object import Environment, Frame
+from operators import binary_error, binary_operations
+from tiny_parser import DeferredParseError
+from functools import partial
+from typing import Callable, Dict, List, Union
 
 DEBUG = True
 
@@ -27,32 +30,121 @@ def show_eval_info(depth: int, eval_name: str, node: ast.Node) -> None:
         print("".join(["\t"] * depth) + f" {eval_name} | node: {node}")
 
 
+# Evaluates a node: takes the evaluator, the node, the environment and the depth.
+Handler = Callable[["Evaluator", ast.Node, Environment, int], obj.Object]
+
+
 class Evaluator:
+    # Handler of each node type, or the name of the method handling it, so that
+    # subclasses can override it. Looked up by the exact class of the node.
+    handlers: Dict[type, Union[str, Handler]] = {
+        ast.Program: "eval_program",
+        ast.IntegerLiteral: "eval_integer_literal",
+        ast.BooleanLiteral: "eval_boolean_literal",
+        ast.StringLiteral: "eval_string_literal",
+        ast.PrefixExpression: "eval_prefix_expression",
+        ast.InfixExpression: "eval_infix_expression",
+        ast.IfExpression: "eval_if_expression",
+        ast.BlockStatement: "eval_block_statement",
+        ast.LazyBlockStatement: "eval_block_statement",
+        ast.ReturnStatement: "eval_return_statement",
+        ast.LetStatement: "eval_let_statement",
+        ast.Identifier: "eval_identifier",
+        ast.Function: "eval_function_literal",
+        ast.CallExpression: "eval_call_expression",
+        ast.ArrayLiteral: "eval_array_literal",
+        ast.HashLiteral: "eval_hash_literal",
+        ast.IndexExpression: "eval_index_expression",
+    }
+
+    # Method handling each node type in tail position of a function body, where
+    # a call is returned as a `TailCall` for the trampoline in `call_function`
+    # to make, rather than made. Other nodes are evaluated as anywhere else.
+    tail_handlers: Dict[type, str] = {
+        ast.CallExpression: "eval_tail_call",
+        ast.IfExpression: "eval_tail_if_expression",
+        ast.BlockStatement: "eval_tail_block_statement",
+        ast.LazyBlockStatement: "eval_tail_block_statement",
+        ast.ReturnStatement: "eval_tail_return_statement",
+    }
+
+    # Method handling each node type that is a statement of a function body, or
+    # of an `if` or block that is one, but not the last. Returns there leave
+    # the function with a tail call; returns inside expressions, whose value
+    # is used, do not.
+    statement_handlers: Dict[type, str] = {
+        ast.IfExpression: "eval_statement_if_expression",
+        ast.BlockStatement: "eval_statement_block_statement",
+        ast.LazyBlockStatement: "eval_statement_block_statement",
+        ast.ReturnStatement: "eval_tail_return_statement",
+    }
+
+    def __init__(self):
+        # Bound handler of each node type evaluated so far.
+        self.dispatch: Dict[
+            type, Callable[[ast.Node, Environment, int], obj.Object]
+        ] = {}
+        self.tail_dispatch: Dict[
+            type, Callable[[ast.Node, Environment, int], obj.Object]
+        ] = {
+            node_type: getattr(self, name)
+            for node_type, name in self.tail_handlers.items()
+        }
+        self.statement_dispatch: Dict[
+            type, Callable[[ast.Node, Environment, int], obj.Object]
+        ] = {
+            node_type: getattr(self, name)
+            for node_type, name in self.statement_handlers.items()
+        }
+
+    @classmethod
+    def register(cls, node_type: type, handler: Union[str, Handler]) -> None:
+        """
+        Evaluate nodes of `node_type` with `handler`, in evaluators of this class
+        and its subclasses created from now on.
+        """
+        if "handlers" not in cls.__dict__:
+            cls.handlers = dict(cls.handlers)
+        cls.handlers[node_type] = handler
+
     def eval(self, node: ast.Node, env: Environment, depth: int = 0) -> obj.Object:
-        if isinstance(node, ast.Program):
-            return self.eval_program(node, env, depth)
-        if isinstance(node, ast.IntegerLiteral):
-            return self.eval_integer_literal(node, env, depth)
-        if isinstance(node, ast.BooleanLiteral):
-            return self.eval_boolean_literal(node, env, depth)
-        if isinstance(node, ast.StringLiteral):
-            return self.eval_string_literal(node, env, depth)
-        if isinstance(node, ast.PrefixExpression):
-            return self.eval_prefix_expression(node, env, depth)
-        if isinstance(node, ast.InfixExpression):
-            return self.eval_infix_expression(node, env, depth)
-        if isinstance(node, ast.IfExpression):
-            return self.eval_if_expression(node, env, depth)
-        if isinstance(node, ast.BlockStatement):
-            return self.eval_block_statement(node, env, depth)
-        if isinstance(node, ast.ReturnStatement):
-            return self.eval_return_statement(node, env, depth)
-        if isinstance(node, ast.LetStatement):
-            return self.eval_let_statement(node, env, depth)
-        if isinstance(node, ast.Identifier):
-            return self.eval_identifier(node, env, depth)
-        if isinstance(node, ast.Function):
-            return self.eval_function_literal(node, env, depth)
+        handler = self.dispatch.get(node.__class__)
+        if handler is None:
+            handler = self.find_handler(node.__class__)
+        return handler(node, env, depth)
+
+    def eval_tail(self, node: ast.Node, env: Environment, depth: int = 0) -> obj.Object:
+        handler = self.tail_dispatch.get(node.__class__)
+        if handler is None:
+            return self.eval(node, env, depth)
+        return handler(node, env, depth)
+
+    def eval_statement(
+        self, node: ast.Node, env: Environment, depth: int = 0
+    ) -> obj.Object:
+        handler = self.statement_dispatch.get(node.__class__)
+        if handler is None:
+            return self.eval(node, env, depth)
+        return handler(node, env, depth)
+
+    def find_handler(
+        self, node_type: type
+    ) -> Callable[[ast.Node, Environment, int], obj.Object]:
+        # Nodes of classes without a handler of their own are evaluated like
+        # their closest base class that has one.
+        for cls in node_type.__mro__:
+            handler = self.handlers.get(cls)
+            if handler is not None:
+                break
+        else:
+            raise TypeError(f"no handler for node type '{node_type.__name__}'")
+
+        if isinstance(handler, str):
+            bound = getattr(self, handler)
+        else:
+            bound = partial(handler, self)
+        self.dispatch[node_type] = bound
+        return bound
 
     @debug("PROGRAM")
     def eval_program(self, program: ast.Program, env: Environment, depth: int):
@@ -75,7 +167,13 @@ class Evaluator:
     ) -> obj.Object:
         res_or_err: obj.Object = obj.NULL
 
-        for stmt in block.statements:
+        try:
+            statements = block.statements
+        except DeferredParseError as exc:
+            # A lazily parsed function body that does not parse.
+            return obj.ErrorObject(f"{exc}")
+
+        for stmt in statements:
             res_or_err = self.eval(stmt, env, depth)
 
             if isinstance(res_or_err, obj.ErrorObject) or isinstance(
@@ -85,6 +183,46 @@ class Evaluator:
 
         return res_or_err
 
+    @debug("TAIL BLOCK STMT")
+    def eval_tail_block_statement(
+        self, block: ast.BlockStatement, env: Environment, depth: int
+    ) -> obj.Object:
+        return self.eval_function_block(block, env, depth, self.eval_tail)
+
+    @debug("STATEMENT BLOCK STMT")
+    def eval_statement_block_statement(
+        self, block: ast.BlockStatement, env: Environment, depth: int
+    ) -> obj.Object:
+        return self.eval_function_block(block, env, depth, self.eval_statement)
+
+    def eval_function_block(
+        self,
+        block: ast.BlockStatement,
+        env: Environment,
+        depth: int,
+        eval_last: Callable[[ast.Node, Environment, int], obj.Object],
+    ) -> obj.Object:
+        """
+        Evaluate a block of a function body, whose statements may leave the
+        function with a tail call, the last one with `eval_last`.
+        """
+        try:
+            statements = block.statements
+        except DeferredParseError as exc:
+            return obj.ErrorObject(f"{exc}")
+
+        if not statements:
+            return obj.NULL
+        for i in range(len(statements) - 1):
+            res_or_err = self.eval_statement(statements[i], env, depth)
+
+            if isinstance(res_or_err, obj.ErrorObject) or isinstance(
+                res_or_err, obj.ReturnObject
+            ):
+                return res_or_err
+
+        return eval_last(statements[-1], env, depth)
+
     @debug("RETURN")
     def eval_return_statement(
         self, return_stmt: ast.ReturnStatement, env: Environment, depth: int
@@ -95,6 +233,17 @@ class Evaluator:
 
         return obj.ReturnObject(res)
 
+    @debug("TAIL RETURN")
+    def eval_tail_return_statement(
+        self, return_stmt: ast.ReturnStatement, env: Environment, depth: int
+    ) -> obj.Object:
+        # Leaves the function, so its expression is in tail position.
+        res = self.eval_tail(return_stmt.expr, env, depth + 1)
+        if isinstance(res, obj.ErrorObject):
+            return res
+
+        return obj.ReturnObject(res)
+
     @debug("LET")
     def eval_let_statement(
         self, let_stmt: ast.LetStatement, env: Environment, depth: int
@@ -103,19 +252,114 @@ class Evaluator:
         if isinstance(res, obj.ErrorObject):
             return res
 
-        env.set(let_stmt.ident.name, res)
+        ident = let_stmt.ident
+        if ident.scope == ast.UNRESOLVED:
+            env.set(ident.name, res)
+        else:
+            env.store(ident.scope, ident.slot, res)
 
     @debug("FUNCTION")
     def eval_function_literal(
         self, func: ast.Function, env: Environment, depth: int
     ) -> obj.Object:
-        return obj.FunctionObject(func.paramters, func.body, env)
+        if func.layout is None:
+            return obj.FunctionObject(func.paramters, func.body, env)
+
+        # A resolved function only keeps the cells of the variables it uses.
+        if isinstance(env, Frame):
+            closure = env.capture(func.layout.captures)
+            env = env.env
+        else:
+            closure = ()
+        return obj.FunctionObject(func.paramters, func.body, env, func.layout, closure)
+
+    @debug("CALL")
+    def eval_call_expression(
+        self, call: ast.CallExpression, env: Environment, depth: int
+    ) -> obj.Object:
+        func = self.eval(call.func, env, depth + 1)
+        if isinstance(func, obj.ErrorObject):
+            return func
+
+        args: List[obj.Object] = []
+        for arg in call.arguments:
+            res = self.eval(arg, env, depth + 1)
+            if isinstance(res, obj.ErrorObject):
+                return res
+            args.append(res)
+
+        if not isinstance(func, obj.FunctionObject):
+            return obj.ErrorObject(f"not a function: '{func.__class__.__name__}'")
+
+        return self.call_function(func, args, depth)
+
+    @debug("TAIL CALL")
+    def eval_tail_call(
+        self, call: ast.CallExpression, env: Environment, depth: int
+    ) -> obj.Object:
+        func = self.eval(call.func, env, depth + 1)
+        if isinstance(func, obj.ErrorObject):
+            return func
+
+        args: List[obj.Object] = []
+        for arg in call.arguments:
+            res = self.eval(arg, env, depth + 1)
+            if isinstance(res, obj.ErrorObject):
+                return res
+            args.append(res)
+
+        if not isinstance(func, obj.FunctionObject):
+            return obj.ErrorObject(f"not a function: '{func.__class__.__name__}'")
+
+        return obj.TailCall(func, args)
+
+    def call_function(
+        self, func: obj.FunctionObject, args: List[obj.Object], depth: int
+    ) -> obj.Object:
+        """
+        Call `func`, then each function called in tail position of the last
+        one, in turn. Tail calls thus take no Python stack, and tiny loops
+        written as tail recursion run in constant space.
+        """
+        res = self.run_function(func, args, depth)
+        while isinstance(res, obj.TailCall):
+            res = self.run_function(res.function, res.args, depth)
+        return res
+
+    def run_function(
+        self, func: obj.FunctionObject, args: List[obj.Object], depth: int
+    ) -> obj.Object:
+        """
+        Evaluate the body of `func`, up to the call in its tail position, if
+        any, which is returned as a `TailCall`.
+        """
+        call_env: Union[Environment, Frame]
+        if func.layout is None:
+            call_env = Environment.create_enclosed_environment(func.env)
+            for param, arg in zip(func.arguments, args):
+                call_env.set(param.name, arg)
+        else:
+            call_env = Frame(func.layout, func.closure, func.env)
+            # Parameters take the first slots.
+            for slot, arg in enumerate(args[: len(func.arguments)]):
+                cell = call_env.values[slot]
+                if cell is None:
+                    call_env.values[slot] = arg
+                else:
+                    cell.value = arg
+
+        res = self.eval_tail(func.body, call_env, depth + 1)
+        if isinstance(res, obj.ReturnObject):
+            return res.value
+        return res
 
     @debug("IDENT")
     def eval_identifier(
         self, ident: ast.Identifier, env: Environment, depth: int
     ) -> obj.Object:
-        return env.get(ident.name)
+        if ident.scope == ast.UNRESOLVED:
+            return env.get(ident.name)
+        return env.load(ident.scope, ident.slot, ident.name)
 
     @debug("IF EXPR")
     def eval_if_expression(
@@ -132,6 +376,36 @@ class Evaluator:
         else:
             return obj.NULL
 
+    @debug("TAIL IF EXPR")
+    def eval_tail_if_expression(
+        self, if_expr: ast.IfExpression, env: Environment, depth: int
+    ) -> obj.Object:
+        return self.eval_function_if(if_expr, env, depth, self.eval_tail)
+
+    @debug("STATEMENT IF EXPR")
+    def eval_statement_if_expression(
+        self, if_expr: ast.IfExpression, env: Environment, depth: int
+    ) -> obj.Object:
+        return self.eval_function_if(if_expr, env, depth, self.eval_statement)
+
+    def eval_function_if(
+        self,
+        if_expr: ast.IfExpression,
+        env: Environment,
+        depth: int,
+        eval_branch: Callable[[ast.Node, Environment, int], obj.Object],
+    ) -> obj.Object:
+        cond = self.eval(if_expr.condition, env, depth + 1)
+        if isinstance(cond, obj.ErrorObject):
+            return cond
+
+        if Evaluator.is_truthy(cond):
+            return eval_branch(if_expr.consequence, env, depth + 1)
+        elif if_expr.alternative is not None:
+            return eval_branch(if_expr.alternative, env, depth + 1)
+        else:
+            return obj.NULL
+
     @debug("PREFIX")
     def eval_prefix_expression(
         self, prefix_expr: ast.PrefixExpression, env: Environment, depth: int
@@ -171,77 +445,54 @@ class Evaluator:
         if isinstance(right, obj.ErrorObject):
             return right
 
-        if left.__class__.__name__ != right.__class__.__name__:
-            return obj.ErrorObject(
-                f"type mismatch, got '{left.__class__.__name__}' and '{right.__class__.__name__}'"
-            )
-
-        if infix_expr.operator == "+":
-            if isinstance(left, obj.IntegerObject):
-                return obj.IntegerObject(left.value + right.value)
-            elif isinstance(left, obj.StringObject):
-                return obj.StringObject(left.value + right.value)
-            else:
-                return obj.ErrorObject(
-                    f"unrecognized operator '-', got '{left.__class__.__name__}' and '{right.__class__.__name__}'"
-                )
-        elif infix_expr.operator == "-":
-            if isinstance(left, obj.IntegerObject):
-                return obj.IntegerObject(left.value - right.value)
-            else:
-                return obj.ErrorObject(
-                    f"unrecognized operator '-', got '{left.__class__.__name__}' and '{right.__class__.__name__}'"
-                )
-        elif infix_expr.operator == "/":
-            if isinstance(left, obj.IntegerObject):
-                return obj.IntegerObject(left.value / right.value)
-            else:
-                return obj.ErrorObject(
-                    f"unrecognized operator '/', got '{left.__class__.__name__}' and '{right.__class__.__name__}'"
-                )
-        elif infix_expr.operator == "*":
-            if isinstance(left, obj.IntegerObject):
-                return obj.IntegerObject(left.value * right.value)
-            else:
-                return obj.ErrorObject(
-                    f"unrecognized operator '*', got '{left.__class__.__name__}' and '{right.__class__.__name__}'"
-                )
-        elif infix_expr.operator == "==":
-            if (
-                isinstance(left, obj.IntegerObject)
-                or isinstance(left, obj.BooleanObject)
-                or isinstance(left, obj.StringObject)
-            ):
-                return obj.BooleanObject(left.value == right.value)
-            else:
-                return obj.ErrorObject(
-                    f"unrecognized operator '==', got '{left.__class__.__name__}' and '{right.__class__.__name__}'"
-                )
-        elif infix_expr.operator == "!=":
-            if (
-                isinstance(left, obj.IntegerObject)
-                or isinstance(left, obj.BooleanObject)
-                or isinstance(left, obj.StringObject)
-            ):
-                return obj.BooleanObject(left.value != right.value)
-            else:
-                return obj.ErrorObject(
-                    f"unrecognized operator '!=', got '{left.__class__.__name__}' and '{right.__class__.__name__}'"
-                )
-        elif infix_expr.operator == "<":
-            if isinstance(left, obj.IntegerObject):
-                return obj.BooleanObject(left.value < right.value)
-            else:
-                return obj.ErrorObject(
-                    f"unrecognized operator '<', got '{left.__class__.__name__}' and '{right.__class__.__name__}'"
-                )
-        elif infix_expr.operator == ">":
-            if isinstance(left, obj.IntegerObject):
-                return obj.BooleanObject(left.value > right.value)
-            else:
-                return obj.ErrorObject(
-                    f"unrecognized operator '>', got '{left.__class__.__name__}' and '{right.__class__.__name__}'"
-                )
+        # The operator is looked up once per expression; operations are then
+        # selected by the types of the operands alone.
+        operations = infix_expr.operations
+        if operations is None:
+            operations = infix_expr.operations = binary_operations(infix_expr.operator)
+        by_right_type = operations.get(left.__class__)
+        if by_right_type is not None:
+            operation = by_right_type.get(right.__class__)
+            if operation is not None:
+                return operation(left, right)
+        return binary_error(infix_expr.operator, left, right)
+
+    @debug("ARRAY")
+    def eval_array_literal(
+        self, array: ast.ArrayLiteral, env: Environment, depth: int
+    ) -> obj.Object:
+        elements: List[obj.Object] = []
+        for expr in array.expressions:
+            res = self.eval(expr, env, depth + 1)
+            if isinstance(res, obj.ErrorObject):
+                return res
+            elements.append(res)
+        return obj.ArrayObject(elements)
+
+    @debug("HASH")
+    def eval_hash_literal(
+        self, hash_literal: ast.HashLiteral, env: Environment, depth: int
+    ) -> obj.Object:
+        items: List[obj.Object] = []
+        for pair in hash_literal.pairs.items():
+            for expr in pair:
+                res = self.eval(expr, env, depth + 1)
+                if isinstance(res, obj.ErrorObject):
+                    return res
+                items.append(res)
+        return obj.build_hash(items)
+
+    @debug("INDEX")
+    def eval_index_expression(
+        self, index_expr: ast.IndexExpression, env: Environment, depth: int
+    ) -> obj.Object:
+        left = self.eval(index_expr.left_expr, env, depth + 1)
+        if isinstance(left, obj.ErrorObject):
+            return left
+        index = self.eval(index_expr.index, env, depth + 1)
+        if isinstance(index, obj.ErrorObject):
+            return index
+        return obj.index_value(left, index)
 
     @debug("INTEGER")
     def eval_integer_literal(
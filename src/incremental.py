@@ -0,0 +1,184 @@
+from bisect import bisect_left, bisect_right
+from typing import List, Union
+
+import abstract_syntaxt_tree as ast
+from lexer import Lexer, LineIndex, TokenType
+from tiny_parser import ParseError, Parser
+
+# The parser looks at most two tokens past the end of a statement, and every
+# statement is at least one token long. Re-parsing starts this many statements
+# before the one containing an edit, so no statement kept as is could have seen
+# the edited text.
+LOOKAHEAD_STATEMENTS = 3
+
+# Positions of replaced statements are left in the document's position table.
+# Once it has grown this many times over since the source was last parsed as a
+# whole, the next edit parses it all again into a new table.
+POSITIONS_GROWTH = 2
+
+
+class Document:
+    """
+    A source together with its parsed top-level statements, updated in place by
+    `edit`. An edit re-lexes and re-parses the text from a few statements before
+    the edit until the parser reaches the start of a statement that lies after the
+    edit and is unchanged; from there on the old tokens would be the same, so the
+    old statements are reused as they are.
+
+    Tokens of reused statements keep reporting correct positions: the line index
+    they were lexed with forwards lookups to the index of the edited source. All
+    statements record their tokens in one position table, shared with `program`.
+    """
+
+    def __init__(self, source: str = ""):
+        self.source = ""
+        self.line_index = LineIndex()
+        # Offset of the first token of each top-level statement and the statement
+        # itself, or the error it failed with.
+        self.starts: List[int] = []
+        self.statements: List[Union[ast.Node, ParseError]] = []
+        # Indexes of the statements that are errors, in order.
+        self.error_indexes: List[int] = []
+        self.positions = ast.PositionTable()
+        self.first_position = ast.NO_POSITION
+        # Size of the position table after the last parse of the whole source.
+        self.full_parse_positions = 0
+        # Number of quotes in `source`, kept up to date by `edit` instead of
+        # counting them in the whole source every time.
+        self.quotes = 0
+        # Number of statements parsed by the last edit.
+        self.reparsed = 0
+
+        self.edit(0, 0, source)
+
+    @property
+    def program(self) -> ast.Program:
+        return ast.Program(
+            self.first_position,
+            [stmt for stmt in self.statements if not isinstance(stmt, ParseError)],
+            self.positions,
+        )
+
+    @property
+    def errors(self) -> List[ParseError]:
+        return [self.statements[i] for i in self.error_indexes]
+
+    def edit(self, offset: int, deleted: int, inserted: str) -> None:
+        """
+        Replace `deleted` characters at `offset` with `inserted`.
+        """
+        old_source = self.source
+        old_starts = self.starts
+        old_index = self.line_index
+
+        source = old_source[:offset] + inserted + old_source[offset + deleted :]
+        delta = len(inserted) - deleted
+        edit_end = offset + deleted
+
+        first = self.first_affected(offset)
+        quotes = (
+            self.quotes - old_source.count('"', offset, edit_end) + inserted.count('"')
+        )
+        if self.quotes % 2:
+            # The last quote is unterminated and lexed as an illegal token, until an
+            # edit after it adds a closing quote.
+            first = min(first, self.first_affected(old_source.rfind('"')))
+        full_parse = len(self.positions) >= POSITIONS_GROWTH * self.full_parse_positions
+        if full_parse:
+            self.positions = ast.PositionTable()
+            first = 0
+        region_start = old_starts[first] if first > 0 else 0
+
+        line_index = LineIndex()
+        line_index.starts = old_index.starts[
+            : bisect_right(old_index.starts, region_start)
+        ]
+
+        parser = Parser(
+            Lexer(source[region_start:], region_start, line_index),
+            positions=self.positions,
+        )
+        if first == 0:
+            self.first_position = self.positions.add(parser.cur_token)
+
+        starts = old_starts[:first]
+        statements = self.statements[:first]
+        error_indexes = self.error_indexes[: bisect_left(self.error_indexes, first)]
+        # Old statements after the edit, candidates for resuming the old parse.
+        candidate = len(old_starts) if full_parse else bisect_left(old_starts, edit_end)
+        resume = None
+
+        while parser.cur_token.token_type != TokenType.Eof:
+            start = parser.cur_token.start
+            while candidate < len(old_starts) and old_starts[candidate] + delta < start:
+                candidate += 1
+            if candidate < len(old_starts) and old_starts[candidate] + delta == start:
+                resume = candidate
+                break
+
+            starts.append(start)
+            stmt = parser.parse_next_statement(depth=0)
+            if isinstance(stmt, ParseError):
+                error_indexes.append(len(statements))
+            statements.append(stmt)
+
+        self.reparsed = len(statements) - first
+
+        if resume is not None:
+            # Drop lines the lexer found while looking ahead, and take the old ones.
+            resume_start = old_starts[resume]
+            del line_index.starts[
+                bisect_right(line_index.starts, resume_start + delta) :
+            ]
+            line_index.starts.extend(
+                [
+                    line_start + delta
+                    for line_start in old_index.starts[
+                        bisect_right(old_index.starts, resume_start) :
+                    ]
+                ]
+            )
+
+            starts.extend([start + delta for start in old_starts[resume:]])
+            statements.extend(self.statements[resume:])
+            reused_errors = bisect_left(self.error_indexes, resume)
+            shift = len(starts) - len(old_starts)
+            error_indexes.extend(
+                [i + shift for i in self.error_indexes[reused_errors:]]
+            )
+
+        old_index.forward_to(line_index, edit_end, delta)
+        self.source = source
+        self.quotes = quotes
+        self.line_index = line_index
+        self.starts = starts
+        self.statements = statements
+        self.error_indexes = error_indexes
+        if full_parse:
+            self.full_parse_positions = len(self.positions)
+
+        if resume is not None:
+            self.refresh_errors(len(starts) - len(old_starts) + resume)
+
+    def first_affected(self, offset: int) -> int:
+        """
+        Index of the first statement that has to be parsed again after an edit at
+        `offset`.
+        """
+        return max(bisect_right(self.starts, offset) - 1 - LOOKAHEAD_STATEMENTS, 0)
+
+    def refresh_errors(self, first: int) -> None:
+        """
+        Parse errors hold plain line and column numbers, so errors reused from
+        before the edit are parsed again to report their current position.
+        """
+        for i in self.error_indexes[bisect_left(self.error_indexes, first) :]:
+            start = self.starts[i]
+            line_index = LineIndex()
+            line_index.starts = self.line_index.starts[
+                : bisect_right(self.line_index.starts, start)
+            ]
+            parser = Parser(
+                Lexer(self.source[start:], start, line_index), positions=self.positions
+            )
+            self.statements[i] = parser.parse_next_statement(depth=0)
@@ -1,5 +1,14 @@
-from dataclasses import dataclass
+import codecs
+import mmap
+import re
+from array import array
+from bisect import bisect_right
 from enum import Enum, unique
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Bump whenever the tokens produced for a given source change, so that token
+# streams cached on disk by an older version are not reused.
+LEXER_VERSION = 2
 
 
 @unique
@@ -37,12 +46,82 @@ class TokenType(str, Enum):
     Colon = ":"
 
 
-@dataclass
+class LineIndex:
+    """
+    Offsets at which the lines of a source start, used to turn an offset into a
+    line and column only when a position is actually needed. Only newlines in
+    whitespace start a new line; newlines inside string literals do not.
+    """
+
+    def __init__(self):
+        self.starts = array("i", [0])
+        # Set by `forward_to` once the source has been edited.
+        self.target: Optional["LineIndex"] = None
+        self.edit_end = 0
+        self.delta = 0
+
+    def add_line(self, start: int) -> None:
+        self.starts.append(start)
+
+    def truncate(self, offset: int) -> None:
+        """
+        Forget the lines starting after `offset`.
+        """
+        del self.starts[bisect_right(self.starts, offset) :]
+
+    def forward_to(self, target: "LineIndex", edit_end: int, delta: int) -> None:
+        """
+        Resolve positions through `target`, the index of the source after an edit
+        that ended at `edit_end` and changed the length of the source by `delta`.
+        Offsets at or after `edit_end` move by `delta`, so tokens lexed before the
+        edit keep reporting correct positions.
+        """
+        self.target = target
+        self.edit_end = edit_end
+        self.delta = delta
+        self.starts = target.starts
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        index = self
+        while index.target is not None:
+            if offset >= index.edit_end:
+                offset += index.delta
+            index = index.target
+
+        line = bisect_right(index.starts, offset)
+        return line, offset - index.starts[line - 1] + 1
+
+
+class LineIndexView(LineIndex):
+    """
+    Index resolving positions through `index`, for lexing a part of a source
+    again whose lines `index` has already recorded.
+    """
+
+    def __init__(self, index: LineIndex):
+        super().__init__()
+        self.forward_to(index, 0, 0)
+
+    def add_line(self, start: int) -> None:
+        pass
+
+    def truncate(self, offset: int) -> None:
+        pass
+
+
 class Token:
-    line: int
-    column: int
-    token_type: TokenType
-    literal: str = ""
+    __slots__ = ("line", "column", "token_type", "literal")
+
+    def __init__(
+        self, line: int, column: int, token_type: TokenType, literal: str = ""
+    ):
+        self.line = line
+        self.column = column
+        self.token_type = token_type
+        self.literal = literal
+
+    def position(self) -> Tuple[int, int]:
+        return self.line, self.column
 
     def __eq__(self, other: "Token") -> bool:
         """
@@ -60,7 +139,448 @@ class Token:
         return self == other and self.column == other.column and self.line == other.line
 
 
+class SourceToken(Token):
+    """
+    Token produced by the lexers. Only the offset its position refers to is
+    stored; line and column are looked up in the source's `LineIndex` on access.
+    """
+
+    __slots__ = ("offset", "line_index")
+
+    def __init__(
+        self,
+        line_index: LineIndex,
+        offset: int,
+        token_type: TokenType,
+        literal: str = "",
+    ):
+        self.line_index = line_index
+        self.offset = offset
+        self.token_type = token_type
+        self.literal = literal
+
+    def position(self) -> Tuple[int, int]:
+        return self.line_index.position(self.offset)
+
+    @property
+    def line(self) -> int:
+        return self.line_index.position(self.offset)[0]
+
+    @property
+    def column(self) -> int:
+        return self.line_index.position(self.offset)[1]
+
+    @property
+    def start(self) -> int:
+        """
+        Offset of the first character of the token.
+        """
+        if self.token_type == TokenType.String:
+            return self.offset - len(self.literal) - 2
+        if self.token_type == TokenType.EQ or self.token_type == TokenType.NotEQ:
+            return self.offset - 1
+        return self.offset
+
+
+KEYWORDS: Dict[str, TokenType] = {
+    "let": TokenType.Let,
+    "return": TokenType.Return,
+    "if": TokenType.If,
+    "else": TokenType.Else,
+    "true": TokenType.TRUE,
+    "false": TokenType.FALSE,
+    "fn": TokenType.Function,
+}
+
+SYMBOLS: Dict[str, TokenType] = {
+    "==": TokenType.EQ,
+    "!=": TokenType.NotEQ,
+    "+": TokenType.Plus,
+    "-": TokenType.Minus,
+    "*": TokenType.Asterisk,
+    "/": TokenType.Slash,
+    "=": TokenType.Assign,
+    "!": TokenType.Bang,
+    ";": TokenType.Semicolon,
+    "(": TokenType.LParen,
+    ")": TokenType.RParen,
+    "{": TokenType.LBrace,
+    "}": TokenType.RBrace,
+    "[": TokenType.LBracket,
+    "]": TokenType.RBracket,
+    ",": TokenType.Comma,
+    "<": TokenType.LT,
+    ">": TokenType.GT,
+    ":": TokenType.Colon,
+}
+
+# Each match is one token together with the spaces and tabs in front of it. Runs
+# of whitespace containing newlines are their own matches so that the scanner can
+# record where lines start. Anything else that is not whitespace ends up as
+# `illegal`.
+TOKEN_PATTERN = re.compile(
+    r"""
+    [ \t]*(?:
+        (?P<newline>\n[ \t\n]*)
+        | (?P<integer>\d+)
+        | (?P<identifier>[^\W\d]\w*)
+        | "(?P<string>[^"]*)"
+        | (?P<symbol>==|!=|[-+*/=!;(){}\[\],<>:])
+        | (?P<illegal>[^ \t\n])
+    )
+    """,
+    re.VERBOSE,
+)
+
+
+# Braces outside of string literals, and the newlines that start lines.
+BRACE_PATTERN = re.compile(r'"[^"]*"|[{}\n]')
+
+
+def add_lines(line_index: LineIndex, newlines: str, offset: int) -> None:
+    """
+    Record the lines started by the whitespace run `newlines` found at `offset`.
+    """
+    index = newlines.find("\n")
+    while index >= 0:
+        line_index.add_line(offset + index + 1)
+        index = newlines.find("\n", index + 1)
+
+
+def tokenize(
+    chunks: Iterable[str], line_index: LineIndex, offset: int = 0
+) -> Iterator[Token]:
+    """
+    Turn the concatenation of `chunks`, found at `offset` of the source, into
+    tokens, recording line starts in `line_index`. Tokens may span chunk
+    boundaries: a match touching the end of the buffered text (or an opening
+    quote whose closing quote has not been read yet) is held back until the
+    next chunk arrives, so only the unfinished tail of the text is kept in
+    memory.
+
+    Positions follow `CharLexer`: two-character operators point at their second
+    character and strings right after the closing quote. After the input is
+    exhausted, EOF tokens are produced indefinitely, one column further each time.
+    """
+    base = offset  # offset of `buffer[0]` within the whole input
+    buffer = ""
+
+    chunks = iter(chunks)
+    pending = next(chunks, None)
+    while pending is not None:
+        buffer += pending
+        pending = next(chunks, None)
+        final = pending is None
+        size = len(buffer)
+        consumed = 0
+
+        for match in TOKEN_PATTERN.finditer(buffer):
+            kind = match.lastgroup
+            if not final and (
+                match.end() == size or (kind == "illegal" and match.group(kind) == '"')
+            ):
+                break
+            consumed = match.end()
+
+            if kind == "newline":
+                add_lines(line_index, match.group(kind), base + match.start(kind))
+                continue
+
+            start = base + match.start(kind)
+            if kind == "identifier":
+                ident = match.group(kind)
+                token_type = KEYWORDS.get(ident)
+                if token_type:
+                    yield SourceToken(line_index, start, token_type)
+                else:
+                    yield SourceToken(line_index, start, TokenType.Ident, ident)
+            elif kind == "symbol":
+                symbol = match.group(kind)
+                yield SourceToken(line_index, start + len(symbol) - 1, SYMBOLS[symbol])
+            elif kind == "integer":
+                yield SourceToken(line_index, start, TokenType.Int, match.group(kind))
+            elif kind == "string":
+                yield SourceToken(
+                    line_index, base + match.end(), TokenType.String, match.group(kind)
+                )
+            else:
+                yield SourceToken(
+                    line_index, start, TokenType.Illegal, match.group(kind)
+                )
+
+        buffer = buffer[consumed:]
+        base += consumed
+
+    offset = base + len(buffer)
+    while True:
+        yield SourceToken(line_index, offset, TokenType.Eof)
+        offset += 1
+
+
+def read_chunks(
+    source: Union[IO, mmap.mmap], chunk_size: int, encoding: str = "utf-8"
+) -> Iterator[str]:
+    """
+    Read `source` in pieces of `chunk_size`. Sources producing bytes (binary files,
+    `mmap`) are decoded incrementally, so multi-byte characters may be split
+    between reads.
+    """
+    decoder = None
+    while True:
+        data = source.read(chunk_size)
+        if not data:
+            break
+        if isinstance(data, str):
+            yield data
+            continue
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder(encoding)()
+        yield decoder.decode(data)
+
+    if decoder is not None:
+        yield decoder.decode(b"", final=True)
+
+
 class Lexer:
+    """
+    Tokenizer driven by `TOKEN_PATTERN`. Whole identifiers, integers, strings and
+    whitespace runs are consumed by a single regex match instead of character by
+    character.
+
+    Produces the same tokens and positions as `CharLexer`: columns restart only on
+    newlines found in whitespace, two-character operators report the column of
+    their second character and strings report the column right after the closing
+    quote.
+    """
+
+    def __init__(
+        self, input: str, offset: int = 0, line_index: Optional[LineIndex] = None
+    ):
+        """
+        `input` may be a slice of a larger source starting at `offset`, in which
+        case lines are recorded in that source's `line_index`.
+        """
+        self.input = input
+        self.offset = offset
+        self.line_index = line_index or LineIndex()
+        self.start(tokenize((input,), self.line_index, offset))
+
+    def start(self, tokens: Iterator[Token]) -> None:
+        self.tokens = tokens
+        # Hand out tokens straight from the generator, without an extra call frame.
+        self.next_token = self.tokens.__next__
+
+    def next_token(self) -> Token:
+        return next(self.tokens)
+
+    def match_brace(self, offset: int) -> int:
+        """
+        Find the `}` matching the `{` at `offset` of the source without producing
+        tokens for anything in between, and resume lexing right after it. Returns
+        the offset of that `}`, or -1 when there is none and lexing resumes at the
+        end of the input.
+        """
+        # Lines after the brace may have been recorded while lexing ahead.
+        self.line_index.truncate(offset)
+
+        end = len(self.input)
+        nesting = 0
+        for match in BRACE_PATTERN.finditer(self.input, offset - self.offset):
+            char = match.group()
+            if char == "{":
+                nesting += 1
+            elif char == "}":
+                nesting -= 1
+                if nesting == 0:
+                    end = match.start()
+                    break
+            elif char == "\n":
+                self.line_index.add_line(self.offset + match.end())
+
+        resume = min(end + 1, len(self.input))
+        self.start(
+            tokenize((self.input[resume:],), self.line_index, self.offset + resume)
+        )
+        return self.offset + end if end < len(self.input) else -1
+
+    def __iter__(self) -> Iterator[Token]:
+        """
+        Iterate over the remaining tokens, up to and including the first EOF.
+        """
+        while True:
+            tok = self.next_token()
+            yield tok
+            if tok.token_type == TokenType.Eof:
+                return
+
+
+class StreamLexer(Lexer):
+    """
+    Lexer over a file object, `mmap` or anything else with a `read(size)` method.
+    The source is read `chunk_size` characters (or bytes) at a time, so memory use
+    is bounded by the chunk size and the longest token rather than by the size of
+    the source (apart from the line index, which holds one offset per line).
+    """
+
+    def __init__(
+        self,
+        source: Union[IO, mmap.mmap],
+        chunk_size: int = 64 * 1024,
+        encoding: str = "utf-8",
+    ):
+        self.source = source
+        self.line_index = LineIndex()
+        self.start(tokenize(read_chunks(source, chunk_size, encoding), self.line_index))
+
+
+# Token types are stored in `TokenStream` as their index in this list.
+TOKEN_TYPES: List[TokenType] = list(TokenType)
+TOKEN_CODES: Dict[TokenType, int] = {
+    token_type: code for code, token_type in enumerate(TOKEN_TYPES)
+}
+
+
+class TokenStream:
+    """
+    Tokens of a whole source packed into parallel `array('i')` columns: token type
+    code, and start offset and length of the token text. Literals are sliced out
+    of `source`, and positions looked up in `line_index`, only when a `Token` is
+    built. The last entry is always the EOF token.
+    """
+
+    COLUMNS = ("types", "starts", "lengths")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.types = array("i")
+        self.starts = array("i")
+        self.lengths = array("i")
+        self.line_index = LineIndex()
+
+    @classmethod
+    def from_source(cls, source: str) -> "TokenStream":
+        stream = cls(source)
+        stream.scan(source)
+        stream.add_eof()
+        return stream
+
+    def scan(self, text: str, base: int = 0) -> None:
+        """
+        Append the tokens of `text`, found at offset `base` of the source, and the
+        lines starting in it. No EOF token is added.
+        """
+        append_type = self.types.append
+        append_start = self.starts.append
+        append_length = self.lengths.append
+        line_index = self.line_index
+
+        ident_code = TOKEN_CODES[TokenType.Ident]
+        int_code = TOKEN_CODES[TokenType.Int]
+        string_code = TOKEN_CODES[TokenType.String]
+        illegal_code = TOKEN_CODES[TokenType.Illegal]
+        keyword_codes = {ident: TOKEN_CODES[t] for ident, t in KEYWORDS.items()}
+        symbol_codes = {symbol: TOKEN_CODES[t] for symbol, t in SYMBOLS.items()}
+
+        for match in TOKEN_PATTERN.finditer(text):
+            kind = match.lastgroup
+            start = match.start(kind)
+            if kind == "newline":
+                add_lines(line_index, match.group(kind), base + start)
+                continue
+
+            length = match.end() - start
+            if kind == "identifier":
+                append_type(keyword_codes.get(match.group(kind), ident_code))
+            elif kind == "symbol":
+                append_type(symbol_codes[match.group(kind)])
+            elif kind == "integer":
+                append_type(int_code)
+            elif kind == "string":
+                # Keep the whole literal, including both quotes.
+                append_type(string_code)
+                start -= 1
+                length += 1
+            else:
+                append_type(illegal_code)
+
+            append_start(base + start)
+            append_length(length)
+
+    def add_eof(self) -> None:
+        self.types.append(TOKEN_CODES[TokenType.Eof])
+        self.starts.append(len(self.source))
+        self.lengths.append(0)
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def token_type(self, index: int) -> TokenType:
+        return TOKEN_TYPES[self.types[index]]
+
+    def literal(self, index: int) -> str:
+        token_type = TOKEN_TYPES[self.types[index]]
+        start = self.starts[index]
+        if token_type == TokenType.String:
+            return self.source[start + 1 : start + self.lengths[index] - 1]
+        if (
+            token_type == TokenType.Ident
+            or token_type == TokenType.Int
+            or token_type == TokenType.Illegal
+        ):
+            return self.source[start : start + self.lengths[index]]
+        return ""
+
+    def offset(self, index: int) -> int:
+        """
+        Offset the reported position of the token refers to.
+        """
+        token_type = TOKEN_TYPES[self.types[index]]
+        if token_type == TokenType.String:
+            return self.starts[index] + self.lengths[index]
+        if token_type == TokenType.EQ or token_type == TokenType.NotEQ:
+            return self.starts[index] + 1
+        return self.starts[index]
+
+    def __getitem__(self, index: int) -> Token:
+        return SourceToken(
+            self.line_index,
+            self.offset(index),
+            TOKEN_TYPES[self.types[index]],
+            self.literal(index),
+        )
+
+    def reader(self) -> "TokenReader":
+        return TokenReader(self)
+
+
+class TokenReader:
+    """
+    Cursor over a `TokenStream` with the same `next_token` interface as `Lexer`,
+    building `Token` objects one at a time as the parser asks for them.
+    """
+
+    def __init__(self, stream: TokenStream):
+        self.stream = stream
+        self.index = 0
+
+    def next_token(self) -> Token:
+        last = len(self.stream) - 1
+        if self.index < last:
+            tok = self.stream[self.index]
+        else:
+            # Reading past the end keeps producing EOF tokens, like `Lexer` does.
+            tok = self.stream[last]
+            tok.offset += self.index - last
+        self.index += 1
+        return tok
+
+
+class CharLexer:
+    """
+    Reference lexer that walks the input one character at a time. Kept to check
+    `Lexer` against and as the baseline for the lexer benchmark.
+    """
+
     def __init__(self, input: str):
         self.position = 0
         self.read_position = 0
@@ -148,7 +668,6 @@ class Lexer:
 
         self.read_char()
         string = self.input[position : self.position - 1]
-        print(string)
         return Token(self.line, self.column, TokenType.String, string)
 
     def next_token(self) -> Token:
@@ -1,8 +1,8 @@
 from abc import ABC
 from dataclasses import dataclass
-from typing import List
+from typing import Callable, List
 import abstract_syntaxt_tree as ast
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple, Union
 
 
 class Object(ABC):
@@ -33,6 +33,102 @@ class Environment:
         return Environment(outer_env)
 
 
+class Cell:
+    """
+    Variable of a frame that nested functions capture, shared by the frame and
+    the closures of those functions.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Optional[Object] = None):
+        self.value = value
+
+
+class Frame:
+    """
+    Variables of one call of a function resolved by `resolver`, kept in a list
+    indexed by the slots the resolver gave them, next to the cells the
+    function's closure captured. `env` is the environment the function was
+    defined in, where names that are not variables of any enclosing function are
+    looked up.
+    """
+
+    __slots__ = ("values", "closure", "fallbacks", "env")
+
+    def __init__(
+        self,
+        layout: ast.FrameLayout,
+        closure: Tuple[Cell, ...],
+        env: Environment,
+    ):
+        # None for variables that were not assigned yet.
+        self.values: List[Optional[Union[Object, Cell]]] = [None] * len(layout.names)
+        for slot in layout.cells:
+            self.values[slot] = Cell()
+        self.closure = closure
+        self.fallbacks = layout.fallbacks
+        self.env = env
+
+    @classmethod
+    def over(
+        cls,
+        values: List[Optional[Union[Object, Cell]]],
+        closure: Tuple[Cell, ...],
+        layout: ast.FrameLayout,
+        env: Environment,
+    ) -> "Frame":
+        """
+        Frame of `values` laid out by `layout`, for code that keeps the values of
+        its calls in lists of its own, like `vm.VM`.
+        """
+        frame = cls.__new__(cls)
+        frame.values = values
+        frame.closure = closure
+        frame.fallbacks = layout.fallbacks
+        frame.env = env
+        return frame
+
+    def load(self, scope: int, slot: int, name: str) -> Object:
+        if scope == ast.LOCAL:
+            value = self.values[slot]
+        elif scope == ast.CELL:
+            value = self.values[slot].value
+        else:
+            value = self.closure[slot].value
+
+        if value is None:
+            # Not assigned yet, so the name refers to the variable further out,
+            # as it would in an `Environment`.
+            for index in self.fallbacks.get(name, ()):
+                value = self.closure[index].value
+                if value is not None:
+                    return value
+            return self.env.get(name)
+        return value
+
+    def store(self, scope: int, slot: int, value: Object) -> None:
+        if scope == ast.LOCAL:
+            self.values[slot] = value
+        else:
+            self.values[slot].value = value
+
+    def capture(self, captures: Tuple[int, ...]) -> Tuple[Cell, ...]:
+        """
+        Closure of a function created in this frame.
+        """
+        return tuple(
+            self.values[source] if source >= 0 else self.closure[~source]
+            for source in captures
+        )
+
+    def get(self, name: str) -> Object:
+        """
+        Look `name` up by name, for identifiers that were not resolved.
+        """
+        return self.env.get(name)
+
+
 @dataclass
 class IntegerObject(Object):
     value: int
@@ -128,7 +224,20 @@ class ReturnObject(Object):
 class FunctionObject(Object):
     arguments: List[ast.Identifier]
     body: ast.BlockStatement
-    env: Environment
+    env: Union[Environment, Frame]
+    # Layout of the function's frames and the cells it captured, if it was
+    # resolved.
+    layout: Optional[ast.FrameLayout] = None
+    closure: Tuple[Cell, ...] = ()
+    # Body compiled by `closure_compiler`, if the function was created by one.
+    code: Optional[Callable] = None
+    # Calls counted by `tiering.TieredEvaluator`: calls from other functions,
+    # and recursive calls, which are how tiny loops. Once the function is hot,
+    # `compiled` runs its calls.
+    invocations: int = 0
+    iterations: int = 0
+    deoptimizations: int = 0
+    compiled: Optional[Callable[[List[Object]], Object]] = None
 
     def __repr__(self):
         return f"fn({','.join([f'{arg}' for arg in self.arguments])}) {{{self.body}}}"
@@ -140,6 +249,121 @@ class FunctionObject(Object):
         return False
 
 
+@dataclass
+class TailCall(Object):
+    """
+    A call in tail position of a function body, returned by the evaluator to
+    be made once the function it is in has returned.
+    """
+
+    function: FunctionObject
+    args: List[Object]
+
+    def __repr__(self):
+        return f"tail call {self.function}"
+
+    def is_hashable(self) -> bool:
+        return False
+
+
+@dataclass
+class ClosureObject(Object):
+    """
+    Function created by `vm.VM`, with the code `bytecode.Compiler` compiled its
+    body to.
+    """
+
+    # A `bytecode.CompiledFunction`.
+    function: object
+    closure: Tuple[Cell, ...]
+    env: Environment
+
+    def __repr__(self):
+        return f"fn({','.join(self.function.parameters)}) {{...}}"
+
+    def is_hashable(self) -> bool:
+        return False
+
+
+@dataclass
+class ArrayObject(Object):
+    elements: List[Object]
+
+    def __repr__(self):
+        return f"[{', '.join([f'{element}' for element in self.elements])}]"
+
+    def is_hashable(self) -> bool:
+        return False
+
+
+@dataclass
+class HashObject(Object):
+    # Keys and values, by the hash key of the key.
+    pairs: Dict[Tuple[type, object], Tuple[Object, Object]]
+
+    def __repr__(self):
+        pairs = [f"{key}: {value}" for key, value in self.pairs.values()]
+        return f"{{{', '.join(pairs)}}}"
+
+    def is_hashable(self) -> bool:
+        return False
+
+
+def type_name(value: Optional[Object]) -> str:
+    """
+    Name of the type of `value` in error messages. Functions are called
+    `FunctionObject` whichever engine created them, so that `vm.VM` reports the
+    same errors as `eval.Evaluator`.
+    """
+    if value.__class__ is ClosureObject:
+        return "FunctionObject"
+    return value.__class__.__name__
+
+
+def hash_key(key: Object) -> Tuple[type, object]:
+    """
+    Key of a hashable object in the pairs of a `HashObject`, so that keys of
+    different types are never equal, like `1` and `true`.
+    """
+    return (type(key), key.value)
+
+
+def is_hashable(value: Optional[Object]) -> bool:
+    return isinstance(value, Object) and value.is_hashable()
+
+
+def build_hash(items: List[Optional[Object]]) -> Union[HashObject, ErrorObject]:
+    """
+    Hash of keys and values, one after the other.
+    """
+    pairs: Dict[Tuple[type, object], Tuple[Object, Object]] = {}
+    for key, value in zip(items[::2], items[1::2]):
+        if not is_hashable(key):
+            return ErrorObject(f"unusable as hash key: '{type_name(key)}'")
+        pairs[hash_key(key)] = (key, value)
+    return HashObject(pairs)
+
+
+def index_value(left: Optional[Object], index: Optional[Object]) -> Optional[Object]:
+    """
+    Element of an array or value of a hash, `null` if there is none, or an
+    error.
+    """
+    if type(left) is ArrayObject and type(index) is IntegerObject:
+        if 0 <= index.value < len(left.elements):
+            return left.elements[index.value]
+        return NULL
+    if type(left) is HashObject:
+        if not is_hashable(index):
+            return ErrorObject(f"unusable as hash key: '{type_name(index)}'")
+        pair = left.pairs.get(hash_key(index))
+        return NULL if pair is None else pair[1]
+    return ErrorObject(
+        f"index operator not supported: '{type_name(left)}' and "
+        f"'{type_name(index)}'"
+    )
+
+
 NULL = NullObject()
 TRUE = BooleanObject(True)
 FALSE = BooleanObject(False)
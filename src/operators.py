@@ -0,0 +1,105 @@
+from typing import Callable, Dict, Optional
+
+import object as obj
+from object import BooleanObject, IntegerObject, Object, StringObject
+
+# Evaluates an infix operator for operands of the types it is registered for.
+BinaryOperation = Callable[[Object, Object], Object]
+
+# Implementations of an operator, by the type of the left operand, then by
+# the type of the right one. Two lookups by type are faster than one by a
+# tuple of both, which has to be built and hashed.
+OperationTable = Dict[type, Dict[type, BinaryOperation]]
+
+# Implementations of each infix operator. Operands of types without one are
+# an error.
+BINARY_OPERATIONS: Dict[str, OperationTable] = {}
+
+
+def binary_operations(operator: str) -> OperationTable:
+    """
+    Implementations of `operator`. The same dictionary is returned every time,
+    so callers can keep it and still see operations registered later.
+    """
+    operations = BINARY_OPERATIONS.get(operator)
+    if operations is None:
+        operations = BINARY_OPERATIONS[operator] = {}
+    return operations
+
+
+def register_binary(
+    operator: str, left_type: type, right_type: type, operation: BinaryOperation
+) -> None:
+    operations = binary_operations(operator)
+    by_right_type = operations.get(left_type)
+    if by_right_type is None:
+        by_right_type = operations[left_type] = {}
+    by_right_type[right_type] = operation
+
+
+def binary_error(
+    operator: str, left: Optional[Object], right: Optional[Object]
+) -> Optional[obj.ErrorObject]:
+    """
+    Result of `operator` for operands it has no implementation for.
+    """
+    left_name = obj.type_name(left)
+    right_name = obj.type_name(right)
+    if left.__class__ is not right.__class__:
+        return obj.ErrorObject(f"type mismatch, got '{left_name}' and '{right_name}'")
+    if not BINARY_OPERATIONS.get(operator):
+        # Not an operator at all.
+        return None
+    # Reported as an unrecognized `-` for `+`, as it always was.
+    shown = "-" if operator == "+" else operator
+    return obj.ErrorObject(
+        f"unrecognized operator '{shown}', got '{left_name}' and '{right_name}'"
+    )
+
+
+def add_integers(left: IntegerObject, right: IntegerObject) -> IntegerObject:
+    return IntegerObject(left.value + right.value)
+
+
+def subtract_integers(left: IntegerObject, right: IntegerObject) -> IntegerObject:
+    return IntegerObject(left.value - right.value)
+
+
+def multiply_integers(left: IntegerObject, right: IntegerObject) -> IntegerObject:
+    return IntegerObject(left.value * right.value)
+
+
+def divide_integers(left: IntegerObject, right: IntegerObject) -> IntegerObject:
+    return IntegerObject(left.value / right.value)
+
+
+def less_than(left: IntegerObject, right: IntegerObject) -> BooleanObject:
+    return BooleanObject(left.value < right.value)
+
+
+def greater_than(left: IntegerObject, right: IntegerObject) -> BooleanObject:
+    return BooleanObject(left.value > right.value)
+
+
+def equal(left: Object, right: Object) -> BooleanObject:
+    return BooleanObject(left.value == right.value)
+
+
+def not_equal(left: Object, right: Object) -> BooleanObject:
+    return BooleanObject(left.value != right.value)
+
+
+def concatenate(left: StringObject, right: StringObject) -> StringObject:
+    return StringObject(left.value + right.value)
+
+
+register_binary("+", IntegerObject, IntegerObject, add_integers)
+register_binary("-", IntegerObject, IntegerObject, subtract_integers)
+register_binary("*", IntegerObject, IntegerObject, multiply_integers)
+register_binary("/", IntegerObject, IntegerObject, divide_integers)
+register_binary("<", IntegerObject, IntegerObject, less_than)
+register_binary(">", IntegerObject, IntegerObject, greater_than)
+register_binary("+", StringObject, StringObject, concatenate)
+for value_type in (IntegerObject, BooleanObject, StringObject):
+    register_binary("==", value_type, value_type, equal)
+    register_binary("!=", value_type, value_type, not_equal)
@@ -0,0 +1,262 @@
+from operator import is_not
+from typing import Callable, Dict, List
+
+import abstract_syntaxt_tree as ast
+
+# Operators whose result is always an integer, or an error.
+INTEGER_OPERATORS = ("-", "*", "/")
+
+
+class Optimizer:
+    """
+    Rewrites a program into one that evaluates to the same results with less
+    work:
+
+    - prefix and infix expressions of literals are folded into a literal,
+    - `x * 1`, `1 * x`, `x + 0`, `0 + x` and `x - 0` become `x`, when `x` is
+      known to evaluate to an integer or an error,
+    - `if` expressions with a literal condition are replaced by the block that
+      would run, or an empty block when none would.
+
+    Expressions that evaluate to an error, such as `1 + true` or `-"a"`, are
+    kept, as is integer division, which evaluates to a float. Nodes are never
+    modified; changed nodes are rebuilt and unchanged subtrees are shared with
+    the original program. Function bodies that were not parsed yet are left
+    as they are.
+    """
+
+    def __init__(self):
+        # Each takes a node and its optimized children, and returns the optimized
+        # node.
+        self.rebuilders: Dict[type, Callable[[ast.Node, List[ast.Node]], ast.Node]] = {
+            ast.IntegerLiteral: keep,
+            ast.BooleanLiteral: keep,
+            ast.Identifier: keep,
+            ast.StringLiteral: keep,
+            ast.PrefixExpression: self.prefix,
+            ast.InfixExpression: self.infix,
+            ast.LetStatement: self.let,
+            ast.ReturnStatement: self.return_statement,
+            ast.BlockStatement: self.block,
+            ast.LazyBlockStatement: self.block,
+            ast.Function: self.function,
+            ast.CallExpression: self.call,
+            ast.IfExpression: self.if_expression,
+            ast.HashLiteral: self.hash_literal,
+            ast.ArrayLiteral: self.array_literal,
+            ast.IndexExpression: self.index,
+            ast.Program: self.program,
+        }
+
+    def optimize(self, program: ast.Program) -> ast.Program:
+        # No recursion, so that any program the parser can build can be
+        # optimized. Like `ast_serializer.Writer`, walk in pre-order with the
+        # children pushed left to right; in reverse, that is the post-order in
+        # which nodes are rebuilt from their optimized children.
+        # Counts are kept apart from the nodes, as a tuple for each node would
+        # only add work for the garbage collector.
+        children_of = ast.CHILDREN
+        order: List[ast.Node] = []
+        counts: List[int] = []
+        stack: List[ast.Node] = [program]
+        while stack:
+            node = stack.pop()
+            children = children_of[type(node)](node)
+            order.append(node)
+            counts.append(len(children))
+            stack.extend(children)
+
+        rebuilders = self.rebuilders
+        values: List[ast.Node] = []
+        for node, count in zip(reversed(order), reversed(counts)):
+            if count:
+                children = values[len(values) - count :]
+                del values[len(values) - count :]
+            else:
+                children = []
+            values.append(rebuilders[type(node)](node, children))
+
+        (optimized,) = values
+        return optimized
+
+    def prefix(self, node: ast.PrefixExpression, children: List[ast.Node]):
+        (expr,) = children
+        if expr is not node.expr:
+            node = ast.PrefixExpression(node.position, node.operator, expr)
+        return self.fold_prefix(node)
+
+    def infix(self, node: ast.InfixExpression, children: List[ast.Node]):
+        left, right = children
+        if left is not node.left_expr or right is not node.right_expr:
+            node = ast.InfixExpression(node.position, left, node.operator, right)
+        return self.fold_infix(node)
+
+    def let(self, node: ast.LetStatement, children: List[ast.Node]):
+        ident, expr = children
+        if expr is not node.expr:
+            node = ast.LetStatement(node.position, ident, expr)
+        return node
+
+    def return_statement(self, node: ast.ReturnStatement, children: List[ast.Node]):
+        (expr,) = children
+        if expr is not node.expr:
+            node = ast.ReturnStatement(node.position, expr)
+        return node
+
+    def block(self, node: ast.BlockStatement, children: List[ast.Node]):
+        if isinstance(node, ast.LazyBlockStatement) and not node.parsed:
+            return node
+        if changed(children, node.statements):
+            node = ast.BlockStatement(node.position, children)
+        return node
+
+    def function(self, node: ast.Function, children: List[ast.Node]):
+        if changed(children, node.paramters + [node.body]):
+            node = ast.Function(node.position, children[:-1], children[-1], node.layout)
+        return node
+
+    def call(self, node: ast.CallExpression, children: List[ast.Node]):
+        if changed(children, [node.func] + node.arguments):
+            node = ast.CallExpression(node.position, children[0], children[1:])
+        return node
+
+    def if_expression(self, node: ast.IfExpression, children: List[ast.Node]):
+        alternative = children[2] if len(children) == 3 else None
+        if (
+            children[0] is not node.condition
+            or children[1] is not node.consequence
+            or alternative is not node.alternative
+        ):
+            node = ast.IfExpression(
+                node.position, children[0], children[1], alternative
+            )
+        return self.fold_if(node)
+
+    def hash_literal(self, node: ast.HashLiteral, children: List[ast.Node]):
+        if changed(children, [child for pair in node.pairs.items() for child in pair]):
+            node = ast.HashLiteral(
+                node.position, dict(zip(children[::2], children[1::2]))
+            )
+        return node
+
+    def array_literal(self, node: ast.ArrayLiteral, children: List[ast.Node]):
+        if changed(children, node.expressions):
+            node = ast.ArrayLiteral(node.position, children)
+        return node
+
+    def index(self, node: ast.IndexExpression, children: List[ast.Node]):
+        left, index = children
+        if left is not node.left_expr or index is not node.index:
+            node = ast.IndexExpression(node.position, left, index)
+        return node
+
+    def program(self, node: ast.Program, children: List[ast.Node]):
+        if changed(children, node.statements):
+            node = ast.Program(node.position, children, node.positions)
+        return node
+
+    def fold_prefix(self, node: ast.PrefixExpression) -> ast.Node:
+        expr = node.expr
+        if node.operator == "-" and type(expr) is ast.IntegerLiteral:
+            return ast.IntegerLiteral(node.position, -expr.value)
+        if node.operator == "!":
+            if type(expr) is ast.IntegerLiteral:
+                return ast.BooleanLiteral(node.position, expr.value == 0)
+            if type(expr) is ast.BooleanLiteral:
+                return ast.BooleanLiteral(node.position, not expr.value)
+        return node
+
+    def fold_infix(self, node: ast.InfixExpression) -> ast.Node:
+        left = node.left_expr
+        right = node.right_expr
+        operator = node.operator
+        left_type = type(left)
+
+        if left_type is type(right):
+            if left_type is ast.IntegerLiteral:
+                if operator == "+":
+                    return ast.IntegerLiteral(node.position, left.value + right.value)
+                if operator == "-":
+                    return ast.IntegerLiteral(node.position, left.value - right.value)
+                if operator == "*":
+                    return ast.IntegerLiteral(node.position, left.value * right.value)
+                if operator == "<":
+                    return ast.BooleanLiteral(node.position, left.value < right.value)
+                if operator == ">":
+                    return ast.BooleanLiteral(node.position, left.value > right.value)
+            elif left_type is ast.StringLiteral and operator == "+":
+                return ast.StringLiteral(node.position, left.value + right.value)
+
+            if left_type in (ast.IntegerLiteral, ast.StringLiteral, ast.BooleanLiteral):
+                if operator == "==":
+                    return ast.BooleanLiteral(node.position, left.value == right.value)
+                if operator == "!=":
+                    return ast.BooleanLiteral(node.position, left.value != right.value)
+
+        if operator == "*":
+            if is_integer_literal(right, 1) and is_integer(left):
+                return left
+            if is_integer_literal(left, 1) and is_integer(right):
+                return right
+        elif operator == "+":
+            if is_integer_literal(right, 0) and is_integer(left):
+                return left
+            if is_integer_literal(left, 0) and is_integer(right):
+                return right
+        elif operator == "-":
+            if is_integer_literal(right, 0) and is_integer(left):
+                return left
+
+        return node
+
+    def fold_if(self, node: ast.IfExpression) -> ast.Node:
+        condition = node.condition
+        if type(condition) is ast.IntegerLiteral:
+            truthy = condition.value != 0
+        elif type(condition) is ast.BooleanLiteral:
+            truthy = condition.value
+        elif type(condition) is ast.StringLiteral:
+            truthy = False
+        else:
+            return node
+
+        if truthy:
+            return node.consequence
+        if node.alternative is not None:
+            return node.alternative
+        return ast.BlockStatement(node.position, [])
+
+
+def keep(node: ast.Node, children: List[ast.Node]) -> ast.Node:
+    return node
+
+
+def changed(children: List[ast.Node], old_children: List[ast.Node]) -> bool:
+    return any(map(is_not, children, old_children))
+
+
+def is_integer_literal(node: ast.Node, value: int) -> bool:
+    return type(node) is ast.IntegerLiteral and node.value == value
+
+
+def is_integer(node: ast.Node) -> bool:
+    """
+    Whether `node` is known to evaluate to an integer, or to an error.
+    """
+    if type(node) is ast.IntegerLiteral:
+        return True
+    if type(node) is ast.PrefixExpression:
+        return node.operator == "-"
+    if type(node) is ast.InfixExpression:
+        if node.operator in INTEGER_OPERATORS:
+            return True
+        if node.operator == "+":
+            return (
+                type(node.left_expr) is ast.IntegerLiteral
+                or type(node.right_expr) is ast.IntegerLiteral
+            )
+    return False
+
+
+def optimize(program: ast.Program) -> ast.Program:
+    return Optimizer().optimize(program)
@@ -0,0 +1,95 @@
+import os
+import re
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from lexer import TokenStream
+
+# Strings (possibly unterminated), braces and semicolons: everything the splitter
+# needs to know whether a `;` is at the top level.
+BOUNDARY_PATTERN = re.compile(r'"[^"]*"?|[{};]')
+
+# Sources shorter than this are lexed in the calling process.
+MIN_PARALLEL_SIZE = 256 * 1024
+
+# Text of a chunk and its offset in the source.
+Chunk = Tuple[str, int]
+
+
+def split_source(source: str, chunk_count: int) -> List[Chunk]:
+    """
+    Split `source` into roughly `chunk_count` chunks, each ending right after a `;`
+    outside of strings and braces.
+    """
+    target_size = max(len(source) // chunk_count, 1)
+    boundaries: List[int] = []
+
+    depth = 0
+    next_boundary = target_size
+    for match in BOUNDARY_PATTERN.finditer(source):
+        text = match.group()
+        if text == ";":
+            if depth == 0 and match.end() >= next_boundary:
+                boundaries.append(match.end())
+                next_boundary = match.end() + target_size
+        elif text == "{":
+            depth += 1
+        elif text == "}":
+            depth = max(depth - 1, 0)
+
+    chunks: List[Chunk] = []
+    start = 0
+    for end in boundaries + [len(source)]:
+        if end > start:
+            chunks.append((source[start:end], start))
+        start = end
+    return chunks
+
+
+def lex_chunk(chunk: Chunk) -> Tuple[List[array], array]:
+    """
+    Lex one chunk, returning the stream columns and the offsets of the lines
+    starting in it, all relative to the whole source.
+    """
+    text, base = chunk
+    stream = TokenStream(text)
+    stream.scan(text, base)
+    columns = [getattr(stream, column) for column in TokenStream.COLUMNS]
+    return columns, stream.line_index.starts[1:]
+
+
+def lex_parallel(
+    source: str,
+    workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    min_size: int = MIN_PARALLEL_SIZE,
+) -> TokenStream:
+    """
+    Lex `source` into a `TokenStream` by splitting it at top-level `;`s and lexing
+    the chunks in a process pool. The result is identical to
+    `TokenStream.from_source(source)`.
+
+    Pass `executor` to reuse a pool across calls; otherwise a `ProcessPoolExecutor`
+    with `workers` processes is created for this call.
+    """
+    if len(source) < min_size:
+        return TokenStream.from_source(source)
+
+    workers = workers or os.cpu_count() or 1
+    chunks = split_source(source, workers * 4)
+
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lex_chunk, chunks))
+    else:
+        results = list(executor.map(lex_chunk, chunks))
+
+    stream = TokenStream(source)
+    for columns, line_starts in results:
+        for name, column in zip(TokenStream.COLUMNS, columns):
+            getattr(stream, name).extend(column)
+        stream.line_index.starts.extend(line_starts)
+
+    stream.add_eof()
+    return stream
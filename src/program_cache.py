@@ -0,0 +1,235 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from enum import Enum
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import abstract_syntaxt_tree as ast
+from lexer import Lexer
+from tiny_parser import ParseError, Parser
+
+
+class ParsedProgram(NamedTuple):
+    """
+    A program together with the errors its source failed to parse with. The
+    program, its errors and its position table are the cached ones, shared with
+    every lookup of the same source, and may not be modified: run passes that
+    annotate nodes in place, like `resolver`, on a copy from `copy_program`.
+    """
+
+    program: ast.Program
+    errors: Tuple[ParseError, ...]
+    size: int
+
+
+class ProgramCache:
+    """
+    In-memory cache of parsed programs keyed by a hash of their source. Holds at
+    most `max_entries` programs and at most `max_bytes` of them, as estimated by
+    `program_size`, evicting the least recently used programs first.
+
+    Lookups hand out the cached program itself, for read-only use; callers that
+    modify it copy it first. A cache may be shared by any number of threads. Two
+    threads missing on the same source at once both parse it, and the later
+    one's program is kept.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, ParsedProgram]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, source: str) -> str:
+        return hashlib.sha256(source.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def parse(self, source: str) -> ParsedProgram:
+        """
+        Return the parsed program of `source`, from the cache when possible.
+        """
+        parsed = self.get(source)
+        if parsed is None:
+            parser = Parser(Lexer(source))
+            program = parser.parse_program()
+            parsed = ParsedProgram(program, tuple(parser.errors), program_size(program))
+            self.put(source, parsed)
+        return parsed
+
+    def get(self, source: str) -> Optional[ParsedProgram]:
+        key = self.key(source)
+        with self.lock:
+            parsed = self.entries.get(key)
+            if parsed is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return parsed
+
+    def put(self, source: str, parsed: ParsedProgram) -> None:
+        key = self.key(source)
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.size
+
+            self.entries[key] = parsed
+            self.bytes += parsed.size
+            self.evict()
+
+    def evict(self) -> None:
+        # Called with the lock held. A program larger than the whole budget is
+        # not kept either.
+        while self.entries and (
+            len(self.entries) > self.max_entries or self.bytes > self.max_bytes
+        ):
+            _, parsed = self.entries.popitem(last=False)
+            self.bytes -= parsed.size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def copy_program(program: ast.Program) -> ast.Program:
+    """
+    Copy of the nodes of `program`, without the annotations `resolver` and the
+    evaluators put on them. The copy shares the program's position table, and
+    function bodies that are not parsed yet keep parsing on first access.
+    """
+    # No recursion, so that any program the parser can build can be copied.
+    # Like `optimizer.Optimizer`, walk in pre-order and rebuild the nodes in
+    # reverse, from the copies of their children.
+    children_of = ast.CHILDREN
+    order: List[ast.Node] = []
+    counts: List[int] = []
+    stack: List[ast.Node] = [program]
+    while stack:
+        node = stack.pop()
+        children = children_of[type(node)](node)
+        order.append(node)
+        counts.append(len(children))
+        stack.extend(children)
+
+    copies: List[ast.Node] = []
+    for node, count in zip(reversed(order), reversed(counts)):
+        if count:
+            children = copies[len(copies) - count :]
+            del copies[len(copies) - count :]
+        else:
+            children = []
+        copies.append(COPIERS[type(node)](node, children))
+
+    (copy,) = copies
+    return copy
+
+
+def copy_block(node: ast.BlockStatement, children: List[ast.Node]) -> ast.Node:
+    if isinstance(node, ast.LazyBlockStatement) and not node.parsed:
+        return ast.LazyBlockStatement(node.position, node.parse)
+    return ast.BlockStatement(node.position, children)
+
+
+def copy_if(node: ast.IfExpression, children: List[ast.Node]) -> ast.Node:
+    alternative = children[2] if len(children) == 3 else None
+    return ast.IfExpression(node.position, children[0], children[1], alternative)
+
+
+# Copy of each node type, given the copies of its children.
+COPIERS: Dict[type, Callable[[ast.Node, List[ast.Node]], ast.Node]] = {
+    ast.IntegerLiteral: lambda node, _: ast.IntegerLiteral(node.position, node.value),
+    ast.BooleanLiteral: lambda node, _: ast.BooleanLiteral(node.position, node.value),
+    ast.StringLiteral: lambda node, _: ast.StringLiteral(node.position, node.value),
+    ast.Identifier: lambda node, _: ast.Identifier(node.position, node.name),
+    ast.PrefixExpression: lambda node, children: ast.PrefixExpression(
+        node.position, node.operator, children[0]
+    ),
+    ast.InfixExpression: lambda node, children: ast.InfixExpression(
+        node.position, children[0], node.operator, children[1]
+    ),
+    ast.LetStatement: lambda node, children: ast.LetStatement(
+        node.position, children[0], children[1]
+    ),
+    ast.ReturnStatement: lambda node, children: ast.ReturnStatement(
+        node.position, children[0]
+    ),
+    ast.BlockStatement: copy_block,
+    ast.LazyBlockStatement: copy_block,
+    ast.Function: lambda node, children: ast.Function(
+        node.position, children[:-1], children[-1]
+    ),
+    ast.CallExpression: lambda node, children: ast.CallExpression(
+        node.position, children[0], children[1:]
+    ),
+    ast.IfExpression: copy_if,
+    ast.HashLiteral: lambda node, children: ast.HashLiteral(
+        node.position, dict(zip(children[::2], children[1::2]))
+    ),
+    ast.ArrayLiteral: lambda node, children: ast.ArrayLiteral(node.position, children),
+    ast.IndexExpression: lambda node, children: ast.IndexExpression(
+        node.position, children[0], children[1]
+    ),
+    ast.Program: lambda node, children: ast.Program(
+        node.position, children, node.positions
+    ),
+}
+
+
+def program_size(program: ast.Program) -> int:
+    """
+    Approximate number of bytes held by `program`: the sizes of all objects
+    reachable from it, each counted once. Enum members and classes are shared
+    with everything else and are not counted.
+    """
+    seen = set()
+    total = 0
+    stack: List[object] = [program]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (Enum, type)):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+
+        if isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif not isinstance(obj, (str, int, float, bytes)):
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for cls in type(obj).__mro__:
+                for name in getattr(cls, "__slots__", ()):
+                    if hasattr(obj, name):
+                        stack.append(getattr(obj, name))
+
+    return total
+
+
+# Cache shared by the REPL and by code embedding the interpreter.
+default_cache = ProgramCache()
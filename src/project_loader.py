@@ -0,0 +1,152 @@
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import abstract_syntaxt_tree as ast
+from ast_serializer import dump, load
+from lexer import Lexer
+from tiny_parser import ParseError, Parser
+
+SOURCE_SUFFIX = ".tiny"
+
+# Projects with less source than this are parsed in the calling process.
+MIN_PARALLEL_SIZE = 256 * 1024
+
+
+class SourceFile:
+    """
+    A parsed source file. A program parsed in a worker process stays serialized
+    until `program` is first accessed, so the calling process only pays for
+    loading the programs it actually uses. Accessing the program of data that
+    does not load raises ValueError.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        errors: List[ParseError],
+        parse_time: float,
+        program: Optional[ast.Program] = None,
+        data: Optional[bytes] = None,
+        positions: bool = False,
+    ):
+        self.path = path
+        self.errors = errors
+        # Seconds spent reading, lexing and parsing the file, and loading its
+        # serialized program (0 until loaded, or when parsed in this process).
+        self.parse_time = parse_time
+        self.load_time = 0.0
+        self.data = data
+        self.positions = positions
+        self._program = program
+
+    @property
+    def program(self) -> ast.Program:
+        if self._program is None:
+            start = time.perf_counter()
+            program = load(self.data, positions=self.positions)
+            self.load_time = time.perf_counter() - start
+            if program is None:
+                # Keeps `data`, so that every access reports the same error.
+                raise ValueError(f"{self.path}: serialized program is invalid")
+            self._program = program
+            self.data = None
+        return self._program
+
+
+@dataclass
+class Project:
+    files: List[SourceFile]
+    # Wall-clock seconds taken by `load_project`.
+    elapsed: float
+
+    @property
+    def errors(self) -> List[Tuple[str, ParseError]]:
+        return [(file.path, error) for file in self.files for error in file.errors]
+
+    def timings(self) -> Dict[str, float]:
+        return {file.path: file.parse_time + file.load_time for file in self.files}
+
+
+def find_sources(directory: str, suffix: str = SOURCE_SUFFIX) -> List[str]:
+    """
+    Paths of all files ending with `suffix` under `directory`, sorted.
+    """
+    paths = []
+    for root, _, names in os.walk(directory):
+        paths.extend(
+            os.path.join(root, name) for name in names if name.endswith(suffix)
+        )
+    return sorted(paths)
+
+
+def parse_source(path: str) -> Tuple[ast.Program, List[ParseError], float]:
+    start = time.perf_counter()
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+
+    parser = Parser(Lexer(source))
+    program = parser.parse_program()
+    return program, parser.errors, time.perf_counter() - start
+
+
+def parse_serialized(
+    path: str, positions: bool
+) -> Tuple[bytes, List[ParseError], float]:
+    """
+    Parse one file in a worker process, returning its program serialized by
+    `ast_serializer`, which is much smaller and faster to move between processes
+    than a pickled tree.
+    """
+    program, errors, parse_time = parse_source(path)
+    return dump(program, positions=positions), errors, parse_time
+
+
+def load_project(
+    paths: Iterable[str],
+    workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    min_size: int = MIN_PARALLEL_SIZE,
+    positions: bool = False,
+) -> Project:
+    """
+    Lex and parse every file in `paths`, in a process pool once the files hold
+    at least `min_size` bytes in total. Files keep the order of `paths`.
+
+    Programs parsed in workers come back serialized and are loaded on first
+    access, without token positions unless `positions` is set; parse errors are
+    available right away and always carry their positions.
+
+    Pass `executor` to reuse a pool across calls; otherwise a `ProcessPoolExecutor`
+    with `workers` processes is created for this call.
+    """
+    start = time.perf_counter()
+    paths = list(paths)
+
+    if sum(os.path.getsize(path) for path in paths) < min_size:
+        files = []
+        for path in paths:
+            program, errors, parse_time = parse_source(path)
+            files.append(SourceFile(path, errors, parse_time, program=program))
+        return Project(files, time.perf_counter() - start)
+
+    workers = workers or os.cpu_count() or 1
+    # Largest files first, so that no worker is left with a big file at the end.
+    order = sorted(paths, key=os.path.getsize, reverse=True)
+    chunksize = max(len(order) // (workers * 8), 1)
+    parse = partial(parse_serialized, positions=positions)
+
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(parse, order, chunksize=chunksize))
+    else:
+        results = list(executor.map(parse, order, chunksize=chunksize))
+
+    loaded = {
+        path: SourceFile(path, errors, parse_time, data=data, positions=positions)
+        for path, (data, errors, parse_time) in zip(order, results)
+    }
+    return Project([loaded[path] for path in paths], time.perf_counter() - start)
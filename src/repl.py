@@ -1,9 +1,10 @@
 import sys
 
 from eval import Evaluator
-from lexer import Lexer
-from tiny_parser import Parser
 from object import Environment
+from optimizer import optimize
+from program_cache import copy_program, default_cache
+from resolver import resolve
 
 if __name__ == "__main__":
     env = Environment()
@@ -14,12 +15,12 @@ if __name__ == "__main__":
         if user_input.lower() == "exit":
             sys.exit(0)
 
-        lexer = Lexer(user_input)
-        parser = Parser(lexer)
-        program = parser.parse_program()
+        parsed = default_cache.parse(user_input)
 
-        if parser.errors:
-            print(parser.errors)
+        if parsed.errors:
+            print(list(parsed.errors))
 
+        # `resolve` annotates the nodes, which the cache shares with later lookups.
+        program = resolve(optimize(copy_program(parsed.program)))
         res = evaluator.eval(program, env)
         print(res)
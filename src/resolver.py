@@ -0,0 +1,217 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+import abstract_syntaxt_tree as ast
+from tiny_parser import DeferredParseError
+
+
+class Scope:
+    """
+    Variables of one function: its parameters, then its `let`s, each in a slot
+    of the function's frame, and the variables of enclosing functions its
+    closure captures.
+    """
+
+    def __init__(self, function: ast.Function, outer: Optional["Scope"]):
+        self.function = function
+        self.outer = outer
+        self.slots: Dict[str, int] = {}
+        self.names: List[str] = []
+        # Slots captured by nested functions.
+        self.cells: Set[int] = set()
+        # Closure index of each captured variable, by the scope declaring it and
+        # its name, and where the creating frame keeps its cell.
+        self.free: Dict[Tuple[int, str], int] = {}
+        self.captures: List[int] = []
+        self.fallbacks: Dict[str, Tuple[int, ...]] = {}
+        # Identifiers of the function's own variables, by slot; whether a slot
+        # holds a cell is only known once all nested functions are resolved.
+        self.local_idents: List[Tuple[ast.Identifier, int]] = []
+
+    def declare(self, name: str) -> int:
+        # A repeated parameter gets a slot of its own, which later uses refer to,
+        # like the last assignment of the name would be in an `Environment`.
+        slot = self.slots[name] = len(self.names)
+        self.names.append(name)
+        return slot
+
+    def capture(self, scope: "Scope", name: str) -> int:
+        """
+        Index in the closure of the variable `name` of the enclosing `scope`,
+        captured by every function in between as well.
+        """
+        key = (id(scope), name)
+        index = self.free.get(key)
+        if index is None:
+            if self.outer is scope:
+                slot = scope.slots[name]
+                scope.cells.add(slot)
+                source = slot
+            else:
+                source = ~self.outer.capture(scope, name)
+            index = self.free[key] = len(self.captures)
+            self.captures.append(source)
+        return index
+
+    def layout(self) -> ast.FrameLayout:
+        return ast.FrameLayout(
+            tuple(self.names),
+            tuple(sorted(self.cells)),
+            tuple(self.captures),
+            self.fallbacks,
+        )
+
+
+class Resolver:
+    """
+    Annotates identifiers with where the evaluator finds the variable they
+    refer to: a slot of the frame of the function using it, or a cell. Only
+    variables that nested functions use are kept in cells, and a function's
+    closure holds just the cells of the variables of enclosing functions its
+    body refers to, rather than their whole frames.
+
+    Every function is a scope; blocks are not, just as they share the
+    environment of their function when evaluated. All `let`s of a function are
+    declared when the function is entered, so an identifier refers to a
+    variable of the function even where it is used before the `let` ran. The
+    evaluator then looks the name up further out, as an `Environment` would;
+    the closure captures the variables of enclosing functions such a name may
+    then refer to as well.
+
+    Identifiers outside of functions, and names that no enclosing function
+    declares, stay unresolved and are looked up by name at run time, since
+    globals can be defined by later programs sharing the environment. So do
+    the variables of top-level functions whose lazily parsed bodies were not
+    parsed yet; bodies of functions nested in a resolved function are parsed,
+    so that its closures capture what they use.
+
+    Nodes are annotated in place, so programs parsed with `intern_nodes`, whose
+    nodes may be shared by several scopes, cannot be resolved.
+    """
+
+    def resolve(self, program: ast.Program) -> ast.Program:
+        # Identifiers annotated by this pass.
+        seen: Set[int] = set()
+        scopes: List[Scope] = []
+        stack: List[Tuple[ast.Node, Optional[Scope]]] = [
+            (stmt, None) for stmt in reversed(program.statements)
+        ]
+        while stack:
+            node, scope = stack.pop()
+            node_type = type(node)
+
+            if node_type is ast.Identifier:
+                self.resolve_identifier(node, scope, seen)
+            elif node_type is ast.LetStatement:
+                if scope is None:
+                    self.annotate(node.ident, ast.UNRESOLVED, ast.UNRESOLVED, seen)
+                else:
+                    slot = scope.slots[node.ident.name]
+                    self.annotate(node.ident, ast.LOCAL, slot, seen)
+                    scope.local_idents.append((node.ident, slot))
+                stack.append((node.expr, scope))
+            elif node_type is ast.Function:
+                node.layout = None
+                if not self.parse_body(node, scope):
+                    continue
+
+                function_scope = Scope(node, scope)
+                scopes.append(function_scope)
+                for param in node.paramters:
+                    slot = function_scope.declare(param.name)
+                    self.annotate(param, ast.LOCAL, slot, seen)
+                    function_scope.local_idents.append((param, slot))
+                for name in local_names(node.body):
+                    if name not in function_scope.slots:
+                        function_scope.declare(name)
+                stack.append((node.body, function_scope))
+            else:
+                stack.extend(
+                    (child, scope) for child in reversed(ast.CHILDREN[node_type](node))
+                )
+
+        for scope in scopes:
+            for ident, slot in scope.local_idents:
+                ident.scope = ast.CELL if slot in scope.cells else ast.LOCAL
+            scope.function.layout = scope.layout()
+
+        return program
+
+    @staticmethod
+    def parse_body(function: ast.Function, scope: Optional[Scope]) -> bool:
+        """
+        Whether the body of `function` is parsed, parsing it if the function is
+        nested in another one.
+        """
+        body = function.body
+        if not isinstance(body, ast.LazyBlockStatement) or body.parsed:
+            return True
+        if scope is None:
+            return False
+        try:
+            body.statements
+        except DeferredParseError:
+            # Evaluates to an error once called, without using any variables.
+            return False
+        return True
+
+    def resolve_identifier(
+        self, ident: ast.Identifier, scope: Optional[Scope], seen: Set[int]
+    ) -> None:
+        # Scopes declaring the name, innermost first.
+        declaring: List[Scope] = []
+        outer = scope
+        while outer is not None:
+            if ident.name in outer.slots:
+                declaring.append(outer)
+            outer = outer.outer
+
+        if not declaring:
+            self.annotate(ident, ast.UNRESOLVED, ast.UNRESOLVED, seen)
+            return
+
+        if declaring[0] is scope:
+            slot = scope.slots[ident.name]
+            # Made a `CELL` at the end if a nested function captures the slot.
+            self.annotate(ident, ast.LOCAL, slot, seen)
+            scope.local_idents.append((ident, slot))
+        else:
+            self.annotate(
+                ident, ast.FREE, scope.capture(declaring[0], ident.name), seen
+            )
+
+        if len(declaring) > 1 and ident.name not in scope.fallbacks:
+            scope.fallbacks[ident.name] = tuple(
+                scope.capture(outer, ident.name) for outer in declaring[1:]
+            )
+
+    @staticmethod
+    def annotate(ident: ast.Identifier, scope: int, slot: int, seen: Set[int]):
+        if id(ident) in seen:
+            raise ValueError(
+                f"identifier '{ident.name}' is shared by several nodes; "
+                "programs parsed with intern_nodes cannot be resolved"
+            )
+        seen.add(id(ident))
+        ident.scope = scope
+        ident.slot = slot
+
+
+def local_names(body: ast.BlockStatement) -> List[str]:
+    """
+    Names of the `let`s in a function body, outside of nested functions.
+    """
+    names: List[str] = []
+    stack: List[ast.Node] = [body]
+    while stack:
+        node = stack.pop()
+        node_type = type(node)
+        if node_type is ast.Function:
+            continue
+        if node_type is ast.LetStatement:
+            names.append(node.ident.name)
+        stack.extend(reversed(ast.CHILDREN[node_type](node)))
+    return names
+
+
+def resolve(program: ast.Program) -> ast.Program:
+    return Resolver().resolve(program)
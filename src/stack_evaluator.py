@@ -0,0 +1,315 @@
+from typing import List, Optional, Tuple, Union
+
+import abstract_syntaxt_tree as ast
+import object as obj
+from closure_compiler import is_truthy
+from object import BooleanObject, Environment, Frame, IntegerObject
+from operators import binary_error, binary_operations
+from tiny_parser import DeferredParseError
+
+# Calls a program may nest before it stops with a stack overflow error.
+DEFAULT_MAX_DEPTH = 100_000
+
+# Kinds of the steps on the stack of `StackEvaluator`. A step is a tuple of its
+# kind and a node: the node to evaluate, or the one whose children's values the
+# step continues with.
+EVAL = 0
+INFIX = 1
+PREFIX = 2
+IF = 3
+DISCARD = 4
+LET = 5
+RETURN = 6
+CALL = 7
+END_CALL = 8
+ARRAY = 9
+HASH = 10
+INDEX = 11
+DONE = 12
+
+# Step the body of a function returns to.
+END_CALL_STEP = (END_CALL, None)
+DISCARD_STEP = (DISCARD, None)
+
+
+class StackEvaluator:
+    """
+    Evaluator producing the same results as `eval.Evaluator`, without
+    recursion.
+
+    Instead of evaluating the children of a node by calling itself, the
+    evaluator pushes a step for each of them on a stack of its own, under a
+    step that continues with the node once their values are on a second, value
+    stack. A call pushes the step its body returns to, and remembers where it
+    is, so that `return` can unwind the stack to it, and the environment of
+    its caller. A call that is the last thing its caller does replaces the
+    caller's call instead of nesting in it, as tail calls do in `Evaluator`.
+
+    Calls nest as deep as `max_depth` rather than as Python's recursion limit
+    allows; deeper ones stop the program with a stack overflow error. Other
+    errors stop it as soon as they are produced too, which is what they do in
+    `Evaluator`, where every node returns the errors of its children.
+
+    Unlike in `Evaluator`, where a `return` inside an expression, such as an
+    `if` that is an operand, makes the returned value that operand, `return`
+    always leaves the function.
+    """
+
+    def __init__(self, max_depth: int = DEFAULT_MAX_DEPTH):
+        self.max_depth = max_depth
+
+    def eval(
+        self, node: ast.Node, env: Union[Environment, Frame]
+    ) -> Optional[obj.Object]:
+        max_depth = self.max_depth
+        stack: List[Tuple[int, Optional[ast.Node]]] = [(DONE, None), (EVAL, node)]
+        push_step = stack.append
+        pop_step = stack.pop
+        values: List[Optional[obj.Object]] = []
+        push = values.append
+        pop = values.pop
+        # Height of the stacks when each call started, and its caller's
+        # environment.
+        calls: List[Tuple[int, int, Union[Environment, Frame]]] = []
+
+        while True:
+            kind, node = pop_step()
+
+            if kind == EVAL:
+                node_type = type(node)
+                if node_type is ast.Identifier:
+                    if node.scope == ast.UNRESOLVED:
+                        push(env.get(node.name))
+                    else:
+                        push(env.load(node.scope, node.slot, node.name))
+                elif node_type is ast.IntegerLiteral:
+                    push(IntegerObject(node.value))
+                elif node_type is ast.InfixExpression:
+                    push_step((INFIX, node))
+                    push_step((EVAL, node.right_expr))
+                    push_step((EVAL, node.left_expr))
+                elif node_type is ast.CallExpression:
+                    push_step((CALL, node))
+                    for arg in reversed(node.arguments):
+                        push_step((EVAL, arg))
+                    push_step((EVAL, node.func))
+                elif node_type is ast.IfExpression:
+                    push_step((IF, node))
+                    push_step((EVAL, node.condition))
+                elif (
+                    node_type is ast.BlockStatement
+                    or node_type is ast.LazyBlockStatement
+                    or node_type is ast.Program
+                ):
+                    try:
+                        statements = node.statements
+                    except DeferredParseError as exc:
+                        # A lazily parsed function body that does not parse.
+                        return obj.ErrorObject(f"{exc}")
+                    if not statements:
+                        push(obj.NULL)
+                        continue
+                    push_step((EVAL, statements[-1]))
+                    for i in range(len(statements) - 2, -1, -1):
+                        push_step(DISCARD_STEP)
+                        push_step((EVAL, statements[i]))
+                elif node_type is ast.ReturnStatement:
+                    push_step((RETURN, node))
+                    push_step((EVAL, node.expr))
+                elif node_type is ast.LetStatement:
+                    push_step((LET, node))
+                    push_step((EVAL, node.expr))
+                elif node_type is ast.PrefixExpression:
+                    push_step((PREFIX, node))
+                    push_step((EVAL, node.expr))
+                elif node_type is ast.BooleanLiteral:
+                    push(BooleanObject(node.value))
+                elif node_type is ast.StringLiteral:
+                    push(obj.StringObject(node.value))
+                elif node_type is ast.Function:
+                    push(function_object(node, env))
+                elif node_type is ast.ArrayLiteral:
+                    push_step((ARRAY, node))
+                    for expr in reversed(node.expressions):
+                        push_step((EVAL, expr))
+                elif node_type is ast.HashLiteral:
+                    push_step((HASH, node))
+                    for key, value in reversed(node.pairs.items()):
+                        push_step((EVAL, value))
+                        push_step((EVAL, key))
+                elif node_type is ast.IndexExpression:
+                    push_step((INDEX, node))
+                    push_step((EVAL, node.index))
+                    push_step((EVAL, node.left_expr))
+                else:
+                    raise TypeError(f"no handler for node type '{node_type.__name__}'")
+
+            elif kind == INFIX:
+                right = pop()
+                left = values[-1]
+                operations = node.operations
+                if operations is None:
+                    operations = node.operations = binary_operations(node.operator)
+                by_right_type = operations.get(left.__class__)
+                operation = (
+                    None
+                    if by_right_type is None
+                    else by_right_type.get(right.__class__)
+                )
+                if operation is None:
+                    res = binary_error(node.operator, left, right)
+                else:
+                    res = operation(left, right)
+                if isinstance(res, obj.ErrorObject):
+                    return res
+                values[-1] = res
+
+            elif kind == CALL:
+                count = len(node.arguments)
+                func = values[-1 - count]
+                args = values[len(values) - count :]
+                del values[-1 - count :]
+                if not isinstance(func, obj.FunctionObject):
+                    return obj.ErrorObject(
+                        f"not a function: '{func.__class__.__name__}'"
+                    )
+
+                following = stack[-1]
+                if following[0] == RETURN and calls:
+                    # Returns what the call returns: drop what is left of the
+                    # caller and make a tail call.
+                    height, values_height, _ = calls[-1]
+                    del stack[height:]
+                    del values[values_height:]
+                    following = END_CALL_STEP
+                if following is not END_CALL_STEP:
+                    if len(calls) >= max_depth:
+                        return obj.ErrorObject(
+                            f"stack overflow, calls nest deeper than {max_depth}"
+                        )
+                    push_step(END_CALL_STEP)
+                    calls.append((len(stack), len(values), env))
+
+                env = call_env(func, args)
+                push_step((EVAL, func.body))
+
+            elif kind == END_CALL:
+                env = calls.pop()[2]
+
+            elif kind == DISCARD:
+                pop()
+
+            elif kind == IF:
+                cond = pop()
+                if is_truthy(cond):
+                    push_step((EVAL, node.consequence))
+                elif node.alternative is not None:
+                    push_step((EVAL, node.alternative))
+                else:
+                    push(obj.NULL)
+
+            elif kind == RETURN:
+                if not calls:
+                    return pop()
+                value = pop()
+                height, values_height, env = calls.pop()
+                # The step the call returns to is the one under its height.
+                del stack[height - 1 :]
+                del values[values_height:]
+                push(value)
+
+            elif kind == LET:
+                value = values[-1]
+                ident = node.ident
+                if ident.scope == ast.UNRESOLVED:
+                    env.set(ident.name, value)
+                else:
+                    env.store(ident.scope, ident.slot, value)
+                # A `let` evaluates to None.
+                values[-1] = None
+
+            elif kind == PREFIX:
+                res = prefix(node.operator, values[-1])
+                if isinstance(res, obj.ErrorObject):
+                    return res
+                values[-1] = res
+
+            elif kind == ARRAY:
+                start = len(values) - len(node.expressions)
+                elements = values[start:]
+                del values[start:]
+                push(obj.ArrayObject(elements))
+
+            elif kind == HASH:
+                start = len(values) - 2 * len(node.pairs)
+                items = values[start:]
+                del values[start:]
+                res = obj.build_hash(items)
+                if isinstance(res, obj.ErrorObject):
+                    return res
+                push(res)
+
+            elif kind == INDEX:
+                index = pop()
+                res = obj.index_value(values[-1], index)
+                if isinstance(res, obj.ErrorObject):
+                    return res
+                values[-1] = res
+
+            elif kind == DONE:
+                return pop()
+
+
+def function_object(
+    func: ast.Function, env: Union[Environment, Frame]
+) -> obj.FunctionObject:
+    if func.layout is None:
+        return obj.FunctionObject(func.paramters, func.body, env)
+
+    # A resolved function only keeps the cells of the variables it uses.
+    if isinstance(env, Frame):
+        closure = env.capture(func.layout.captures)
+        env = env.env
+    else:
+        closure = ()
+    return obj.FunctionObject(func.paramters, func.body, env, func.layout, closure)
+
+
+def call_env(
+    func: obj.FunctionObject, args: List[Optional[obj.Object]]
+) -> Union[Environment, Frame]:
+    """
+    Environment the body of `func` is evaluated in, with its parameters bound
+    to `args`.
+    """
+    if func.layout is None:
+        env = Environment.create_enclosed_environment(func.env)
+        for param, arg in zip(func.arguments, args):
+            env.set(param.name, arg)
+        return env
+
+    frame = Frame(func.layout, func.closure, func.env)
+    # Parameters take the first slots.
+    for slot, arg in enumerate(args[: len(func.arguments)]):
+        cell = frame.values[slot]
+        if cell is None:
+            frame.values[slot] = arg
+        else:
+            cell.value = arg
+    return frame
+
+
+def prefix(operator: str, value: Optional[obj.Object]) -> Optional[obj.Object]:
+    if operator == "-":
+        if isinstance(value, IntegerObject):
+            return IntegerObject(-value.value)
+    elif operator == "!":
+        if isinstance(value, IntegerObject):
+            return BooleanObject(value.value == 0)
+        if isinstance(value, BooleanObject):
+            return BooleanObject(not value.value)
+        # `Evaluator` evaluates `!` of other values to None.
+        return None
+    return obj.ErrorObject(
+        f"unrecognized operator '-', got '{value.__class__.__name__}'"
+    )
@@ -0,0 +1,412 @@
+from typing import Callable, Dict, Generator, List, Optional, Tuple, Union
+
+import abstract_syntaxt_tree as ast
+from lexer import Lexer, Token, TokenStream, TokenType
+from tiny_parser import (
+    ParseError,
+    Parser,
+    Precedence,
+    TokenListReader,
+    show_parse_info,
+)
+
+# A parse step is a generator that yields the steps it depends on and is sent
+# back their results; its own result is the generator's return value.
+ParseResult = Union[ast.Node, List[ast.Node], ParseError]
+ParseSteps = Generator["ParseSteps", ParseResult, ParseResult]
+PrefixParseSteps = Callable[[int], ParseSteps]
+InfixParseSteps = Callable[[ast.Node, int], ParseSteps]
+
+# Prefix tokens whose parse function never recurses.
+LEAF_TOKENS = {
+    TokenType.Int,
+    TokenType.TRUE,
+    TokenType.FALSE,
+    TokenType.Ident,
+    TokenType.String,
+}
+
+BINARY_OPERATORS = {
+    TokenType.Plus,
+    TokenType.Minus,
+    TokenType.Asterisk,
+    TokenType.Slash,
+    TokenType.LT,
+    TokenType.GT,
+    TokenType.EQ,
+    TokenType.NotEQ,
+}
+
+
+class StackParser(Parser):
+    """
+    Parser producing the same nodes and errors as `Parser`, without recursion.
+
+    Every parse function that needs to parse a nested expression or statement
+    is written as a generator which yields that nested parse instead of calling
+    it. `run` keeps the suspended generators on a list, so nesting is limited by
+    memory rather than by Python's recursion limit.
+    """
+
+    def __init__(
+        self,
+        lexer: Union[Lexer, TokenStream, TokenListReader],
+        lazy_functions: bool = False,
+        validate: bool = False,
+        positions: Optional[ast.PositionTable] = None,
+        intern_nodes: bool = False,
+    ):
+        super().__init__(lexer, lazy_functions, validate, positions, intern_nodes)
+
+        self.prefix_parse_steps: Dict[TokenType, PrefixParseSteps] = {
+            TokenType.Bang: self.prefix_expression_steps,
+            TokenType.Minus: self.prefix_expression_steps,
+            TokenType.LParen: self.grouped_expression_steps,
+            TokenType.Function: self.function_literal_steps,
+            TokenType.If: self.if_expression_steps,
+            TokenType.LBracket: self.array_literal_steps,
+            TokenType.LBrace: self.hash_literal_steps,
+        }
+
+        self.infix_parse_steps: Dict[TokenType, InfixParseSteps] = {
+            TokenType.LParen: self.call_expression_steps,
+            TokenType.LBracket: self.index_expression_steps,
+        }
+
+    @staticmethod
+    def run(steps: ParseSteps) -> ParseResult:
+        stack = [steps]
+        result = None
+        while stack:
+            try:
+                nested = stack[-1].send(result)
+            except StopIteration as stop:
+                stack.pop()
+                result = stop.value
+            else:
+                stack.append(nested)
+                result = None
+
+        return result
+
+    def parse_statement(self, depth: int) -> Union[ast.Node, ParseError]:
+        return self.run(self.statement_steps(depth))
+
+    def parse_expression(
+        self, precedence: Precedence, depth: int
+    ) -> Union[ast.Node, ParseError]:
+        return self.run(self.expression_steps(precedence, depth))
+
+    def parse_block_statement(self, depth: int) -> Union[ast.Node, ParseError]:
+        return self.run(self.block_statement_steps(depth))
+
+    def statement_steps(self, depth: int) -> ParseSteps:
+        if self.cur_token.token_type == TokenType.Let:
+            node_or_err = yield self.let_statement_steps(depth)
+        elif self.cur_token.token_type == TokenType.Return:
+            node_or_err = yield self.return_statement_steps(depth)
+        else:
+            node_or_err = yield self.expression_steps(Precedence.Lowest, depth)
+
+        if self.peek_token.token_type == TokenType.Semicolon:
+            self.next_token()
+
+        if self.intern_table is not None:
+            return self.intern_table.intern(node_or_err)
+        return node_or_err
+
+    def block_statement_steps(self, depth: int) -> ParseSteps:
+        cur_token = self.cur_token
+        self.next_token()
+
+        statements: List[ast.Node] = []
+        while (
+            self.cur_token.token_type != TokenType.RBrace
+            and self.cur_token.token_type != TokenType.Eof
+        ):
+            stmt_or_err = yield self.statement_steps(depth)
+            if isinstance(stmt_or_err, ParseError):
+                return stmt_or_err
+
+            statements.append(stmt_or_err)
+            self.next_token()
+
+        block = ast.BlockStatement(self.positions.add(cur_token), statements)
+        if self.intern_table is not None:
+            return self.intern_table.intern(block)
+        return block
+
+    def let_statement_steps(self, depth: int) -> ParseSteps:
+        show_parse_info(depth, "LET STMT", self.cur_token)
+        cur_tok = self.cur_token
+        self.next_token()
+
+        ident = self.parse_identifier(depth + 1)
+        if self.intern_table is not None:
+            ident = self.intern_table.intern(ident)
+        maybe_err = self.expect_peek_and_advance(TokenType.Assign)
+        if maybe_err:
+            return maybe_err
+
+        self.next_token()
+        expr_or_err = yield self.expression_steps(Precedence.Lowest, depth + 1)
+        if isinstance(expr_or_err, ParseError):
+            return expr_or_err
+
+        self.maybe_remove_reduntant_semicolon()
+        return ast.LetStatement(self.positions.add(cur_tok), ident, expr_or_err)
+
+    def return_statement_steps(self, depth: int) -> ParseSteps:
+        show_parse_info(depth, "RETURN STMT", self.cur_token)
+        cur_tok = self.cur_token
+        self.next_token()
+        expr_or_err = yield self.expression_steps(Precedence.Lowest, depth + 1)
+        if isinstance(expr_or_err, ParseError):
+            return expr_or_err
+
+        self.maybe_remove_reduntant_semicolon()
+        return ast.ReturnStatement(self.positions.add(cur_tok), expr_or_err)
+
+    def expression_steps(self, precedence: Precedence, depth: int) -> ParseSteps:
+        """
+        Pratt loop of `Parser.parse_expression`, with the right operands of binary
+        operators parsed in place: instead of a nested parse, the left operand
+        and the operator are pushed on `operands` until the right operand is
+        complete. An error always ends the whole expression, as it would after
+        passing up through the nested parses.
+        """
+        operands: List[Tuple[ast.Node, Token, Precedence, int]] = []
+
+        while True:
+            cur_tok = self.cur_token
+            if cur_tok.token_type in LEAF_TOKENS:
+                left_expr_or_err = self.prefix_parse_functions[cur_tok.token_type](
+                    depth
+                )
+            else:
+                prefix_steps = self.prefix_parse_steps.get(cur_tok.token_type)
+                if not prefix_steps:
+                    return ParseError(
+                        cur_tok.line,
+                        cur_tok.column,
+                        f"no prefix parse function found for '{cur_tok.token_type}'",
+                    )
+
+                left_expr_or_err = yield prefix_steps(depth)
+
+            if self.intern_table is not None:
+                left_expr_or_err = self.intern_table.intern(left_expr_or_err)
+
+            while True:
+                while (
+                    self.peek_token.token_type != TokenType.Semicolon
+                    and precedence.value < self.get_peek_precedence().value
+                ):
+                    if isinstance(left_expr_or_err, ParseError):
+                        return left_expr_or_err
+
+                    token_type = self.peek_token.token_type
+                    if token_type in BINARY_OPERATORS:
+                        break
+
+                    self.next_token()
+                    infix_steps = self.infix_parse_steps[token_type]
+                    left_expr_or_err = yield infix_steps(left_expr_or_err, depth)
+                    if self.intern_table is not None:
+                        left_expr_or_err = self.intern_table.intern(left_expr_or_err)
+                else:
+                    # The expression at this precedence is complete, and it is the
+                    # right operand of the last pushed operator, if there is one.
+                    if not operands or isinstance(left_expr_or_err, ParseError):
+                        return left_expr_or_err
+
+                    left_expr, operator, precedence, depth = operands.pop()
+                    left_expr_or_err = ast.InfixExpression(
+                        self.positions.add(operator),
+                        left_expr,
+                        operator.token_type.value,
+                        left_expr_or_err,
+                    )
+                    if self.intern_table is not None:
+                        left_expr_or_err = self.intern_table.intern(left_expr_or_err)
+                    continue
+
+                break
+
+            self.next_token()
+            show_parse_info(depth, "INFIX EXPR", self.cur_token)
+            operands.append((left_expr_or_err, self.cur_token, precedence, depth))
+            precedence = self.get_current_precendence()
+            depth += 1
+            self.next_token()
+
+    def prefix_expression_steps(self, depth: int) -> ParseSteps:
+        show_parse_info(depth, "PREFIX EXPR", self.cur_token)
+        cur_tok = self.cur_token
+
+        self.next_token()
+        expr_or_err = yield self.expression_steps(Precedence.Prefix, depth + 1)
+        if isinstance(expr_or_err, ParseError):
+            return expr_or_err
+
+        return ast.PrefixExpression(
+            self.positions.add(cur_tok), cur_tok.token_type.value, expr_or_err
+        )
+
+    def grouped_expression_steps(self, depth: int) -> ParseSteps:
+        show_parse_info(depth, "GROUPED EXPR", self.cur_token)
+        self.next_token()
+
+        expr_or_err = yield self.expression_steps(Precedence.Lowest, depth + 1)
+        if isinstance(expr_or_err, ParseError):
+            return expr_or_err
+
+        self.expect_peek_and_advance(TokenType.RParen)
+        return expr_or_err
+
+    def list_of_expressions_steps(
+        self, closing_token: TokenType, depth: int
+    ) -> ParseSteps:
+        show_parse_info(depth, "LIST OF EXPR", self.cur_token)
+        expressions: List[ast.Node] = []
+
+        while (
+            self.peek_token.token_type != closing_token
+            and self.peek_token.token_type != TokenType.Eof
+        ):
+            self.next_token()
+            expr_or_err = yield self.expression_steps(Precedence.Lowest, depth + 1)
+            if isinstance(expr_or_err, ParseError):
+                return expr_or_err
+
+            expressions.append(expr_or_err)
+
+            if self.peek_token.token_type == TokenType.Comma:
+                self.next_token()
+
+        self.expect_peek_and_advance(closing_token)
+        return expressions
+
+    def function_literal_steps(self, depth: int) -> ParseSteps:
+        show_parse_info(depth, "FUNCTION", self.cur_token)
+        cur_token = self.cur_token
+        self.next_token()
+
+        params_or_err = yield self.list_of_expressions_steps(
+            TokenType.RParen, depth + 1
+        )
+        if isinstance(params_or_err, ParseError):
+            return params_or_err
+
+        self.expect_peek_and_advance(TokenType.LBrace)
+        if self.lazy_functions and self.cur_token.token_type == TokenType.LBrace:
+            return ast.Function(
+                self.positions.add(cur_token),
+                params_or_err,
+                self.defer_block_statement(depth + 1),
+            )
+
+        block_or_err = yield self.block_statement_steps(depth + 1)
+        if isinstance(block_or_err, ParseError):
+            return block_or_err
+
+        return ast.Function(self.positions.add(cur_token), params_or_err, block_or_err)
+
+    def call_expression_steps(self, left_expr: ast.Node, depth: int) -> ParseSteps:
+        show_parse_info(depth, "CALL EXPR", self.cur_token)
+        cur_token = self.cur_token
+
+        args_or_err = yield self.list_of_expressions_steps(TokenType.RParen, depth + 1)
+        if isinstance(args_or_err, ParseError):
+            return args_or_err
+
+        return ast.CallExpression(self.positions.add(cur_token), left_expr, args_or_err)
+
+    def if_expression_steps(self, depth: int) -> ParseSteps:
+        show_parse_info(depth, "IF EXPR", self.cur_token)
+        cur_token = self.cur_token
+        self.expect_peek_and_advance(TokenType.LParen)
+        self.next_token()
+
+        condition_or_err = yield self.expression_steps(Precedence.Lowest, depth + 1)
+        if isinstance(condition_or_err, ParseError):
+            return condition_or_err
+
+        self.expect_peek_and_advance(TokenType.RParen)
+        self.next_token()
+
+        consequence_or_err = yield self.block_statement_steps(depth + 1)
+        if isinstance(consequence_or_err, ParseError):
+            return consequence_or_err
+
+        if self.peek_token.token_type == TokenType.Else:
+            self.next_token()
+            self.next_token()
+            alternative_or_err = yield self.block_statement_steps(depth + 1)
+            if isinstance(alternative_or_err, ParseError):
+                return alternative_or_err
+
+            return ast.IfExpression(
+                self.positions.add(cur_token),
+                condition_or_err,
+                consequence_or_err,
+                alternative_or_err,
+            )
+        else:
+            return ast.IfExpression(
+                self.positions.add(cur_token), condition_or_err, consequence_or_err
+            )
+
+    def hash_literal_steps(self, depth: int) -> ParseSteps:
+        show_parse_info(depth, "HASH LITERAL", self.cur_token)
+        cur_token = self.cur_token
+        pairs: Dict[ast.Node, ast.Node] = {}
+
+        while (
+            self.peek_token.token_type != TokenType.RBrace
+            and self.peek_token.token_type != TokenType.Eof
+        ):
+            self.next_token()
+            left_or_err = yield self.expression_steps(Precedence.Lowest, depth + 1)
+            if isinstance(left_or_err, ParseError):
+                return left_or_err
+
+            self.expect_peek_and_advance(TokenType.Colon)
+            self.next_token()
+
+            right_or_err = yield self.expression_steps(Precedence.Lowest, depth + 1)
+            if isinstance(right_or_err, ParseError):
+                return right_or_err
+
+            if self.peek_token.token_type == TokenType.Comma:
+                self.next_token()
+            pairs[left_or_err] = right_or_err
+
+        self.expect_peek_and_advance(TokenType.RBrace)
+        return ast.HashLiteral(self.positions.add(cur_token), pairs)
+
+    def array_literal_steps(self, depth: int) -> ParseSteps:
+        show_parse_info(depth, "ARRAY LITERAL", self.cur_token)
+        cur_token = self.cur_token
+
+        exprs_or_err = yield self.list_of_expressions_steps(
+            TokenType.RBracket, depth + 1
+        )
+        if isinstance(exprs_or_err, ParseError):
+            return exprs_or_err
+
+        return ast.ArrayLiteral(self.positions.add(cur_token), exprs_or_err)
+
+    def index_expression_steps(self, left_expr: ast.Node, depth: int) -> ParseSteps:
+        show_parse_info(depth, "INDEX EXPR", self.cur_token)
+        cur_token = self.cur_token
+        self.next_token()
+
+        index_or_err = yield self.expression_steps(Precedence.Lowest, depth + 1)
+        if isinstance(index_or_err, ParseError):
+            return index_or_err
+
+        self.expect_peek_and_advance(TokenType.RBracket)
+        return ast.IndexExpression(
+            self.positions.add(cur_token), left_expr, index_or_err
+        )
@@ -0,0 +1,213 @@
+from typing import Dict, List, Optional, Tuple
+
+import abstract_syntaxt_tree as ast
+import object as obj
+from closure_compiler import ClosureCompiler
+from eval import Evaluator
+from object import Environment
+from tiny_parser import DeferredParseError
+from transpiler import GuardFailed, Transpiler
+
+# Calls after which a function is compiled.
+DEFAULT_THRESHOLD = 50
+# Failed guards after which a function is no longer transpiled to Python.
+DEFAULT_MAX_DEOPTIMIZATIONS = 3
+
+
+class TieredEvaluator(Evaluator):
+    """
+    Evaluator that interprets functions until they are hot, then compiles them.
+
+    Every call of a function in the interpreter is counted on its
+    `FunctionObject`, as an iteration when the function calls itself, as tiny
+    loops by recursion, and as an invocation otherwise. Once both together
+    reach `threshold`, the function is promoted: transpiled to Python by
+    `transpiler.Transpiler`, or, when it cannot be, compiled to closures by
+    `closure_compiler.ClosureCompiler`. Short scripts thus pay no compilation
+    cost, while hot functions reach the speed of the fastest tier that can run
+    them.
+
+    When a guard of transpiled code fails, the call is evaluated by the
+    interpreter instead, and the function is deoptimized: it is interpreted
+    again, counting calls from zero, and after `max_deoptimizations` it is
+    compiled to closures, which need no guards, on its next promotion.
+
+    Functions called from compiled code run in the same tier as their caller.
+    Compiled code makes calls by recursion, so functions that make tail calls,
+    which may loop deeper than Python's recursion limit, are not promoted, and
+    calls to them from compiled code are handed back to the interpreter's
+    trampoline.
+    The tier transitions and the calls run in each tier are counted in
+    `counters`.
+    """
+
+    def __init__(
+        self,
+        threshold: int = DEFAULT_THRESHOLD,
+        max_deoptimizations: int = DEFAULT_MAX_DEOPTIMIZATIONS,
+    ):
+        super().__init__()
+        self.threshold = threshold
+        self.max_deoptimizations = max_deoptimizations
+        self.transpiler = TieredTranspiler(self)
+        self.compiler = TieredClosureCompiler(self)
+        # Whether each function body makes tail calls, by the identity of the
+        # body, which is kept alive with it.
+        self.tail_calling: Dict[int, Tuple[ast.Node, bool]] = {}
+        # Functions being interpreted, innermost last.
+        self.active: List[obj.FunctionObject] = []
+        self.counters: Dict[str, int] = {
+            "interpreted_calls": 0,
+            "compiled_calls": 0,
+            "python_promotions": 0,
+            "closure_promotions": 0,
+            "deoptimizations": 0,
+        }
+
+    def call_function(
+        self, func: obj.FunctionObject, args: List[obj.Object], depth: int
+    ) -> obj.Object:
+        # Tail calls are made here, one after the other, as in `Evaluator`; each
+        # is counted as a call by the function that made it.
+        caller = self.active[-1] if self.active else None
+        while True:
+            res = self.call_tier(func, args, depth, caller)
+            if not isinstance(res, obj.TailCall):
+                return res
+            caller = func
+            func, args = res.function, res.args
+
+    def call_tier(
+        self,
+        func: obj.FunctionObject,
+        args: List[obj.Object],
+        depth: int,
+        caller: Optional[obj.FunctionObject],
+    ) -> obj.Object:
+        if func.compiled is None:
+            if caller is func:
+                func.iterations += 1
+            else:
+                func.invocations += 1
+            if func.invocations + func.iterations >= self.threshold:
+                if not self.makes_tail_calls(func):
+                    self.promote(func)
+
+        if func.compiled is not None:
+            try:
+                res = func.compiled(args)
+            except GuardFailed:
+                self.deoptimize(func)
+            else:
+                self.counters["compiled_calls"] += 1
+                return res
+
+        self.counters["interpreted_calls"] += 1
+        self.active.append(func)
+        try:
+            return self.run_function(func, args, depth)
+        finally:
+            self.active.pop()
+
+    def promote(self, func: obj.FunctionObject) -> None:
+        if func.deoptimizations < self.max_deoptimizations:
+            transpiled = self.transpiler.transpile_object(func)
+            if transpiled is not None:
+                env = func.env
+                func.compiled = lambda args: transpiled(args, env)
+                self.counters["python_promotions"] += 1
+                return
+
+        compiler = self.compiler
+        func.compiled = lambda args: compiler.call_function(func, args)
+        self.counters["closure_promotions"] += 1
+
+    def makes_tail_calls(self, func: obj.FunctionObject) -> bool:
+        cached = self.tail_calling.get(id(func.body))
+        if cached is None:
+            cached = (func.body, makes_tail_calls(func.body))
+            self.tail_calling[id(func.body)] = cached
+        return cached[1]
+
+    def deoptimize(self, func: obj.FunctionObject) -> None:
+        func.compiled = None
+        func.invocations = 0
+        func.iterations = 0
+        func.deoptimizations += 1
+        self.counters["deoptimizations"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters)
+
+
+class TieredTranspiler(Transpiler):
+    """
+    Transpiler whose code calls functions that make tail calls through the
+    interpreter.
+    """
+
+    def __init__(self, evaluator: TieredEvaluator):
+        super().__init__()
+        self.evaluator = evaluator
+
+    def call_python(self, env: Environment, name: str, *args: int) -> int:
+        callee = env.get(name)
+        if type(callee) is not obj.FunctionObject or not (
+            self.evaluator.makes_tail_calls(callee)
+        ):
+            return super().call_python(env, name, *args)
+
+        args = [obj.IntegerObject(arg) for arg in args]
+        result = self.evaluator.call_function(callee, args, 0)
+        if type(result) is not obj.IntegerObject:
+            raise GuardFailed()
+        return result.value
+
+
+class TieredClosureCompiler(ClosureCompiler):
+    """
+    Closure compiler whose code calls functions that make tail calls through
+    the interpreter.
+    """
+
+    def __init__(self, evaluator: TieredEvaluator):
+        super().__init__()
+        self.evaluator = evaluator
+
+    def call_function(
+        self, func: obj.FunctionObject, args: List[obj.Object]
+    ) -> Optional[obj.Object]:
+        if self.evaluator.makes_tail_calls(func):
+            return self.evaluator.call_function(func, args, 0)
+        return super().call_function(func, args)
+
+
+def makes_tail_calls(body: ast.BlockStatement) -> bool:
+    """
+    Whether a function body has calls that `Evaluator` makes as tail calls:
+    the ones in tail position, and the ones returned by statements.
+    """
+    # Nodes to look at, and whether they are in tail position rather than
+    # statements.
+    stack: List[Tuple[ast.Node, bool]] = [(body, True)]
+    while stack:
+        node, tail = stack.pop()
+        node_type = type(node)
+        if node_type is ast.CallExpression:
+            if tail:
+                return True
+        elif node_type is ast.IfExpression:
+            stack.append((node.consequence, tail))
+            if node.alternative is not None:
+                stack.append((node.alternative, tail))
+        elif isinstance(node, ast.BlockStatement):
+            try:
+                statements = node.statements
+            except DeferredParseError:
+                return False
+            stack.extend((statement, False) for statement in statements)
+            if statements and tail:
+                stack[-1] = (statements[-1], True)
+        elif node_type is ast.ReturnStatement:
+            stack.append((node.expr, True))
+    return False
@@ -1,9 +1,19 @@
 from dataclasses import dataclass
 from enum import Enum, unique
+from itertools import chain, repeat
 from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import abstract_syntaxt_tree as ast
-from lexer import Lexer, Token, TokenType
+from ast_interning import InternTable
+from lexer import (
+    Lexer,
+    LineIndexView,
+    SourceToken,
+    StreamLexer,
+    Token,
+    TokenStream,
+    TokenType,
+)
 
 DEBUG = False
 
@@ -15,6 +25,17 @@ class ParseError:
     msg: str
 
 
+class DeferredParseError(Exception):
+    """
+    Raised when the statements of a lazily parsed function body are accessed and
+    the body does not parse.
+    """
+
+    def __init__(self, error: ParseError):
+        super().__init__(f"{error.line}:{error.column}: {error.msg}")
+        self.error = error
+
+
 @unique
 class Precedence(Enum):
     Lowest = 0
@@ -50,12 +71,53 @@ def show_parse_info(depth: int, node_name: str, cur_token: Token) -> None:
         print("".join(["\t"] * depth) + f" {node_name}: token: {cur_token}")
 
 
+class TokenListReader:
+    """
+    Hands out a list of already lexed tokens with the `next_token` interface of
+    `Lexer`, followed by EOF tokens.
+    """
+
+    def __init__(self, tokens: List[Token]):
+        last = tokens[-1]
+        eof = Token(last.line, last.column + 1, TokenType.Eof)
+        self.next_token = chain(tokens, repeat(eof)).__next__
+
+
 class Parser:
-    def __init__(self, lexer: Lexer):
+    def __init__(
+        self,
+        lexer: Union[Lexer, TokenStream, TokenListReader],
+        lazy_functions: bool = False,
+        validate: bool = False,
+        positions: Optional[ast.PositionTable] = None,
+        intern_nodes: bool = False,
+    ):
+        """
+        Nodes record their tokens in `positions`, a new table unless one is given,
+        which becomes the `positions` of the parsed program.
+
+        With `intern_nodes`, structurally equal expressions and statements are
+        built once and shared, through `intern_table`.
+
+        With `lazy_functions`, the tokens of function bodies are only matched up
+        to their closing brace, and parsed the first time the body's statements
+        are accessed. Setting `validate` as well parses every body by the end of
+        `parse_program` anyway, so that their errors end up in `errors`.
+        """
+        if isinstance(lexer, TokenStream):
+            lexer = lexer.reader()
         self.lexer = lexer
         self.cur_token: Token = Token(0, 0, TokenType.Illegal)
         self.peek_token: Token = Token(0, 0, TokenType.Illegal)
         self.errors: List[ParseError] = []
+        self.lazy_functions = lazy_functions
+        self.validate = validate
+        # Lazy bodies created by this parser and by the parsers of those bodies.
+        self.lazy_bodies: List[ast.LazyBlockStatement] = []
+        self.positions = ast.PositionTable() if positions is None else positions
+        self.intern_table: Optional[InternTable] = (
+            InternTable() if intern_nodes else None
+        )
 
         self.prefix_parse_functions: Dict[TokenType, PrefixParseFunction] = {
             TokenType.Int: self.parse_integer,
@@ -95,7 +157,19 @@ class Parser:
     def parse_program(self) -> ast.Program:
         cur_token = self.cur_token
         nodes = self.parse_statements(depth=0)
-        return ast.Program(cur_token, nodes)
+        if self.validate:
+            self.parse_lazy_bodies()
+        return ast.Program(self.positions.add(cur_token), nodes, self.positions)
+
+    def parse_lazy_bodies(self) -> None:
+        # Parsing a body appends the bodies of functions nested in it.
+        i = 0
+        while i < len(self.lazy_bodies):
+            try:
+                self.lazy_bodies[i].statements
+            except DeferredParseError as exc:
+                self.errors.append(exc.error)
+            i += 1
 
     def parse_block_statement(self, depth: int) -> Union[ast.Node, ParseError]:
         cur_token = self.cur_token
@@ -113,13 +187,85 @@ class Parser:
             statements.append(stmt_or_err)
             self.next_token()
 
-        self.expect_peek_and_advance(TokenType.RBrace)
-        return ast.BlockStatement(cur_token, statements)
+        block = ast.BlockStatement(self.positions.add(cur_token), statements)
+        if self.intern_table is not None:
+            return self.intern_table.intern(block)
+        return block
+
+    def defer_block_statement(self, depth: int) -> ast.LazyBlockStatement:
+        """
+        Skip the block starting at the current `{` up to its matching `}`, and
+        return a block that parses it when first needed. A `Lexer` holding the
+        whole source skips the block's text without lexing it; otherwise the
+        block's tokens are collected.
+        """
+        cur_token = self.cur_token
+        if isinstance(self.lexer, Lexer) and not isinstance(self.lexer, StreamLexer):
+            parse = self.skip_block_source(depth)
+        else:
+            parse = self.skip_block_tokens(depth)
+
+        body = ast.LazyBlockStatement(self.positions.add(cur_token), parse)
+        self.lazy_bodies.append(body)
+        self.cur_token, self.peek_token = self.peek_token, self.lexer.next_token()
+        return body
+
+    def skip_block_source(self, depth: int) -> Callable[[], List[ast.Node]]:
+        lexer = self.lexer
+        start = self.cur_token.offset
+        end = lexer.match_brace(start)
+        if end >= 0:
+            self.peek_token = SourceToken(lexer.line_index, end, TokenType.RBrace)
+        else:
+            end = lexer.offset + len(lexer.input)
+            self.peek_token = lexer.next_token()
+
+        text = lexer.input[start - lexer.offset : end + 1 - lexer.offset]
+        line_index = lexer.line_index
+        return self.deferred_parse(
+            lambda: Lexer(text, start, LineIndexView(line_index)), depth
+        )
+
+    def skip_block_tokens(self, depth: int) -> Callable[[], List[ast.Node]]:
+        tokens: List[Token] = [self.cur_token]
+        nesting = 1
+        while nesting and self.peek_token.token_type != TokenType.Eof:
+            if self.peek_token.token_type == TokenType.LBrace:
+                nesting += 1
+            elif self.peek_token.token_type == TokenType.RBrace:
+                nesting -= 1
+            if nesting:
+                self.next_token()
+                tokens.append(self.cur_token)
+
+        tokens.append(self.peek_token)
+        return self.deferred_parse(lambda: TokenListReader(tokens), depth)
+
+    def deferred_parse(
+        self, make_lexer: Callable[[], Union[Lexer, TokenListReader]], depth: int
+    ) -> Callable[[], List[ast.Node]]:
+        parser_class = type(self)
+        lazy_bodies = self.lazy_bodies
+        positions = self.positions
+        intern_table = self.intern_table
+
+        def parse() -> List[ast.Node]:
+            parser = parser_class(
+                make_lexer(), lazy_functions=True, positions=positions
+            )
+            parser.lazy_bodies = lazy_bodies
+            parser.intern_table = intern_table
+            block_or_err = parser.parse_block_statement(depth)
+            if isinstance(block_or_err, ParseError):
+                raise DeferredParseError(block_or_err)
+            return block_or_err.statements
+
+        return parse
 
     def parse_statements(self, depth: int) -> List[ast.Node]:
         nodes: List[ast.Node] = []
         while self.cur_token.token_type != TokenType.Eof:
-            node_or_err = self.parse_statement(depth)
+            node_or_err = self.parse_next_statement(depth)
 
             # Here we are collecting all of the parsing errors.
             if isinstance(node_or_err, ParseError):
@@ -127,11 +273,19 @@ class Parser:
             else:
                 nodes.append(node_or_err)
 
+        return nodes
+
+    def parse_next_statement(self, depth: int) -> Union[ast.Node, ParseError]:
+        """
+        Parse one top-level statement and move on to the first token of the next.
+        """
+        node_or_err = self.parse_statement(depth)
+
+        self.next_token()
+        if self.cur_token.token_type == TokenType.Semicolon:
             self.next_token()
-            if self.cur_token.token_type == TokenType.Semicolon:
-                self.next_token()
 
-        return nodes
+        return node_or_err
 
     def parse_statement(self, depth: int) -> Union[ast.Node, ParseError]:
         if self.cur_token.token_type == TokenType.Let:
@@ -144,16 +298,20 @@ class Parser:
         if self.peek_token.token_type == TokenType.Semicolon:
             self.next_token()
 
+        if self.intern_table is not None:
+            return self.intern_table.intern(node_or_err)
         return node_or_err
 
     def parse_integer(self, depth: int) -> ast.Node:
         show_parse_info(depth, "INTEGER", self.cur_token)
-        return ast.IntegerLiteral(self.cur_token, int(self.cur_token.literal))
+        return ast.IntegerLiteral(
+            self.positions.add(self.cur_token), int(self.cur_token.literal)
+        )
 
     def parse_boolean(self, depth) -> ast.Node:
         show_parse_info(depth, "BOOLEAN", self.cur_token)
         return ast.BooleanLiteral(
-            self.cur_token,
+            self.positions.add(self.cur_token),
             True if self.cur_token.token_type == TokenType.TRUE else False,
         )
 
@@ -167,7 +325,7 @@ class Parser:
         if isinstance(args_or_err, ParseError):
             return args_or_err
 
-        return ast.CallExpression(cur_token, left_expr, args_or_err)
+        return ast.CallExpression(self.positions.add(cur_token), left_expr, args_or_err)
 
     def parse_function_literal(self, depth: int) -> Union[ast.Node, ParseError]:
         show_parse_info(depth, "FUNCTION", self.cur_token)
@@ -179,11 +337,18 @@ class Parser:
             return params_or_err
 
         self.expect_peek_and_advance(TokenType.LBrace)
+        if self.lazy_functions and self.cur_token.token_type == TokenType.LBrace:
+            return ast.Function(
+                self.positions.add(cur_token),
+                params_or_err,
+                self.defer_block_statement(depth + 1),
+            )
+
         block_or_err = self.parse_block_statement(depth + 1)
         if isinstance(block_or_err, ParseError):
             return block_or_err
 
-        return ast.Function(cur_token, params_or_err, block_or_err)
+        return ast.Function(self.positions.add(cur_token), params_or_err, block_or_err)
 
     def parse_list_of_expressions(
         self, closing_token: TokenType, depth: int
@@ -225,23 +390,29 @@ class Parser:
         if isinstance(consequence_or_err, ParseError):
             return consequence_or_err
 
-        self.next_token()
-
-        if self.cur_token.token_type == TokenType.Else:
+        if self.peek_token.token_type == TokenType.Else:
+            self.next_token()
             self.next_token()
             alternative_or_err = self.parse_block_statement(depth + 1)
             if isinstance(alternative_or_err, ParseError):
                 return alternative_or_err
 
             return ast.IfExpression(
-                cur_token, condition_or_err, consequence_or_err, alternative_or_err
+                self.positions.add(cur_token),
+                condition_or_err,
+                consequence_or_err,
+                alternative_or_err,
             )
         else:
-            return ast.IfExpression(cur_token, condition_or_err, consequence_or_err)
+            return ast.IfExpression(
+                self.positions.add(cur_token), condition_or_err, consequence_or_err
+            )
 
     def parse_string_literal(self, depth: int) -> Union[ast.Node, ParseError]:
         show_parse_info(depth, "STRING LITERAL", self.cur_token)
-        return ast.StringLiteral(self.cur_token, self.cur_token.literal)
+        return ast.StringLiteral(
+            self.positions.add(self.cur_token), self.cur_token.literal
+        )
 
     def parse_hash_literal(self, depth: int) -> Union[ast.Node, ParseError]:
         show_parse_info(depth, "HASH LITERAL", self.cur_token)
@@ -260,7 +431,8 @@ class Parser:
             if isinstance(right_or_err, ParseError):
                 return right_or_err
 
-            self.next_token()
+            if self.peek_token.token_type == TokenType.Comma:
+                self.next_token()
             return (left_or_err, right_or_err)
 
         while (
@@ -274,8 +446,8 @@ class Parser:
 
             pairs[pair_or_err[0]] = pair_or_err[1]
 
-        self.next_token()
-        return ast.HashLiteral(cur_token, pairs)
+        self.expect_peek_and_advance(TokenType.RBrace)
+        return ast.HashLiteral(self.positions.add(cur_token), pairs)
 
     def parse_array_literal(self, depth: int) -> Union[ast.Node, ParseError]:
         show_parse_info(depth, "ARRAY LITERAL", self.cur_token)
@@ -285,7 +457,7 @@ class Parser:
         if isinstance(exprs_or_err, ParseError):
             return exprs_or_err
 
-        return ast.ArrayLiteral(cur_token, exprs_or_err)
+        return ast.ArrayLiteral(self.positions.add(cur_token), exprs_or_err)
 
     def parse_index_expression(
         self, left_expr: ast.Node, depth: int
@@ -299,7 +471,9 @@ class Parser:
             return index_or_err
 
         self.expect_peek_and_advance(TokenType.RBracket)
-        return ast.IndexExpression(cur_token, left_expr, index_or_err)
+        return ast.IndexExpression(
+            self.positions.add(cur_token), left_expr, index_or_err
+        )
 
     def parse_grouped_expression(self, depth: int) -> Union[ast.Node, ParseError]:
         show_parse_info(depth, "GROUPED EXPR", self.cur_token)
@@ -321,7 +495,9 @@ class Parser:
         if isinstance(expr_or_err, ParseError):
             return expr_or_err
 
-        return ast.PrefixExpression(cur_tok, cur_tok.token_type.value, expr_or_err)
+        return ast.PrefixExpression(
+            self.positions.add(cur_tok), cur_tok.token_type.value, expr_or_err
+        )
 
     def parse_infix_expression(
         self, left_expr: ast.Node, depth: int
@@ -336,7 +512,10 @@ class Parser:
             return right_expr_or_err
 
         return ast.InfixExpression(
-            cur_token, left_expr, cur_token.token_type.value, right_expr_or_err
+            self.positions.add(cur_token),
+            left_expr,
+            cur_token.token_type.value,
+            right_expr_or_err,
         )
 
     def parse_return_statement(self, depth: int) -> Union[ast.Node, ParseError]:
@@ -348,7 +527,7 @@ class Parser:
             return expr_or_err
 
         self.maybe_remove_reduntant_semicolon()
-        return ast.ReturnStatement(cur_tok, expr_or_err)
+        return ast.ReturnStatement(self.positions.add(cur_tok), expr_or_err)
 
     def parse_let_statement(self, depth: int) -> Union[ast.Node, ParseError]:
         show_parse_info(depth, "LET STMT", self.cur_token)
@@ -356,6 +535,8 @@ class Parser:
         self.next_token()
 
         ident = self.parse_identifier(depth + 1)
+        if self.intern_table is not None:
+            ident = self.intern_table.intern(ident)
         maybe_err = self.expect_peek_and_advance(TokenType.Assign)
         if maybe_err:
             return maybe_err
@@ -366,7 +547,7 @@ class Parser:
             return expr_or_err
 
         self.maybe_remove_reduntant_semicolon()
-        return ast.LetStatement(cur_tok, ident, expr_or_err)
+        return ast.LetStatement(self.positions.add(cur_tok), ident, expr_or_err)
 
     def parse_expression(
         self, precedence: Precedence, depth: int
@@ -382,6 +563,8 @@ class Parser:
             )
 
         left_expr_or_err = prefix_fn(depth)
+        if self.intern_table is not None:
+            left_expr_or_err = self.intern_table.intern(left_expr_or_err)
 
         while (
             self.peek_token.token_type != TokenType.Semicolon
@@ -397,12 +580,16 @@ class Parser:
             self.next_token()
 
             left_expr_or_err = infix_fn(left_expr_or_err, depth)
+            if self.intern_table is not None:
+                left_expr_or_err = self.intern_table.intern(left_expr_or_err)
 
         return left_expr_or_err
 
     def parse_identifier(self, depth: int):
         show_parse_info(depth, "IDENTIFIER", self.cur_token)
-        return ast.Identifier(self.cur_token, self.cur_token.literal)
+        return ast.Identifier(
+            self.positions.add(self.cur_token), self.cur_token.literal
+        )
 
     def maybe_remove_reduntant_semicolon(self):
         if self.peek_token.token_type == TokenType.Semicolon:
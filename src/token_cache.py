@@ -0,0 +1,203 @@
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from typing import Dict, Optional
+
+from lexer import LEXER_VERSION, TokenStream
+
+MAGIC = b"TKNS"
+# magic, lexer version, array item size, number of tokens, number of lines
+HEADER = struct.Struct("<4sIIII")
+SUFFIX = ".tokens"
+TMP_SUFFIX = ".tmp"
+# Temporary files older than this were left behind by a writer that died.
+STALE_TMP_SECONDS = 60 * 60
+
+
+class TokenCache:
+    """
+    On-disk cache of `TokenStream`s keyed by a hash of the source and
+    `LEXER_VERSION`. Each entry is one file holding a small header followed by the
+    raw bytes of the stream's columns and line index.
+
+    Entries are written to a temporary file and renamed into place, so concurrent
+    writers (threads or processes) never expose a partially written entry. Once
+    the directory grows past `max_bytes`, the least recently used entries are
+    removed. Hits refresh an entry's modification time.
+
+    The size of the directory is scanned once, then tracked as entries are
+    written, so only puts that take it past `max_bytes` list the directory.
+    Entries written by other processes are picked up by the next scan.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.size: Optional[int] = None
+
+    def key(self, source: str) -> str:
+        digest = hashlib.sha256(source.encode("utf-8", "surrogatepass"))
+        digest.update(LEXER_VERSION.to_bytes(4, "little"))
+        return digest.hexdigest()
+
+    def path(self, source: str) -> str:
+        return os.path.join(self.directory, self.key(source) + SUFFIX)
+
+    def lex(self, source: str) -> TokenStream:
+        """
+        Return the token stream of `source`, from the cache when possible.
+        """
+        stream = self.get(source)
+        if stream is None:
+            stream = TokenStream.from_source(source)
+            self.put(source, stream)
+        return stream
+
+    def get(self, source: str) -> Optional[TokenStream]:
+        path = self.path(source)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.count("misses")
+            return None
+
+        stream = load(source, data)
+        if stream is None:
+            # Truncated or written by a different lexer / platform.
+            self.remove(path)
+            self.count("misses")
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.count("hits")
+        return stream
+
+    def put(self, source: str, stream: TokenStream) -> None:
+        data = dump(stream)
+        path = self.path(source)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            self.remove(tmp_path)
+            raise
+
+        self.count("writes")
+        with self.lock:
+            if self.size is not None:
+                self.size += len(data) - replaced
+            over = self.size is None or self.size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Scan the directory, removing the least recently used entries until it
+        fits in `max_bytes`, and temporary files left behind by failed writers.
+        """
+        entries = []
+        total = 0
+        stale = time.time() - STALE_TMP_SECONDS
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    if entry.name.endswith(SUFFIX):
+                        stat = entry.stat()
+                    elif entry.name.endswith(TMP_SUFFIX):
+                        if entry.stat().st_mtime < stale:
+                            self.remove(entry.path)
+                        continue
+                    else:
+                        continue
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self.remove(path):
+                self.count("evictions")
+            total -= size
+
+        with self.lock:
+            self.size = total
+
+    def remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def count(self, counter: str) -> None:
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
+
+
+def dump(stream: TokenStream) -> bytes:
+    columns = [getattr(stream, column) for column in TokenStream.COLUMNS]
+    line_starts = stream.line_index.starts
+    header = HEADER.pack(
+        MAGIC, LEXER_VERSION, line_starts.itemsize, len(stream), len(line_starts)
+    )
+    return header + b"".join(column.tobytes() for column in columns + [line_starts])
+
+
+def load(source: str, data: bytes) -> Optional[TokenStream]:
+    if len(data) < HEADER.size:
+        return None
+
+    magic, version, itemsize, count, lines = HEADER.unpack_from(data)
+    column_size = itemsize * count
+    if (
+        magic != MAGIC
+        or version != LEXER_VERSION
+        or itemsize != array("i").itemsize
+        or len(data)
+        != HEADER.size + column_size * len(TokenStream.COLUMNS) + itemsize * lines
+    ):
+        return None
+
+    stream = TokenStream(source)
+    offset = HEADER.size
+    for column in TokenStream.COLUMNS:
+        getattr(stream, column).frombytes(data[offset : offset + column_size])
+        offset += column_size
+
+    line_starts = array("i")
+    line_starts.frombytes(data[offset:])
+    stream.line_index.starts = line_starts
+    return stream
@@ -0,0 +1,334 @@
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import abstract_syntaxt_tree as ast
+import object as obj
+from object import Environment
+from tiny_parser import DeferredParseError
+
+# Static types of transpiled expressions, which are plain Python values.
+INT = "int"
+BOOL = "bool"
+
+ARITHMETIC_OPERATORS = ("+", "-", "*")
+ORDER_OPERATORS = ("<", ">")
+EQUALITY_OPERATORS = ("==", "!=")
+
+
+class Unsupported(Exception):
+    """
+    Raised while transpiling a function that uses something the transpiler does
+    not handle.
+    """
+
+
+class GuardFailed(Exception):
+    """
+    Raised by a transpiled function when a value it was compiled to expect has
+    another type, or a function it calls cannot be run as Python; the call is
+    then evaluated by the interpreter instead.
+    """
+
+
+class TranspiledFunction:
+    """
+    A tiny function as a Python function on plain ints and bools, taking the
+    environment its globals are looked up in, then its arguments.
+    """
+
+    def __init__(self, arity: int, source: str, python: Callable):
+        self.arity = arity
+        self.source = source
+        self.python = python
+
+    def __call__(self, args: List[obj.Object], env: Environment) -> obj.Object:
+        """
+        Call the function with tiny arguments, raising `GuardFailed` when the
+        interpreter must evaluate the call instead.
+        """
+        if len(args) != self.arity:
+            raise GuardFailed()
+        values = []
+        for arg in args:
+            if type(arg) is not obj.IntegerObject:
+                raise GuardFailed()
+            values.append(arg.value)
+
+        result = self.python(env, *values)
+        if type(result) is bool:
+            return obj.BooleanObject(result)
+        return obj.IntegerObject(result)
+
+
+class Transpiler:
+    """
+    Translates tiny functions into Python source, compiled with `compile`, so
+    that CPython runs them as its own bytecode.
+
+    Only functions of integer arithmetic, comparisons, `if`/`else`, `let`,
+    `return` and calls are transpiled, and only when every expression can be
+    given a type: integer parameters, the literals and local variables they
+    are computed from, and integer globals and call results. Functions and
+    globals a function calls and reads are looked up by name on each call, like
+    the interpreter does, and guards raise `GuardFailed` when they are not a
+    function that can be transpiled too, or an integer. As tiny functions have
+    no side effects, the interpreter can then evaluate the whole call again.
+
+    Programs whose evaluation would be an error in the interpreter are not
+    transpiled, nor are ones that would read a local variable before it is
+    assigned, which the interpreter looks up further out, or whose result may
+    be `null`. Nesting deeper than Python's recursion limit is not supported
+    either.
+    """
+
+    def __init__(self):
+        # Transpiled function of each function body, or None if it cannot be
+        # transpiled, by the identity of the body, which is kept alive with it.
+        self.functions: Dict[int, Tuple[ast.Node, Optional[TranspiledFunction]]] = {}
+        self.namespace = {
+            "call": self.call_python,
+            "get_global": get_global,
+        }
+
+    def transpile(self, func: ast.Function) -> Optional[TranspiledFunction]:
+        """
+        `func` as a Python function, or None if it cannot be transpiled.
+        """
+        return self.transpile_body(func.paramters, func.body, func.layout)
+
+    def transpile_object(
+        self, func: obj.FunctionObject
+    ) -> Optional[TranspiledFunction]:
+        return self.transpile_body(func.arguments, func.body, func.layout)
+
+    def transpile_body(
+        self,
+        params: List[ast.Identifier],
+        body: ast.BlockStatement,
+        layout: Optional[ast.FrameLayout],
+    ) -> Optional[TranspiledFunction]:
+        cached = self.functions.get(id(body))
+        if cached is not None:
+            return cached[1]
+
+        try:
+            if layout is not None and layout.captures:
+                # Variables of enclosing functions are not looked up by name.
+                raise Unsupported("closure")
+            source = FunctionWriter(params, body).write()
+            code = compile(source, "<tiny>", "exec")
+        except (Unsupported, DeferredParseError, RecursionError):
+            transpiled = None
+        else:
+            namespace = dict(self.namespace)
+            exec(code, namespace)
+            transpiled = TranspiledFunction(
+                len(params), source, namespace[FUNCTION_NAME]
+            )
+        self.functions[id(body)] = (body, transpiled)
+        return transpiled
+
+    def call_python(self, env: Environment, name: str, *args: int) -> int:
+        """
+        Call the function `name` refers to from transpiled code.
+        """
+        callee = env.get(name)
+        if type(callee) is not obj.FunctionObject:
+            raise GuardFailed()
+        cached = self.functions.get(id(callee.body))
+        transpiled = cached[1] if cached is not None else self.transpile_object(callee)
+        if transpiled is None or transpiled.arity != len(args):
+            raise GuardFailed()
+        result = transpiled.python(callee.env, *args)
+        if type(result) is not int:
+            raise GuardFailed()
+        return result
+
+
+def get_global(env: Environment, name: str) -> int:
+    value = env.get(name)
+    if type(value) is not obj.IntegerObject:
+        raise GuardFailed()
+    return value.value
+
+
+FUNCTION_NAME = "tiny_function"
+
+
+class FunctionWriter:
+    """
+    Python source of one function; raises `Unsupported` for anything it cannot
+    translate.
+    """
+
+    def __init__(self, params: List[ast.Identifier], body: ast.BlockStatement):
+        self.body = body
+        self.lines: List[str] = []
+        self.params = [param.name for param in params]
+        self.locals = set(self.params) | set(let_names(body))
+        # Type of each local variable, which never changes.
+        self.types: Dict[str, str] = {name: INT for name in self.params}
+
+    def write(self) -> str:
+        params = "".join(f", {variable(name)}" for name in self.params)
+        self.lines.append(f"def {FUNCTION_NAME}(env{params}):")
+        self.block(self.body, set(self.params), 1, tail=True)
+        return "\n".join(self.lines) + "\n"
+
+    def emit(self, indent: int, line: str) -> None:
+        self.lines.append("    " * indent + line)
+
+    def block(
+        self, block: ast.BlockStatement, assigned: Set[str], indent: int, tail: bool
+    ) -> None:
+        """
+        Statements of `block`; in tail position, the block's value is returned.
+        """
+        statements = block.statements
+        if not statements:
+            if tail:
+                raise Unsupported("evaluates to null")
+            self.emit(indent, "pass")
+            return
+
+        for i, statement in enumerate(statements):
+            self.statement(
+                statement, assigned, indent, tail and i == len(statements) - 1
+            )
+
+    def statement(
+        self, statement: ast.Node, assigned: Set[str], indent: int, tail: bool
+    ) -> None:
+        if type(statement) is ast.LetStatement:
+            if tail:
+                raise Unsupported("evaluates to None")
+            name = statement.ident.name
+            source, type_ = self.expression(statement.expr, assigned)
+            if self.types.setdefault(name, type_) != type_:
+                raise Unsupported(f"'{name}' changes type")
+            self.emit(indent, f"{variable(name)} = {source}")
+            assigned.add(name)
+        elif type(statement) is ast.ReturnStatement:
+            source, _ = self.expression(statement.expr, assigned)
+            self.emit(indent, f"return {source}")
+        elif type(statement) is ast.IfExpression:
+            condition, _ = self.expression(statement.condition, assigned)
+            self.emit(indent, f"if {condition}:")
+            self.block(statement.consequence, set(assigned), indent + 1, tail)
+            if statement.alternative is not None:
+                self.emit(indent, "else:")
+                self.block(statement.alternative, set(assigned), indent + 1, tail)
+            elif tail:
+                raise Unsupported("evaluates to null")
+        else:
+            source, _ = self.expression(statement, assigned)
+            self.emit(indent, f"return {source}" if tail else source)
+
+    def expression(self, node: ast.Node, assigned: Set[str]) -> Tuple[str, str]:
+        """
+        Python source of an expression, and its type.
+        """
+        node_type = type(node)
+        if node_type is ast.IntegerLiteral:
+            return f"{node.value}", INT
+        if node_type is ast.BooleanLiteral:
+            return f"{node.value}", BOOL
+        if node_type is ast.Identifier:
+            return self.identifier(node.name, assigned)
+
+        if node_type is ast.PrefixExpression:
+            source, type_ = self.expression(node.expr, assigned)
+            if node.operator == "-" and type_ == INT:
+                return f"(-{source})", INT
+            if node.operator == "!":
+                if type_ == INT:
+                    return f"({source} == 0)", BOOL
+                return f"(not {source})", BOOL
+            raise Unsupported(f"prefix '{node.operator}' of {type_}")
+
+        if node_type is ast.InfixExpression:
+            left, left_type = self.expression(node.left_expr, assigned)
+            right, right_type = self.expression(node.right_expr, assigned)
+            operator = node.operator
+            if left_type != right_type:
+                raise Unsupported(f"'{operator}' of {left_type} and {right_type}")
+            if operator in ARITHMETIC_OPERATORS and left_type == INT:
+                return f"({left} {operator} {right})", INT
+            if operator in ORDER_OPERATORS and left_type == INT:
+                return f"({left} {operator} {right})", BOOL
+            if operator in EQUALITY_OPERATORS:
+                return f"({left} {operator} {right})", BOOL
+            raise Unsupported(f"'{operator}' of {left_type}")
+
+        if node_type is ast.CallExpression:
+            func = node.func
+            if type(func) is not ast.Identifier or func.name in self.locals:
+                raise Unsupported("call of something else than a global")
+            args = "".join(
+                f", {self.expect(arg, assigned, INT)}" for arg in node.arguments
+            )
+            return f"call(env, {func.name!r}{args})", INT
+
+        if node_type is ast.IfExpression:
+            # Only `if`s whose branches are single expressions, like ternaries.
+            condition, _ = self.expression(node.condition, assigned)
+            consequence, type_ = self.branch(node.consequence, assigned)
+            if node.alternative is None:
+                raise Unsupported("evaluates to null")
+            alternative = self.expect_branch(node.alternative, assigned, type_)
+            return f"({consequence} if {condition} else {alternative})", type_
+
+        raise Unsupported(f"{node_type.__name__}")
+
+    def identifier(self, name: str, assigned: Set[str]) -> Tuple[str, str]:
+        if name in assigned:
+            return variable(name), self.types[name]
+        if name in self.locals:
+            raise Unsupported(f"'{name}' may be read before it is assigned")
+        return f"get_global(env, {name!r})", INT
+
+    def expect(self, node: ast.Node, assigned: Set[str], expected: str) -> str:
+        source, type_ = self.expression(node, assigned)
+        if type_ != expected:
+            raise Unsupported(f"expected {expected}, got {type_}")
+        return source
+
+    def branch(self, block: ast.BlockStatement, assigned: Set[str]) -> Tuple[str, str]:
+        statements = block.statements
+        if len(statements) != 1 or type(statements[0]) in (
+            ast.LetStatement,
+            ast.ReturnStatement,
+        ):
+            raise Unsupported("branch of an if expression is not an expression")
+        return self.expression(statements[0], assigned)
+
+    def expect_branch(
+        self, block: ast.BlockStatement, assigned: Set[str], expected: str
+    ) -> str:
+        source, type_ = self.branch(block, assigned)
+        if type_ != expected:
+            raise Unsupported(f"expected {expected}, got {type_}")
+        return source
+
+
+def variable(name: str) -> str:
+    # Prefixed, so that no tiny name is a Python keyword or a name the
+    # transpiled code uses.
+    return f"v_{name}"
+
+
+def let_names(body: ast.BlockStatement) -> List[str]:
+    """
+    Names of the `let`s of a function body; nested functions are not
+    transpiled.
+    """
+    names: List[str] = []
+    stack: List[ast.Node] = [body]
+    while stack:
+        node = stack.pop()
+        node_type = type(node)
+        if node_type is ast.Function:
+            raise Unsupported("nested function")
+        if node_type is ast.LetStatement:
+            names.append(node.ident.name)
+        stack.extend(ast.CHILDREN[node_type](node))
+    return names
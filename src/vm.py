@@ -0,0 +1,439 @@
+from typing import List, Optional, Tuple
+
+import abstract_syntaxt_tree as ast
+import object as obj
+from bytecode import Bytecode, CompiledFunction, Opcode, compile_program
+from object import (
+    ArrayObject,
+    BooleanObject,
+    Cell,
+    ClosureObject,
+    Environment,
+    Frame,
+    IntegerObject,
+    StringObject,
+)
+from operators import binary_error, binary_operations
+
+# Opcodes as plain integers, which the main loop compares faster.
+CONSTANT = Opcode.CONSTANT.value
+NULL = Opcode.NULL.value
+NONE = Opcode.NONE.value
+POP = Opcode.POP.value
+ADD = Opcode.ADD.value
+SUB = Opcode.SUB.value
+MUL = Opcode.MUL.value
+EQ = Opcode.EQ.value
+LT = Opcode.LT.value
+GT = Opcode.GT.value
+NEG = Opcode.NEG.value
+NOT = Opcode.NOT.value
+JUMP = Opcode.JUMP.value
+JUMP_IF_FALSE = Opcode.JUMP_IF_FALSE.value
+GET_GLOBAL = Opcode.GET_GLOBAL.value
+SET_GLOBAL = Opcode.SET_GLOBAL.value
+GET_LOCAL = Opcode.GET_LOCAL.value
+SET_LOCAL = Opcode.SET_LOCAL.value
+GET_CELL = Opcode.GET_CELL.value
+SET_CELL = Opcode.SET_CELL.value
+GET_FREE = Opcode.GET_FREE.value
+CLOSURE = Opcode.CLOSURE.value
+CALL = Opcode.CALL.value
+TAIL_CALL = Opcode.TAIL_CALL.value
+RETURN = Opcode.RETURN.value
+ERROR = Opcode.ERROR.value
+ARRAY = Opcode.ARRAY.value
+HASH = Opcode.HASH.value
+INDEX = Opcode.INDEX.value
+JUMP_IF_NOT_EQ = Opcode.JUMP_IF_NOT_EQ.value
+JUMP_IF_NOT_LT = Opcode.JUMP_IF_NOT_LT.value
+JUMP_IF_NOT_GT = Opcode.JUMP_IF_NOT_GT.value
+LOCAL_CONSTANT_OP = Opcode.LOCAL_CONSTANT_OP.value
+LOCAL_CONSTANT_JUMP = Opcode.LOCAL_CONSTANT_JUMP.value
+CONSTANT_OP = Opcode.CONSTANT_OP.value
+
+# Types compared by value by `==`, besides integers.
+EQUALITY_TYPES = (BooleanObject, StringObject)
+
+# Infix operator of each opcode, for the operands without a fast path. Built-in
+# type pairs have fast paths in the main loop; others, such as pairs
+# registered with `operators.register_binary`, are looked up in
+# `operators.BINARY_OPERATIONS`.
+INFIX_OPERATOR_NAMES = {
+    Opcode.ADD.value: "+",
+    Opcode.SUB.value: "-",
+    Opcode.MUL.value: "*",
+    Opcode.DIV.value: "/",
+    Opcode.EQ.value: "==",
+    Opcode.NE.value: "!=",
+    Opcode.LT.value: "<",
+    Opcode.GT.value: ">",
+}
+
+
+class VMError(Exception):
+    """
+    Stops the program, which evaluates to `error`.
+    """
+
+    def __init__(self, error: obj.ErrorObject):
+        super().__init__(error.value)
+        self.error = error
+
+
+class VM:
+    """
+    Stack-based virtual machine running the bytecode of `bytecode.Compiler`.
+
+    Values are pushed on one operand stack shared by all calls. A call pushes
+    the state of the caller on a call stack and continues in the callee's
+    code, so calls nest as deep as memory allows, without recursion; a tail
+    call replaces the caller's call, so loops written as tail calls run in
+    constant space. Variables of a call live in a list of slots laid out like
+    an `object.Frame`'s, globals in the `Environment` the program runs in, and
+    errors stop the program, as they do in `eval.Evaluator`. Only functions
+    created by the VM can be called.
+    """
+
+    def eval(self, program: ast.Program, env: Environment) -> Optional[obj.Object]:
+        return self.run(compile_program(program), env)
+
+    def run(self, bytecode: Bytecode, env: Environment) -> Optional[obj.Object]:
+        try:
+            return self.execute(bytecode.main, env)
+        except VMError as err:
+            return err.error
+
+    def execute(self, main: CompiledFunction, env: Environment) -> Optional[obj.Object]:
+        function = main
+        code = main.instructions
+        constants = main.constants
+        ip = 0
+        values: List[Optional[obj.Object]] = []
+        closure: Tuple[obj.Cell, ...] = ()
+        global_env = env
+
+        stack: List[Optional[obj.Object]] = []
+        push = stack.append
+        pop = stack.pop
+        # Stack size when the current call started, and the state of the callers.
+        base = 0
+        calls: List[tuple] = []
+        save = calls.append
+        restore = calls.pop
+
+        # Opcodes are tested in the order of how often they run in typical
+        # programs.
+        while True:
+            opcode = code[ip]
+            operand = code[ip + 1]
+            ip += 2
+
+            if opcode == GET_LOCAL:
+                value = values[operand]
+                if value is None:
+                    value = load(
+                        function, values, closure, global_env, ast.LOCAL, operand
+                    )
+                push(value)
+            elif opcode == LOCAL_CONSTANT_OP:
+                left = values[operand]
+                right = constants[code[ip + 1]]
+                # An integer, or a string when adding.
+                constant_type = type(right)
+                if type(left) is constant_type:
+                    if code[ip + 2] == ADD:
+                        push(constant_type(left.value + right.value))
+                    else:
+                        push(constant_type(left.value - right.value))
+                    ip += 4
+                else:
+                    if left is None:
+                        left = load(
+                            function, values, closure, global_env, ast.LOCAL, operand
+                        )
+                    push(left)
+            elif opcode == GET_GLOBAL:
+                value = global_env.store.get(constants[operand])
+                if value is None:
+                    # Defined in an outer environment, or not at all.
+                    value = global_env.get(constants[operand])
+                push(value)
+            elif opcode == LOCAL_CONSTANT_JUMP:
+                left = values[operand]
+                right = constants[code[ip + 1]]
+                # The constant is an integer.
+                if type(left) is IntegerObject:
+                    # The comparison, fused with the jump after it.
+                    comparison = code[ip + 2]
+                    if comparison == JUMP_IF_NOT_EQ:
+                        holds = left.value == right.value
+                    elif comparison == JUMP_IF_NOT_LT:
+                        holds = left.value < right.value
+                    else:
+                        holds = left.value > right.value
+                    ip = ip + 6 if holds else code[ip + 5]
+                else:
+                    # Only the `GET_LOCAL`.
+                    if left is None:
+                        left = load(
+                            function, values, closure, global_env, ast.LOCAL, operand
+                        )
+                    push(left)
+            elif opcode == CALL or opcode == TAIL_CALL:
+                start = len(stack) - operand
+                callee = stack[start - 1]
+                if type(callee) is not ClosureObject:
+                    raise VMError(
+                        obj.ErrorObject(f"not a function: '{obj.type_name(callee)}'")
+                    )
+                called = callee.function
+                # Parameters take the first slots; missing arguments are left
+                # unassigned, and extra ones are ignored.
+                count = len(called.parameters)
+                if operand == count:
+                    slots = stack[start:] + called.unassigned
+                else:
+                    slots = stack[start : start + count]
+                    slots += [None] * (count - len(slots)) + called.unassigned
+                for slot in called.layout.cells:
+                    slots[slot] = Cell(slots[slot])
+                if opcode == CALL:
+                    save((function, code, ip, values, closure, global_env, base))
+                    # The callee and its arguments are removed when it returns.
+                    base = start - 1
+                else:
+                    # What is left of the caller's call is not needed anymore.
+                    del stack[base:]
+                function = called
+                code = called.instructions
+                constants = called.constants
+                ip = 0
+                values = slots
+                closure = callee.closure
+                global_env = callee.env
+            elif opcode == RETURN:
+                value = pop()
+                if not calls:
+                    return value
+                del stack[base:]
+                push(value)
+                function, code, ip, values, closure, global_env, base = restore()
+                constants = function.constants
+            elif opcode == CONSTANT_OP:
+                left = stack[-1]
+                right = constants[operand]
+                constant_type = type(right)
+                if type(left) is constant_type:
+                    if code[ip] == ADD:
+                        stack[-1] = constant_type(left.value + right.value)
+                    else:
+                        stack[-1] = constant_type(left.value - right.value)
+                    ip += 2
+                else:
+                    # Only the `CONSTANT`.
+                    push(right)
+            elif opcode == ADD:
+                right = pop()
+                left = stack[-1]
+                if type(left) is IntegerObject and type(right) is IntegerObject:
+                    stack[-1] = IntegerObject(left.value + right.value)
+                elif type(left) is StringObject and type(right) is StringObject:
+                    stack[-1] = StringObject(left.value + right.value)
+                else:
+                    stack[-1] = infix(opcode, left, right)
+            elif opcode == CLOSURE:
+                compiled = constants[operand]
+                # A resolved function only keeps the cells of the variables it
+                # uses; functions of the program itself use none.
+                captures = compiled.layout.captures
+                if len(captures) == 1:
+                    source = captures[0]
+                    cells = (values[source] if source >= 0 else closure[~source],)
+                else:
+                    cells = tuple(
+                        [
+                            values[source] if source >= 0 else closure[~source]
+                            for source in captures
+                        ]
+                    )
+                push(ClosureObject(compiled, cells, global_env))
+            elif opcode == GET_FREE:
+                value = closure[operand].value
+                if value is None:
+                    value = load(
+                        function, values, closure, global_env, ast.FREE, operand
+                    )
+                push(value)
+            elif opcode == CONSTANT:
+                push(constants[operand])
+            elif opcode == SET_LOCAL:
+                values[operand] = pop()
+            elif opcode == SET_CELL:
+                values[operand].value = pop()
+            elif opcode == GET_CELL:
+                value = values[operand].value
+                if value is None:
+                    value = load(
+                        function, values, closure, global_env, ast.CELL, operand
+                    )
+                push(value)
+            elif opcode == SUB:
+                right = pop()
+                left = stack[-1]
+                if type(left) is IntegerObject and type(right) is IntegerObject:
+                    stack[-1] = IntegerObject(left.value - right.value)
+                else:
+                    stack[-1] = infix(opcode, left, right)
+            elif opcode == POP:
+                pop()
+
+            elif opcode == JUMP_IF_NOT_EQ:
+                right = pop()
+                left = stack[-1]
+                if type(left) is IntegerObject and type(right) is IntegerObject:
+                    pop()
+                    ip = ip + 2 if left.value == right.value else code[ip + 1]
+                else:
+                    # Only the comparison.
+                    stack[-1] = infix(EQ, left, right)
+            elif opcode == JUMP_IF_NOT_LT:
+                right = pop()
+                left = stack[-1]
+                if type(left) is IntegerObject and type(right) is IntegerObject:
+                    pop()
+                    ip = ip + 2 if left.value < right.value else code[ip + 1]
+                else:
+                    stack[-1] = infix(LT, left, right)
+            elif opcode == JUMP_IF_NOT_GT:
+                right = pop()
+                left = stack[-1]
+                if type(left) is IntegerObject and type(right) is IntegerObject:
+                    pop()
+                    ip = ip + 2 if left.value > right.value else code[ip + 1]
+                else:
+                    stack[-1] = infix(GT, left, right)
+            elif opcode == JUMP_IF_FALSE:
+                value = pop()
+                value_type = type(value)
+                if value_type is BooleanObject:
+                    if value.value is not True:
+                        ip = operand
+                elif value_type is IntegerObject:
+                    if value.value == 0:
+                        ip = operand
+                else:
+                    ip = operand
+            elif opcode == JUMP:
+                ip = operand
+
+            elif opcode == LT:
+                right = pop()
+                left = stack[-1]
+                if type(left) is IntegerObject and type(right) is IntegerObject:
+                    stack[-1] = BooleanObject(left.value < right.value)
+                else:
+                    stack[-1] = infix(opcode, left, right)
+            elif opcode == GT:
+                right = pop()
+                left = stack[-1]
+                if type(left) is IntegerObject and type(right) is IntegerObject:
+                    stack[-1] = BooleanObject(left.value > right.value)
+                else:
+                    stack[-1] = infix(opcode, left, right)
+            elif opcode == EQ:
+                right = pop()
+                left = stack[-1]
+                if type(left) is IntegerObject and type(right) is IntegerObject:
+                    stack[-1] = BooleanObject(left.value == right.value)
+                elif type(left) is type(right) and type(left) in EQUALITY_TYPES:
+                    stack[-1] = BooleanObject(left.value == right.value)
+                else:
+                    stack[-1] = infix(opcode, left, right)
+            elif opcode == MUL:
+                right = pop()
+                left = stack[-1]
+                if type(left) is IntegerObject and type(right) is IntegerObject:
+                    stack[-1] = IntegerObject(left.value * right.value)
+                else:
+                    stack[-1] = infix(opcode, left, right)
+            elif opcode in INFIX_OPERATOR_NAMES:
+                right = pop()
+                stack[-1] = infix(opcode, stack[-1], right)
+
+            elif opcode == SET_GLOBAL:
+                global_env.set(constants[operand], pop())
+            elif opcode == NONE:
+                push(None)
+            elif opcode == NULL:
+                push(obj.NULL)
+            elif opcode == NEG:
+                value = stack[-1]
+                if type(value) is not IntegerObject:
+                    raise VMError(
+                        obj.ErrorObject(
+                            "unrecognized operator '-', "
+                            f"got '{obj.type_name(value)}'"
+                        )
+                    )
+                stack[-1] = IntegerObject(-value.value)
+            elif opcode == NOT:
+                value = stack[-1]
+                if type(value) is IntegerObject:
+                    stack[-1] = BooleanObject(value.value == 0)
+                elif type(value) is BooleanObject:
+                    stack[-1] = BooleanObject(not value.value)
+                else:
+                    stack[-1] = None
+            elif opcode == ERROR:
+                raise VMError(constants[operand])
+
+            elif opcode == ARRAY:
+                start = len(stack) - operand
+                elements = stack[start:]
+                del stack[start:]
+                push(ArrayObject(elements))
+            elif opcode == HASH:
+                start = len(stack) - 2 * operand
+                items = stack[start:]
+                del stack[start:]
+                value = obj.build_hash(items)
+                if type(value) is obj.ErrorObject:
+                    raise VMError(value)
+                push(value)
+            elif opcode == INDEX:
+                index = pop()
+                value = obj.index_value(stack[-1], index)
+                if type(value) is obj.ErrorObject:
+                    raise VMError(value)
+                stack[-1] = value
+
+            else:
+                raise ValueError(f"unknown opcode {opcode} at {ip - 2}")
+
+
+def load(
+    function: CompiledFunction,
+    values: List[Optional[obj.Object]],
+    closure: Tuple[obj.Cell, ...],
+    env: Environment,
+    scope: int,
+    slot: int,
+) -> obj.Object:
+    """
+    Value of a variable of `function` that is not assigned yet, which is looked
+    up further out, as in an `object.Frame`.
+    """
+    names = function.free_names if scope == ast.FREE else function.layout.names
+    frame = Frame.over(values, closure, function.layout, env)
+    return frame.load(scope, slot, names[slot])
+
+
+def infix(opcode: int, left: Optional[obj.Object], right: Optional[obj.Object]):
+    operator = INFIX_OPERATOR_NAMES[opcode]
+    by_right_type = binary_operations(operator).get(type(left))
+    if by_right_type is not None:
+        operation = by_right_type.get(type(right))
+        if operation is not None:
+            return operation(left, right)
+    raise VMError(binary_error(operator, left, right))
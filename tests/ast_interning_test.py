@@ -0,0 +1,53 @@
+import abstract_syntaxt_tree as ast
+import pytest
+from lexer import Lexer
+from stack_parser import StackParser
+from tiny_parser import Parser
+
+INPUT = """
+let a = x * 2 + 1;
+let b = x * 2 + 1;
+let f = fn(x) { if (x < 10) { x * 2 + 1 } else { [1, "two", {"k": x}] } };
+let g = fn(x) { if (x < 10) { x * 2 + 1 } else { [1, "two", {"k": x}] } };
+f(x * 2 + 1)[0];
+-a;
+"""
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+@pytest.mark.parametrize("parser_class", [Parser, StackParser])
+def test_interned_parse_matches_plain_parse(parser_class):
+    expected_program = parser_class(Lexer(INPUT)).parse_program()
+
+    parser = parser_class(Lexer(INPUT), intern_nodes=True)
+    program = parser.parse_program()
+    assert not parser.errors
+    assert program == expected_program
+    assert f"{program}" == f"{expected_program}"
+
+    a, b, f, g, call = program.statements[:5]
+    assert a.expr is b.expr
+    assert f.expr is g.expr
+    assert call.left_expr.arguments[0] is a.expr
+    assert a.ident is not b.ident
+
+    stats = parser.intern_table.stats()
+    assert stats["shared"] > 0
+    assert stats["nodes"] == stats["unique"] + stats["shared"]
+    assert stats["dedup_ratio"] > 1
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_lazy_bodies_are_not_interned():
+    source = "let f = fn(x) { x * 2 }; let g = fn(x) { x * 2 }; x * 2;"
+    parser = Parser(Lexer(source), lazy_functions=True, intern_nodes=True)
+    program = parser.parse_program()
+
+    f, g, expr = program.statements
+    assert f.expr is not g.expr
+    assert isinstance(f.expr.body, ast.LazyBlockStatement)
+    # Bodies share the table once parsed.
+    assert f.expr.body.statements[0] is g.expr.body.statements[0]
+    assert f.expr.body.statements[0] is expr
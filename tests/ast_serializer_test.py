@@ -0,0 +1,122 @@
+import os
+import zlib
+from array import array
+from dataclasses import fields
+
+import abstract_syntaxt_tree as ast
+import pytest
+from ast_serializer import FORMAT_VERSION, HEADER, MAGIC, Writer, dump, load, parse_file
+from lexer import Lexer
+from tiny_parser import Parser
+
+INPUT = """
+let five = 5;
+let big = 12345678901234567890;
+let add = fn(x, y) { x + y; };
+let greeting = "multi-line
+string";
+add(-five, [1, 2 * 3][0]) != !false;
+if (five < 10) { return table["one"]; } else { return "ünïcode"; }
+if (five > 10) { five }; {"one": 1, 2: true}
+"""
+
+
+def walk_positions(node: ast.Node):
+    yield node.position
+    for field in fields(node):
+        value = getattr(node, field.name)
+        if isinstance(value, ast.Node):
+            yield from walk_positions(value)
+        elif isinstance(value, list):
+            for item in value:
+                yield from walk_positions(item)
+        elif isinstance(value, dict):
+            for pair in value.items():
+                for item in pair:
+                    yield from walk_positions(item)
+
+
+def writer_codes(program: ast.Program) -> array:
+    writer = Writer()
+    writer.write(program)
+    return writer.codes()
+
+
+def writer_positions(program: ast.Program) -> bytes:
+    writer = Writer()
+    writer.write(program)
+    return writer.positions().tobytes()
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_ast_round_trip():
+    parser = Parser(Lexer(INPUT))
+    program = parser.parse_program()
+    assert not parser.errors
+
+    data = dump(program, INPUT)
+
+    loaded = load(data)
+    assert f"{loaded}" == f"{program}"
+    assert all(position == ast.NO_POSITION for position in walk_positions(loaded))
+    assert len(loaded.positions) == 0
+
+    loaded = load(data, INPUT, positions=True)
+    assert loaded == program
+    for position, expected_position in zip(
+        walk_positions(loaded), walk_positions(program)
+    ):
+        tok = loaded.positions.token(position)
+        expected_token = program.positions.token(expected_position)
+        assert tok.compare(expected_token), f"expected `{expected_token}`, got `{tok}`"
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_ast_load_rejects_invalid_data():
+    program = Parser(Lexer("let a = 1;")).parse_program()
+    data = dump(program, "let a = 1;")
+
+    assert load(data, "let a = 2;") is None
+    assert load(data[:-3], positions=True) is None
+    assert load(data[:60]) is None
+    assert load(b"TAST") is None
+    assert load(b"XXXX" + data[4:]) is None
+
+    # Valid sections without codes, or with the codes of two programs.
+    for codes in (array("i"), writer_codes(program) + writer_codes(program)):
+        section = zlib.compress(codes.tobytes())
+        header = HEADER.pack(
+            MAGIC, FORMAT_VERSION, bytes(32), 0, len(codes), 0, len(section)
+        )
+        assert load(header + section + zlib.compress(b"")) is None
+
+    # Positions with a token code or literal out of range.
+    positions_start = len(data) - len(zlib.compress(writer_positions(program)))
+    for index, value in ((0, 999), (0, -1), (1, 999), (1, -1)):
+        fields = array("i", writer_positions(program))
+        fields[index] = value
+        corrupt = data[:positions_start] + zlib.compress(fields.tobytes())
+        assert load(corrupt, "let a = 1;", positions=True) is None
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_parse_file_writes_and_reuses_compiled_program(tmp_path):
+    path = str(tmp_path / "prelude.tiny")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(INPUT)
+
+    program, errors = parse_file(path)
+    assert not errors
+    assert os.path.exists(path + "c")
+
+    loaded, errors = parse_file(path, positions=True)
+    assert not errors
+    assert loaded == program
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("let a = ;")
+    program, errors = parse_file(path)
+    assert errors
@@ -0,0 +1,82 @@
+import pytest
+from closure_compiler import ClosureCompiler
+from eval import Evaluator
+from helpers import evaluate, parse
+from object import Environment
+from optimizer import optimize
+from resolver import resolve
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize(
+    "input",
+    [
+        "5",
+        "-5 + 10 * 2 - 3 / 2",
+        '"a" + "b" == "ab"',
+        "!0 == !!true",
+        "1 < 2 != 2 > 1",
+        "if (1 > 2) { 10 }",
+        "if (0) { 10 } else { 20 }",
+        "let x = 1;",
+        "let x = 1; x",
+        "y",
+        "return 1; 2",
+        "-true",
+        '!"a"',
+        "1 + true",
+        "true + false",
+        "true - false",
+        '"a" * "b"',
+        "let f = fn() { let x = 1; }; 1 + f()",
+        "1 + [1, 2]",
+        "[1] + [2]",
+        "-(2 + true)",
+        "5()",
+        "let f = fn() { 1 }; f(1 + true)",
+        "let f = fn(a, b) { a + b }; f(1, 2)",
+        "let f = fn(a, b) { b }; let b = 3; f(1)",
+        "let f = fn(a) { a }; f(1, 2, 3)",
+        "let f = fn() { if (true) { return 1; } 2 }; f()",
+        "let f = fn() { 1 + if (true) { return 1; } }; f()",
+        "let f = fn() { }; f()",
+        "let adder = fn(a) { fn(b) { fn(c) { a + b + c } } }; adder(1)(2)(3)",
+        "let x = 1; let f = fn() { let y = x; let x = 5; y + x }; f()",
+        "let f = fn() { let g = fn() { y }; let y = 2; g() }; f()",
+        "let f = fn(c) { if (c) { let v = 1; } v }; let v = 7; f(false)",
+        "let f = fn(x) { fn() { let y = x; let x = 3; y } }; f(2)()",
+        "let f = fn(a, a) { a }; f(1, 2)",
+        "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(15)",
+    ],
+)
+def test_compiled_program_evaluates_like_evaluator(input):
+    expected = evaluate(Evaluator(), parse(input))
+    assert evaluate(ClosureCompiler(), parse(input)) == expected
+    assert evaluate(ClosureCompiler(), resolve(parse(input))) == expected
+    assert evaluate(ClosureCompiler(), resolve(optimize(parse(input)))) == expected
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_compiled_lazy_bodies():
+    source = "let f = fn(a) { let g = fn(b) { a + b }; g(2) }; f(1)"
+    assert evaluate(ClosureCompiler(), parse(source, lazy_functions=True)) == (
+        "IntegerObject: 3"
+    )
+
+    program = parse("let f = fn() { let = 1 }; f()", lazy_functions=True)
+    res = ClosureCompiler().eval(program, Environment())
+    assert f"{res!r}" == f"{Evaluator().eval(program, Environment())!r}"
+    assert f"{res!r}".startswith("ERROR: ")
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_engines_share_environment():
+    env = Environment()
+    Evaluator().eval(parse("let double = fn(x) { x * 2 };"), env)
+    ClosureCompiler().eval(parse("let triple = fn(x) { x * 3 };"), env)
+
+    assert f"{ClosureCompiler().eval(parse('double(2)'), env)!r}" == "4"
+    assert f"{Evaluator().eval(parse('triple(2)'), env)!r}" == "6"
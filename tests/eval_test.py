@@ -1,8 +1,13 @@
 import pytest
+from dataclasses import dataclass, field
+import abstract_syntaxt_tree as ast
+import eval
+import sys
 from eval import Evaluator
 from lexer import Lexer
 from tiny_parser import Parser
 from object import Environment
+from resolver import resolve
 import object as obj
 
 
@@ -188,6 +193,147 @@ def test_evaluate_prefix_expression():
         assert_boolean(res, test["expected"])
 
 
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_evaluate_arrays_hashes_and_index_expressions():
+    tests = [
+        {"input": "[1, 2 * 2, 3 + 3]", "expected": "[1, 4, 6]"},
+        {"input": "[1, 2, 3][1]", "expected": "2"},
+        {"input": "let a = [1, 2]; a[0] + a[1]", "expected": "3"},
+        {"input": "[1, 2][2]", "expected": "null"},
+        {"input": '{"a": 1, 2: "b"}', "expected": "{a: 1, 2: b}"},
+        {"input": '{"a": 5 * 2}["a"]', "expected": "10"},
+        {"input": '{"a": 1}["b"]', "expected": "null"},
+        {
+            "input": "[1, 2 + true]",
+            "expected": "ERROR: type mismatch, got "
+            "'IntegerObject' and 'BooleanObject'",
+        },
+        {
+            "input": '{"a": 1}[[1]]',
+            "expected": "ERROR: unusable as hash key: " "'ArrayObject'",
+        },
+        {
+            "input": "5[0]",
+            "expected": "ERROR: index operator not supported: "
+            "'IntegerObject' and 'IntegerObject'",
+        },
+    ]
+
+    for test in tests:
+        assert f"{evaluate(test['input'])!r}" == test["expected"]
+
+
+@dataclass(slots=True)
+class DoubledIntegerLiteral(ast.IntegerLiteral):
+    pass
+
+
+@dataclass(slots=True)
+class DebugNode(ast.Node):
+    position: int = field(compare=False)
+    value: str
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_evaluate_dispatches_on_node_class():
+    # Without a handler of their own, nodes are evaluated like their base class.
+    node = DoubledIntegerLiteral(ast.NO_POSITION, 4)
+    assert_integer(Evaluator().eval(node, Environment()), 4)
+
+    with pytest.raises(TypeError):
+        Evaluator().eval(DebugNode(ast.NO_POSITION, "x"), Environment())
+
+    class PluginEvaluator(Evaluator):
+        pass
+
+    PluginEvaluator.register(
+        DebugNode, lambda evaluator, node, env, depth: obj.StringObject(node.value)
+    )
+    PluginEvaluator.register(
+        DoubledIntegerLiteral,
+        lambda evaluator, node, env, depth: obj.IntegerObject(node.value * 2),
+    )
+    assert_string(
+        PluginEvaluator().eval(DebugNode(ast.NO_POSITION, "x"), Environment()), "x"
+    )
+    assert_integer(PluginEvaluator().eval(node, Environment()), 8)
+    # Registering on a subclass leaves the evaluator itself as it was.
+    assert DebugNode not in Evaluator.handlers
+    assert_integer(Evaluator().eval(node, Environment()), 4)
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize("resolved", [False, True])
+def test_evaluate_tail_calls_in_constant_stack(monkeypatch, resolved):
+    monkeypatch.setattr(eval, "DEBUG", False)
+    # Far deeper than the recursion limit, were every call nested.
+    n = sys.getrecursionlimit() * 5
+    tests = [
+        (
+            "let sum = fn(n, acc) { if (n == 0) { return acc; } sum(n - 1, acc + n) };"
+            f"sum({n}, 0)",
+            n * (n + 1) // 2,
+        ),
+        (
+            "let sum = fn(n, acc) { if (n == 0) { acc } else { return sum(n - 1, acc + n); } };"
+            f"sum({n}, 0)",
+            n * (n + 1) // 2,
+        ),
+        (
+            "let even = fn(n) { if (n == 0) { true } else { odd(n - 1) } };"
+            "let odd = fn(n) { if (n == 0) { false } else { even(n - 1) } };"
+            f"if (even({n})) {{ 1 }} else {{ 0 }}",
+            1,
+        ),
+        (
+            "let count = fn(n) { if (n > 0) { return count(n - 1); } let done = n; done };"
+            f"return count({n});",
+            0,
+        ),
+    ]
+
+    for input, expected in tests:
+        program = Parser(Lexer(input)).parse_program()
+        if resolved:
+            program = resolve(program)
+        assert_integer(Evaluator().eval(program, Environment()), expected)
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_evaluate_calls_not_in_tail_position():
+    tests = [
+        ("let f = fn(n) { if (n == 0) { 0 } else { 1 + f(n - 1) } }; f(10)", 10),
+        ("let f = fn() { let x = g(); x }; let g = fn() { 2 }; f() * 3", 6),
+        ("let f = fn(a) { a }; let g = fn() { f(1); f(2) }; g() + f(3)", 5),
+    ]
+    for input, expected in tests:
+        assert_integer(evaluate(input), expected)
+
+    res = evaluate("let f = fn() { g(1 + true) }; let g = fn(a) { a }; f()")
+    assert res == obj.ErrorObject(
+        "type mismatch, got 'IntegerObject' and 'BooleanObject'"
+    )
+    res = evaluate("let f = fn() { 5() }; f()")
+    assert res == obj.ErrorObject("not a function: 'IntegerObject'")
+
+    # Returns inside expressions make their call before the value is used.
+    res = evaluate(
+        "let g = fn() { 1 + true }; "
+        "let f = fn() { let y = if (true) { return g(); }; 7 }; f()"
+    )
+    assert res == obj.ErrorObject(
+        "type mismatch, got 'IntegerObject' and 'BooleanObject'"
+    )
+    res = evaluate(
+        "let g = fn() { 5 }; let f = fn() { [if (true) { return g(); }] }; f()"
+    )
+    assert f"{res!r}" == "[return 5]"
+
+
 def evaluate(input: str) -> obj.Object:
     evaluator = Evaluator()
     env = Environment()
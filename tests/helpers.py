@@ -0,0 +1,20 @@
+import eval
+from lexer import Lexer
+from object import Environment
+from tiny_parser import Parser
+
+# Tests that compare engines with `eval.Evaluator` expect its results without
+# the debug output.
+eval.DEBUG = False
+
+
+def parse(input: str, **options):
+    parser = Parser(Lexer(input), **options)
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
+
+
+def evaluate(engine, program) -> str:
+    res = engine.eval(program, Environment())
+    return f"{type(res).__name__}: {res!r}"
@@ -0,0 +1,109 @@
+import random
+
+import pytest
+from incremental import Document
+from lexer import Lexer
+from tiny_parser import ParseError, Parser
+
+INPUT = """
+let five = 5;
+let add = fn(x, y) { x + y; };
+let greeting = "multi-line
+string";
+let result = add(five, 10);
+if (result > 10) { return true; } else { return false; }
+[1, 2, 3][0]; let broken = ;
+let after = five * 2;
+"""
+
+
+def assert_matches_full_parse(document: Document):
+    parser = Parser(Lexer(document.source))
+    program = parser.parse_program()
+
+    assert f"{document.program}" == f"{program}"
+    assert document.errors == parser.errors
+    assert document.error_indexes == [
+        i for i, stmt in enumerate(document.statements) if isinstance(stmt, ParseError)
+    ]
+    assert document.quotes == document.source.count('"')
+
+    expected_tokens = [
+        program.positions.token(stmt.position) for stmt in program.statements
+    ]
+    tokens = [
+        document.program.positions.token(stmt.position)
+        for stmt in document.program.statements
+    ]
+    for tok, expected_token in zip(tokens, expected_tokens):
+        assert tok.compare(expected_token), f"expected `{expected_token}`, got `{tok}`"
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_document_edits():
+    document = Document(INPUT)
+    assert_matches_full_parse(document)
+
+    edits = [
+        (INPUT.index("5;"), 1, "50"),  # change a literal
+        (INPUT.index("let add"), 0, "let extra = 1;\n\n"),  # insert a statement
+        (INPUT.index("multi-line"), 0, '"; "'),  # split the string
+        (INPUT.index(" = ;"), 3, " = 7;"),  # fix the parse error
+        (0, 0, "  \n"),  # leading whitespace
+        (len(INPUT), 0, "let last = 0"),  # append
+    ]
+    for offset, deleted, inserted in edits:
+        # Offsets refer to INPUT; map them onto the current source.
+        offset = min(offset + len(document.source) - len(INPUT), len(document.source))
+        document.edit(max(offset, 0), deleted, inserted)
+        assert_matches_full_parse(document)
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_document_random_edits():
+    rng = random.Random(1234)
+    # No braces: hash literals with non-literal keys crash the parser.
+    input = (
+        'let a = 1;\nlet b = add(a, "two\nlines") * 3;\n[a, b][0] == -a;\nlet = ;\nb'
+    )
+    pieces = ["let", " ", "x", "=", "1", ";", "\n", "(", ")", '"', "+", "fn"]
+    document = Document(input)
+
+    for _ in range(300):
+        offset = rng.randint(0, len(document.source))
+        deleted = rng.randint(0, min(3, len(document.source) - offset))
+        inserted = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 3)))
+        document.edit(offset, deleted, inserted)
+        assert_matches_full_parse(document)
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_document_reparses_only_around_the_edit():
+    source = "".join(f"let value{i} = {i} * 2;\n" for i in range(5000))
+    document = Document(source)
+    assert document.reparsed == 5000
+
+    offset = source.index("2500 * 2")
+    document.edit(offset, 4, "1234")
+
+    assert document.reparsed <= 5
+    assert f"{document.program.statements[2500]}" == "let value2500 = (1234 * 2)"
+    assert_matches_full_parse(document)
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_document_position_table_stays_bounded():
+    source = "".join(f"let value{i} = {i} * 2;\n" for i in range(100))
+    document = Document(source)
+    size = len(document.positions)
+
+    offset = source.index("50 * 2")
+    for i in range(1000):
+        document.edit(offset, 2, f"{i % 90 + 10}")
+        assert len(document.positions) < 3 * size
+
+    assert_matches_full_parse(document)
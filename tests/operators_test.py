@@ -0,0 +1,91 @@
+import eval
+import pytest
+from closure_compiler import ClosureCompiler
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment, IntegerObject, StringObject
+from operators import BINARY_OPERATIONS, binary_operations
+from tiny_parser import Parser
+from vm import VM
+
+eval.DEBUG = False
+
+
+def parse(input: str):
+    parser = Parser(Lexer(input))
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
+
+
+def evaluate(engine, program) -> str:
+    res = engine.eval(program, Environment())
+    return f"{type(res).__name__}: {res!r}"
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize(
+    "input, expected",
+    [
+        ("7 - 2 * 3", "IntegerObject: 1"),
+        ("6 / 4", "IntegerObject: 1.5"),
+        ('"a" + "b"', "StringObject: ab"),
+        ("1 < 2", "BooleanObject: True"),
+        ("true != false", "BooleanObject: True"),
+        ('"a" == "a"', "BooleanObject: True"),
+        (
+            "1 + true",
+            "ErrorObject: ERROR: type mismatch, got 'IntegerObject' and 'BooleanObject'",
+        ),
+        (
+            "true + false",
+            "ErrorObject: ERROR: unrecognized operator '-', "
+            "got 'BooleanObject' and 'BooleanObject'",
+        ),
+        (
+            '"a" * "b"',
+            "ErrorObject: ERROR: unrecognized operator '*', "
+            "got 'StringObject' and 'StringObject'",
+        ),
+        (
+            "true < false",
+            "ErrorObject: ERROR: unrecognized operator '<', "
+            "got 'BooleanObject' and 'BooleanObject'",
+        ),
+    ],
+)
+def test_binary_operations(input, expected):
+    for engine in (Evaluator(), ClosureCompiler(), VM()):
+        assert evaluate(engine, parse(input)) == expected
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_operations_are_resolved_once_per_expression():
+    program = parse("1 + 2")
+    infix = program.statements[0]
+    assert infix.operations is None
+
+    evaluator = Evaluator()
+    evaluator.eval(program, Environment())
+    assert infix.operations is BINARY_OPERATIONS["+"]
+    assert evaluate(evaluator, program) == "IntegerObject: 3"
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_registered_type_pair(monkeypatch):
+    program = parse('let f = fn(a, b) { a + b }; f(1, "a")')
+    assert evaluate(Evaluator(), program) == (
+        "ErrorObject: ERROR: type mismatch, got 'IntegerObject' and 'StringObject'"
+    )
+
+    # Registered after the expression resolved its operator.
+    monkeypatch.setitem(
+        binary_operations("+")[IntegerObject],
+        StringObject,
+        lambda left, right: StringObject(f"{left.value}{right.value}"),
+    )
+    for engine in (Evaluator(), ClosureCompiler(), VM()):
+        assert evaluate(engine, program) == "StringObject: 1a"
@@ -0,0 +1,131 @@
+import abstract_syntaxt_tree as ast
+import eval
+import pytest
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment
+from optimizer import optimize
+from tiny_parser import Parser
+
+eval.DEBUG = False
+
+
+def parse(input: str) -> ast.Program:
+    parser = Parser(Lexer(input))
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
+
+
+def evaluate(program: ast.Program) -> str:
+    env = Environment()
+    env.set("x", Evaluator().eval(parse("7"), env))
+    env.set("s", Evaluator().eval(parse('"str"'), env))
+    return f"{Evaluator().eval(program, env)!r}"
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize(
+    "input, expected",
+    [
+        ("60 * 60 * 24", "86400"),
+        ("-5", "-5"),
+        ('"a" + "b"', '"ab"'),
+        ("!true", "False"),
+        ("!0", "True"),
+        ("1 < 2 == true", "True"),
+        ('"a" != "b"', "True"),
+        ("(x - 1) * 1", "(x - 1)"),
+        ("1 * (x - 2)", "(x - 2)"),
+        ("(x * 2) + 0", "(x * 2)"),
+        ("-x - 0", "(-x)"),
+        ("if (1 < 2) { 10 } else { 20 }", "{10}"),
+        ("if (false) { 10 } else { 20 }", "{20}"),
+        ("if (0) { 10 }", "{}"),
+        ('if ("s") { 10 }', "{}"),
+        ("let y = if (true) { 1 + 1 }", "let y = {2}"),
+    ],
+)
+def test_optimize_folds(input, expected):
+    program = parse(input)
+    optimized = optimize(program)
+
+    assert f"{optimized}" == expected
+    assert evaluate(optimized) == evaluate(program)
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize(
+    "input",
+    [
+        "1 + true",
+        '"a" - "b"',
+        "true + false",
+        '-"a"',
+        "-true",
+        '!"a"',
+        "6 / 3",
+        "x / 1",
+        "x * 0",
+        "x * 1",
+        "s * 1",
+        "s + 0",
+        "0 + s",
+        "1 * true",
+        "if (x) { 1 }",
+    ],
+)
+def test_optimize_keeps_what_does_not_fold(input):
+    program = parse(input)
+    optimized = optimize(program)
+
+    assert f"{optimized}" == f"{program}"
+    assert evaluate(optimized) == evaluate(program)
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_optimize_does_not_modify_program():
+    program = parse("let a = 1 + 2; let b = a * 1; a + b;")
+    expected = f"{program}"
+
+    optimized = optimize(program)
+    assert f"{program}" == expected
+    assert optimized.statements[2] is program.statements[2]
+    assert optimized.positions is program.positions
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_optimize_deeply_nested_expression():
+    program = parse(" + ".join(["1"] * 5000))
+    optimized = optimize(program)
+    assert f"{optimized}" == "5000"
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_optimize_function_bodies():
+    program = parse("fn(a) { return a + 2 * 3 }")
+    assert f"{optimize(program)}" == "fn(a) {return (a + 6)}"
+
+    program = Parser(
+        Lexer("fn(a) { return a + 2 * 3 }"), lazy_functions=True
+    ).parse_program()
+    program.statements[0].body.statements
+    assert f"{optimize(program)}" == "fn(a) {return (a + 6)}"
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_optimize_leaves_unparsed_bodies():
+    program = Parser(
+        Lexer("let f = fn() { 1 + 2 };"), lazy_functions=True
+    ).parse_program()
+    optimized = optimize(program)
+
+    body = program.statements[0].expr.body
+    assert optimized.statements[0].expr.body is body
+    assert not body.parsed
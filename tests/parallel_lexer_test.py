@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from lexer import TokenStream
+from parallel_lexer import lex_parallel, split_source
+
+INPUT = """
+let one = 1;
+let greeting = "semicolons; inside
+a multi-line string; are not boundaries";
+let add = fn(x, y) { let z = x; z + y; };
+    let nested = { "key": fn() { 1; 2; } };
+let result = add(one, 2);
+!-/*5; "unterminated ; string
+let after = 3;
+"""
+
+
+def assert_same_streams(stream: TokenStream, expected: TokenStream):
+    assert len(stream) == len(expected)
+    for index in range(len(expected)):
+        assert stream[index].compare(
+            expected[index]
+        ), f"expected `{expected[index]}`, got `{stream[index]}`"
+
+
+@pytest.mark.sanity
+@pytest.mark.lexer
+def test_split_source_at_top_level_semicolons():
+    chunks = split_source(INPUT, len(INPUT))
+
+    assert "".join(text for text, _ in chunks) == INPUT
+    for text, _ in chunks[:-1]:
+        assert text.endswith(";")
+
+    texts = [text.strip() for text, _ in chunks]
+    assert (
+        'let greeting = "semicolons; inside\na multi-line string; are not boundaries";'
+        in texts
+    )
+    assert "let add = fn(x, y) { let z = x; z + y; };" in texts
+    assert texts[-1].startswith('"unterminated ; string')
+
+
+@pytest.mark.sanity
+@pytest.mark.lexer
+@pytest.mark.parametrize("workers", [1, 2, 5, 50])
+def test_lex_parallel_matches_token_stream(workers):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        stream = lex_parallel(INPUT, workers, executor, min_size=0)
+
+    assert_same_streams(stream, TokenStream.from_source(INPUT))
+
+
+@pytest.mark.sanity
+@pytest.mark.lexer
+def test_lex_parallel_with_process_pool():
+    input = INPUT * 50
+    stream = lex_parallel(input, workers=2, min_size=0)
+
+    assert_same_streams(stream, TokenStream.from_source(input))
@@ -1,9 +1,11 @@
+import io
 from typing import Type
 
 import abstract_syntaxt_tree as ast
 import pytest
-from lexer import Lexer
-from tiny_parser import Parser
+from lexer import Lexer, StreamLexer, TokenStream
+from stack_parser import StackParser
+from tiny_parser import DeferredParseError, Parser
 
 
 @pytest.mark.sanity
@@ -532,6 +534,105 @@ def test_parse_return_statement():
         assert_node_type(program.statements[0], ast.ReturnStatement)
 
 
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_parse_from_stream_lexer():
+    input = """
+        let add = fn(x, y) { x + y; };
+        let result = add(five * 10, "a string spanning chunks");
+        if (result == 10) { return [1, 2][0]; }
+    """
+
+    expected_program = Parser(Lexer(input)).parse_program()
+
+    parser = Parser(StreamLexer(io.StringIO(input), chunk_size=4))
+    program = parser.parse_program()
+    assert_no_parse_errors(parser)
+    assert f"{program}" == f"{expected_program}"
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_parse_from_token_stream():
+    input = """
+        let add = fn(x, y) { x + y; };
+        let result = add(five * 10, "string");
+        if (result == 10) { return [1, 2][0]; }
+    """
+
+    expected_program = Parser(Lexer(input)).parse_program()
+
+    parser = Parser(TokenStream.from_source(input))
+    program = parser.parse_program()
+    assert_no_parse_errors(parser)
+    assert f"{program}" == f"{expected_program}"
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+@pytest.mark.parametrize("parser_class", [Parser, StackParser])
+@pytest.mark.parametrize("make_lexer", [Lexer, TokenStream.from_source])
+def test_parse_function_bodies_lazily(parser_class, make_lexer):
+    input = """
+        let add = fn(x, y) { x + y; };
+        let apply = fn(f) { fn(x) { if (x > 0) { f(x) } else { {"a": 1} } } };
+        let empty = fn() {};
+        apply(add)(1);
+    """
+
+    expected_program = Parser(make_lexer(input)).parse_program()
+
+    parser = parser_class(make_lexer(input), lazy_functions=True)
+    program = parser.parse_program()
+    assert_no_parse_errors(parser)
+    assert_program_length(program, 4)
+
+    bodies = [stmt.expr.body for stmt in program.statements[:3]]
+    assert all(isinstance(body, ast.LazyBlockStatement) for body in bodies)
+    assert not any(body.parsed for body in bodies)
+
+    assert_node_type(bodies[1].statements[0], ast.Function)
+    assert bodies[1].parsed and not bodies[0].parsed
+    assert program == expected_program
+    assert f"{program}" == f"{expected_program}"
+
+    # Positions inside skipped bodies, and after them.
+    def statement_tokens(program: ast.Program):
+        nodes = [stmt.expr.body.statements[0] for stmt in program.statements[:2]]
+        nodes.append(program.statements[3])
+        return [program.positions.token(node.position) for node in nodes]
+
+    tokens = statement_tokens(program)
+    expected_tokens = statement_tokens(expected_program)
+    for tok, expected_token in zip(tokens, expected_tokens):
+        assert tok.compare(expected_token), f"expected `{expected_token}`, got `{tok}`"
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_lazy_function_body_errors():
+    input = """
+        let ok = fn(x) { x };
+        let broken = fn(x) { let = x; };
+        let nested = fn() { fn() { ) } };
+        let after = 1;
+    """
+
+    parser = Parser(Lexer(input), lazy_functions=True)
+    program = parser.parse_program()
+    assert_no_parse_errors(parser)
+    assert_program_length(program, 4)
+
+    with pytest.raises(DeferredParseError) as exc_info:
+        program.statements[1].expr.body.statements
+    assert exc_info.value.error.line == 3
+
+    parser = Parser(Lexer(input), lazy_functions=True, validate=True)
+    program = parser.parse_program()
+    assert [error.line for error in parser.errors] == [3, 4]
+    assert f"{program.statements[0]}" == "let ok = fn(x) {x}"
+
+
 def assert_no_parse_errors(parser: Parser):
     assert not parser.errors, f"expected no errors, got '{parser.errors}'"
 
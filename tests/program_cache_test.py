@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+from lexer import Lexer
+import abstract_syntaxt_tree as ast
+from object import Environment
+from program_cache import ProgramCache, copy_program, program_size
+from resolver import resolve
+from tiny_parser import Parser
+from vm import VM
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_program_cache_hit_and_miss():
+    input = 'let add = fn(x, y) { x + y; }; add(1, "two"); let = 1;'
+    cache = ProgramCache()
+
+    first = cache.parse(input)
+    second = cache.parse(input)
+    assert second.errors is first.errors
+    assert second.program is first.program
+
+    parser = Parser(Lexer(input))
+    program = parser.parse_program()
+    assert f"{first.program}" == f"{program}"
+    assert list(first.errors) == parser.errors
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["entries"] == 1
+    assert stats["bytes"] == first.size > program_size(program.statements[0])
+
+    assert cache.get(input + " ") is None
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_program_cache_programs_are_copied_before_resolving():
+    input = "let f = fn(x) { let g = fn() { x }; g() }; f(1) + 1"
+    cache = ProgramCache()
+
+    for _ in range(2):
+        program = resolve(copy_program(cache.parse(input).program))
+        function = program.statements[0].expr
+        assert function.layout is not None
+        assert function.paramters[0].scope == ast.CELL
+    assert f"{VM().eval(cache.parse(input).program, Environment())!r}" == "2"
+
+    cached = cache.parse(input).program
+    assert cached is next(iter(cache.entries.values())).program
+    function = cached.statements[0].expr
+    assert function.layout is None
+    assert function.paramters[0].scope == ast.UNRESOLVED
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_program_cache_clear():
+    cache = ProgramCache(max_entries=1)
+    cache.parse("let a = 1;")
+    cache.parse("let a = 1;")
+    cache.parse("let b = 2;")
+
+    cache.clear()
+    assert cache.stats() == {
+        "hits": 0,
+        "misses": 0,
+        "evictions": 0,
+        "entries": 0,
+        "bytes": 0,
+        "hit_rate": 0.0,
+    }
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_program_cache_evicts_least_recently_used():
+    inputs = [f"let a{i} = {i};" for i in range(4)]
+    cache = ProgramCache(max_entries=3)
+
+    parsed = [cache.parse(input) for input in inputs[:3]]
+    # Use the oldest entry so that the second one becomes least recently used.
+    cache.parse(inputs[0])
+    cache.parse(inputs[3])
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.get(inputs[1]) is None
+    assert cache.get(inputs[0]).errors is parsed[0].errors
+    assert cache.get(inputs[2]).errors is parsed[2].errors
+
+    # Looking entries up refreshes them too, leaving the fourth one the oldest.
+    cache.max_bytes = cache.stats()["bytes"]
+    cache.parse(inputs[1])
+    assert cache.stats()["entries"] == 3
+    assert cache.get(inputs[3]) is None
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_program_cache_shared_between_threads():
+    inputs = [f"let a{i} = {i} * {i};" for i in range(20)]
+    expected = [f"let a{i} = ({i} * {i})" for i in range(20)]
+    cache = ProgramCache(max_entries=10)
+    failures = []
+
+    def work(seed: int):
+        for i in range(200):
+            index = (seed * 7 + i) % len(inputs)
+            if f"{cache.parse(inputs[index]).program}" != expected[index]:
+                failures.append(inputs[index])
+
+    threads = [threading.Thread(target=work, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not failures
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == 8 * 200
+    assert stats["entries"] == 10
+    assert stats["bytes"] == sum(parsed.size for parsed in cache.entries.values())
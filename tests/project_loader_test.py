@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from lexer import Lexer
+from project_loader import SourceFile, find_sources, load_project
+from tiny_parser import Parser
+
+SOURCES = {
+    "main.tiny": 'let add = fn(x, y) { x + y; };\nlet result = add(1, "two");',
+    "lib/math.tiny": "let square = fn(x) { x * x };\nif (1 < 2) { 3 } else { 4 }",
+    "lib/broken.tiny": "let ok = 1;\nlet = 2;\nlet also_ok = [1, 2][0];",
+    "lib/notes.txt": "not a source file",
+}
+
+
+@pytest.fixture
+def project_dir(tmp_path):
+    for name, source in SOURCES.items():
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(source, encoding="utf-8")
+    return tmp_path
+
+
+def assert_matches_serial_parse(project, paths):
+    assert [file.path for file in project.files] == paths
+
+    expected_errors = []
+    for file in project.files:
+        with open(file.path, encoding="utf-8") as f:
+            parser = Parser(Lexer(f.read()))
+        program = parser.parse_program()
+
+        assert f"{file.program}" == f"{program}"
+        assert file.errors == parser.errors
+        expected_errors.extend((file.path, error) for error in parser.errors)
+
+    assert project.errors == expected_errors
+    assert project.errors[0][0].endswith("broken.tiny")
+    assert set(project.timings()) == set(paths)
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_find_sources(project_dir):
+    paths = find_sources(str(project_dir))
+    assert [path[len(str(project_dir)) + 1 :] for path in paths] == [
+        "lib/broken.tiny",
+        "lib/math.tiny",
+        "main.tiny",
+    ]
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+@pytest.mark.parametrize("min_size", [0, 1 << 30])
+def test_load_project(project_dir, min_size):
+    paths = find_sources(str(project_dir))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        project = load_project(paths, 2, executor, min_size=min_size)
+
+    assert_matches_serial_parse(project, paths)
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_load_project_with_process_pool(project_dir):
+    paths = find_sources(str(project_dir))
+    project = load_project(paths, workers=2, min_size=0, positions=True)
+
+    assert_matches_serial_parse(project, paths)
+    program = project.files[2].program
+    assert program.positions.line_column(program.statements[1].position)[0] == 2
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_source_file_with_invalid_data():
+    file = SourceFile("bad.tiny", [], 0.0, data=b"not a program")
+
+    for _ in range(2):
+        with pytest.raises(ValueError, match="bad.tiny: serialized program is invalid"):
+            file.program
@@ -0,0 +1,135 @@
+import abstract_syntaxt_tree as ast
+import eval
+import pytest
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment
+from resolver import resolve
+from tiny_parser import Parser
+
+eval.DEBUG = False
+
+
+def parse(input: str, **options) -> ast.Program:
+    parser = Parser(Lexer(input), **options)
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
+
+
+def evaluate(program: ast.Program) -> str:
+    return f"{Evaluator().eval(program, Environment())!r}"
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize(
+    "input, expected",
+    [
+        ("let add = fn(a, b) { a + b }; add(1, 2)", "3"),
+        ("let f = fn(a) { let b = a * 2; return b + 1; }; f(5)", "11"),
+        (
+            "let adder = fn(a) { fn(b) { fn(c) { a + b + c } } }; adder(1)(2)(3)",
+            "6",
+        ),
+        ("let x = 10; let f = fn(a) { a + x }; f(1)", "11"),
+        # Used before its `let`, then the local one.
+        ("let x = 1; let f = fn() { let y = x; let x = 5; y + x }; f()", "6"),
+        # A closure sees a `let` of its enclosing function that runs later.
+        ("let f = fn() { let g = fn() { y }; let y = 2; g() }; f()", "2"),
+        ("let f = fn(c) { if (c) { let v = 1; } v }; let v = 7; f(false)", "7"),
+        ("let f = fn(c) { if (c) { let v = 1; } v }; let v = 7; f(true)", "1"),
+        ("let f = fn(a, a) { a }; f(1, 2)", "2"),
+        ("let f = fn(a, b) { b }; let b = 3; f(1)", "3"),
+        ("let f = fn(a) { a }; f(1, 2, 3)", "1"),
+        (
+            "let fact = fn(n) { if (n < 2) { 1 } else { n * fact(n - 1) } }; fact(10)",
+            "3628800",
+        ),
+        ("let f = fn() { g() }; let g = fn() { 4 }; f()", "4"),
+        (
+            "let f = fn() { 1 }; f(1 + true)",
+            "ERROR: type mismatch, got 'IntegerObject' and 'BooleanObject'",
+        ),
+        ("5()", "ERROR: not a function: 'IntegerObject'"),
+    ],
+)
+def test_resolved_program_evaluates_like_unresolved(input, expected):
+    assert evaluate(parse(input)) == expected
+    assert evaluate(resolve(parse(input))) == expected
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_resolve_annotates_identifiers():
+    program = resolve(
+        parse("let g = 1; let f = fn(a, u) { let b = a; fn(c) { a + b + c + g } }")
+    )
+
+    function = program.statements[1].expr
+    assert function.layout.names == ("a", "u", "b")
+    assert function.layout.cells == (0, 2)
+    a_param, u_param = function.paramters
+    assert (a_param.scope, a_param.slot) == (ast.CELL, 0)
+    assert (u_param.scope, u_param.slot) == (ast.LOCAL, 1)
+    let_b = function.body.statements[0]
+    assert (let_b.ident.scope, let_b.ident.slot) == (ast.CELL, 2)
+
+    inner = function.body.statements[1]
+    # Only the variables the body uses are captured, not `u`.
+    assert inner.layout.names == ("c",)
+    assert inner.layout.captures == (0, 2)
+    # ((a + b) + c) + g
+    abc, g = inner.body.statements[0].left_expr, inner.body.statements[0].right_expr
+    (a, b), c = (abc.left_expr.left_expr, abc.left_expr.right_expr), abc.right_expr
+    assert (a.scope, a.slot) == (ast.FREE, 0)
+    assert (b.scope, b.slot) == (ast.FREE, 1)
+    assert (c.scope, c.slot) == (ast.LOCAL, 0)
+    assert g.scope == ast.UNRESOLVED
+    assert program.statements[0].ident.scope == ast.UNRESOLVED
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_closures_share_captured_variables():
+    program = resolve(parse("""
+            let f = fn(a) {
+                let g = fn() { fn() { a + b } };
+                let h = g();
+                let b = 10;
+                h()
+            };
+            f(1)
+            """))
+
+    inner_function = program.statements[0].expr.body.statements[0].expr
+    # `g` captures `a` and `b` only to pass them on to the function it returns.
+    assert len(inner_function.layout.captures) == 2
+    assert evaluate(program) == "11"
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_resolve_leaves_unparsed_bodies_to_lookups_by_name():
+    source = "let f = fn(a) { let g = fn(b) { a + b }; g(2) }; f(1)"
+    program = resolve(parse(source, lazy_functions=True))
+
+    assert program.statements[0].expr.layout is None
+    assert evaluate(program) == "3"
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_resolve_rejects_shared_nodes():
+    program = parse(
+        "let f = fn(a) { a * 2 }; let g = fn(a) { a * 2 };", intern_nodes=True
+    )
+    with pytest.raises(ValueError):
+        resolve(program)
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_unparsable_lazy_body_evaluates_to_error():
+    program = parse("let f = fn() { let = 1 }; f()", lazy_functions=True)
+    assert evaluate(program).startswith("ERROR: ")
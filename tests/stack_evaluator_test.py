@@ -0,0 +1,111 @@
+import pytest
+from eval import Evaluator
+from helpers import evaluate, parse
+from object import Environment
+from resolver import resolve
+from stack_evaluator import StackEvaluator
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize(
+    "input",
+    [
+        "",
+        "5",
+        "-5 + 10 * 2 - 3 / 2",
+        '"a" + "b" == "ab"',
+        "!0 == !!true",
+        "1 < 2 != 2 > 1",
+        "if (1 > 2) { 10 }",
+        "if (0) { 10 } else { 20 }",
+        "if (true) { }",
+        "let x = 1;",
+        "let x = 1; x",
+        "y",
+        "return 1; 2",
+        "if (true) { return 3; } 4",
+        "-true",
+        '!"a"',
+        "1 + true",
+        "true + false",
+        "true - false",
+        '"a" * "b"',
+        "let f = fn() { let x = 1; }; 1 + f()",
+        "-(2 + true)",
+        "5()",
+        "let f = fn() { 1 }; f(1 + true)",
+        "let f = fn(a, b) { a + b }; f(1, 2)",
+        "let f = fn(a, b) { b }; let b = 3; f(1)",
+        "let f = fn(a) { a }; f(1, 2, 3)",
+        "let f = fn() { if (true) { return 1; } 2 }; f()",
+        "let f = fn() { }; f()",
+        "let adder = fn(a) { fn(b) { fn(c) { a + b + c } } }; adder(1)(2)(3)",
+        "let x = 1; let f = fn() { let y = x; let x = 5; y + x }; f()",
+        "let f = fn() { let g = fn() { y }; let y = 2; g() }; f()",
+        "let f = fn(c) { if (c) { let v = 1; } v }; let v = 7; f(false)",
+        "let f = fn(c) { if (c) { let v = 1; } v }; let v = 7; f(true)",
+        "let f = fn(x) { fn() { let y = x; let x = 3; y } }; f(2)()",
+        "let f = fn(a, a) { a }; f(1, 2)",
+        "let f = fn() { g() }; let g = fn() { 4 }; f()",
+        "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(15)",
+        "[1, 2 * 3, 4 + 5][1]",
+        '{"a": 1, 2: "b", true: 3}',
+        '{"a": 1}[[1]]',
+        "[1, true + 1]",
+        "5[0]",
+        "let f = fn() { let x = 1; }; let g = fn() { f() }; g()",
+        "let f = fn(n) { if (n > 0) { return f(n - 1); } 7 }; 1 + f(3)",
+        "let f = fn(c) { if (c) { if (c) { return 2; } 5 } 3 }; f(true) + f(false)",
+        "if (true) { return 1 + 2; } 5",
+        "let f = fn(a) { a }; return f(3);",
+        '!-1; !!"a"',
+    ],
+)
+def test_stack_evaluator_evaluates_like_evaluator(input):
+    expected = evaluate(Evaluator(), parse(input))
+    assert evaluate(StackEvaluator(), parse(input)) == expected
+    assert evaluate(StackEvaluator(), resolve(parse(input))) == expected
+    assert evaluate(StackEvaluator(), parse(input, lazy_functions=True)) == expected
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize("resolved", [False, True])
+def test_stack_evaluator_nests_calls_without_recursion(resolved):
+    source = (
+        "let count = fn(n) { if (n == 0) { 0 } else { 1 + count(n - 1) } }; "
+        "count(20000)"
+    )
+    program = resolve(parse(source)) if resolved else parse(source)
+    assert f"{StackEvaluator().eval(program, Environment())!r}" == "20000"
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_stack_evaluator_overflows_at_max_depth():
+    source = "let count = fn(n) { if (n == 0) { 0 } else { 1 + count(n - 1) } }; "
+    evaluator = StackEvaluator(max_depth=100)
+    assert f"{evaluator.eval(parse(source + 'count(99)'), Environment())!r}" == "99"
+    assert f"{evaluator.eval(parse(source + 'count(100)'), Environment())!r}" == (
+        "ERROR: stack overflow, calls nest deeper than 100"
+    )
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_stack_evaluator_tail_calls_do_not_nest():
+    source = (
+        "let sum = fn(n, acc) { if (n == 0) { return acc; } sum(n - 1, acc + n) }; "
+        "let count = fn(n) { if (n > 0) { return count(n - 1); } n }; "
+        "sum(1000, 0) + count(1000)"
+    )
+    evaluator = StackEvaluator(max_depth=10)
+    assert f"{evaluator.eval(parse(source), Environment())!r}" == "500500"
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_stack_evaluator_returns_from_within_expressions():
+    program = parse("let f = fn() { return 1 + if (true) { return 2; } }; f()")
+    assert f"{StackEvaluator().eval(program, Environment())!r}" == "2"
@@ -0,0 +1,67 @@
+import random
+import sys
+
+import pytest
+from lexer import Lexer
+from stack_parser import StackParser
+from tiny_parser import Parser
+
+PROGRAMS = [
+    "-a * b + c / d - e",
+    "5 > 4 == 3 < 4; !(true == true)",
+    "a + add(b * c, [1, 2][0]) + d",
+    "let add = fn(x, y) { x + y; }; add(1, 2)",
+    'if (x < y) { return x; } else { "y" }',
+    '{"one": 1, "two": 2}; {}',
+    "let = 5; let x 5; ) + 1; let y = 2;",
+    "[1, 2 * 3, fn(x) { x }][(1 + 1)]",
+]
+
+# Tokens from which random, mostly malformed, programs are assembled.
+PIECES = [
+    "let", "x", "=", "1", "true", '"s"', "+", "-", "*", "/", "<", ">", "==",
+    "!=", "!", "(", ")", "[", "]", "{", "}", ":", ",", ";", "fn", "if", "else",
+    "return",
+]  # fmt: skip
+
+
+def parse(parser_class, input):
+    parser = parser_class(Lexer(input))
+    try:
+        program = parser.parse_program()
+    except Exception as exc:
+        return type(exc)
+    return f"{program}", parser.errors
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+@pytest.mark.parametrize("input", PROGRAMS)
+def test_stack_parser_matches_parser(input):
+    assert parse(StackParser, input) == parse(Parser, input)
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_stack_parser_matches_parser_on_random_input():
+    rng = random.Random(8)
+    for _ in range(2000):
+        input = " ".join(rng.choice(PIECES) for _ in range(rng.randrange(1, 25)))
+        assert parse(StackParser, input) == parse(Parser, input), input
+
+
+@pytest.mark.sanity
+@pytest.mark.parser
+def test_stack_parser_deep_nesting():
+    depth = sys.getrecursionlimit() * 10
+    input = "-(" * depth + "1" + ")" * depth
+
+    parser = StackParser(Lexer(input))
+    program = parser.parse_program()
+    assert not parser.errors
+
+    node = program.statements[0]
+    for _ in range(depth):
+        assert node.operator == "-"
+        node = node.expr
+    assert node.value == 1
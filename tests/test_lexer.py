@@ -1,5 +1,8 @@
+import io
+import mmap
+
 import pytest
-from lexer import Lexer, Token, TokenType
+from lexer import CharLexer, Lexer, StreamLexer, Token, TokenStream, TokenType
 
 
 @pytest.mark.sanity
@@ -214,3 +217,119 @@ let result = add(five, ten);
     for expected_token in tokens:
         tok = lexer.next_token()
         assert tok.compare(expected_token), f"expected `{expected_token}`, got `{tok}`"
+
+
+@pytest.mark.sanity
+@pytest.mark.lexer
+def test_lexer_matches_char_lexer():
+    input = """
+let five = 5;
+let add = fn(x, y) {
+    x + y;
+};
+let result = add(five, 10);
+!-/*5; 5 < 10 > 5;
+if (5 < 10) { return true; } else { return false; }
+10 == 10; 10 != 9; a!=b; c==d; !x; y = z;
+[1, 2]; {"foo": "bar"}; "multi
+line string"; after_string;
+	tabbed;
+"""
+
+    lexer = Lexer(input)
+    char_lexer = CharLexer(input)
+
+    while True:
+        expected_token = char_lexer.next_token()
+        tok = lexer.next_token()
+        assert tok.compare(expected_token), f"expected `{expected_token}`, got `{tok}`"
+        if expected_token.token_type == TokenType.Eof:
+            break
+
+    # Both lexers keep producing EOF tokens when asked to read past the end.
+    for _ in range(3):
+        assert lexer.next_token().compare(char_lexer.next_token())
+
+
+@pytest.mark.sanity
+@pytest.mark.lexer
+def test_illegal_characters():
+    lexer = Lexer('let a = 5 $ 3; "unterminated')
+
+    tokens = [
+        Token(1, 1, TokenType.Let),
+        Token(1, 5, TokenType.Ident, "a"),
+        Token(1, 7, TokenType.Assign),
+        Token(1, 9, TokenType.Int, "5"),
+        Token(1, 11, TokenType.Illegal, "$"),
+        Token(1, 13, TokenType.Int, "3"),
+        Token(1, 14, TokenType.Semicolon),
+        Token(1, 16, TokenType.Illegal, '"'),
+        Token(1, 17, TokenType.Ident, "unterminated"),
+        Token(1, 29, TokenType.Eof),
+    ]
+
+    for expected_token in tokens:
+        tok = lexer.next_token()
+        assert tok.compare(expected_token), f"expected `{expected_token}`, got `{tok}`"
+
+
+STREAM_INPUT = """
+let greeting = "a string literal long enough to span several chunks";
+let add = fn(first_argument, second_argument) {
+    first_argument + second_argument;
+};
+10 == 10; 10 != 9; !x; "héllo wörld";
+let result = add(12345, 67890);
+"""
+
+
+@pytest.mark.sanity
+@pytest.mark.lexer
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 4096])
+def test_stream_lexer_matches_lexer(chunk_size):
+    expected_tokens = list(Lexer(STREAM_INPUT))
+
+    for source in (
+        io.StringIO(STREAM_INPUT),
+        io.BytesIO(STREAM_INPUT.encode("utf-8")),
+    ):
+        tokens = list(StreamLexer(source, chunk_size=chunk_size))
+        assert len(tokens) == len(expected_tokens)
+        for tok, expected_token in zip(tokens, expected_tokens):
+            assert tok.compare(
+                expected_token
+            ), f"expected `{expected_token}`, got `{tok}`"
+
+
+@pytest.mark.sanity
+@pytest.mark.lexer
+def test_stream_lexer_over_mmap(tmp_path):
+    path = tmp_path / "source.tiny"
+    path.write_text(STREAM_INPUT, encoding="utf-8")
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        tokens = list(StreamLexer(m, chunk_size=5))
+
+    expected_tokens = list(Lexer(STREAM_INPUT))
+    assert len(tokens) == len(expected_tokens)
+    for tok, expected_token in zip(tokens, expected_tokens):
+        assert tok.compare(expected_token), f"expected `{expected_token}`, got `{tok}`"
+
+
+@pytest.mark.sanity
+@pytest.mark.lexer
+def test_token_stream_matches_lexer():
+    input = STREAM_INPUT + '$ "" "unterminated'
+    stream = TokenStream.from_source(input)
+    expected_tokens = list(Lexer(input))
+
+    assert len(stream) == len(expected_tokens)
+    for index, expected_token in enumerate(expected_tokens):
+        tok = stream[index]
+        assert tok.compare(expected_token), f"expected `{expected_token}`, got `{tok}`"
+
+    reader = stream.reader()
+    lexer = Lexer(input)
+    for _ in range(len(expected_tokens) + 3):
+        assert reader.next_token().compare(lexer.next_token())
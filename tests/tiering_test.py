@@ -0,0 +1,161 @@
+import helpers
+import pytest
+import sys
+from eval import Evaluator
+from object import Environment
+from resolver import resolve
+from tiering import TieredEvaluator
+
+
+def parse(input: str):
+    return resolve(helpers.parse(input))
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize("threshold", [1, 3, 1000])
+@pytest.mark.parametrize(
+    "input",
+    [
+        "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(12)",
+        "let sum = fn(n, acc) { if (n == 0) { return acc; } sum(n - 1, acc + n) }; "
+        "sum(50, 0)",
+        'let f = fn(s, n) { if (n == 0) { s } else { f(s + "a", n - 1) } }; f("", 5)',
+        "let adder = fn(a) { fn(b) { a + b } }; let g = fn(n) { if (n == 0) { 0 } "
+        "else { adder(n)(1) + g(n - 1) } }; g(10)",
+        "let f = fn(n) { if (n == 0) { true + 1 } else { f(n - 1) } }; f(5)",
+        "let f = fn(a) { a }; f(1) + f(true)",
+    ],
+)
+def test_tiered_evaluation_is_the_same_as_interpreting(input, threshold):
+    expected = f"{Evaluator().eval(parse(input), Environment())!r}"
+    evaluator = TieredEvaluator(threshold=threshold)
+    assert f"{evaluator.eval(parse(input), Environment())!r}" == expected
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_hot_functions_are_promoted():
+    source = "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };"
+    env = Environment()
+    evaluator = TieredEvaluator(threshold=5)
+    evaluator.eval(parse(source), env)
+
+    evaluator.eval(parse("fib(2)"), env)
+    fib = env.get("fib")
+    # One call from the program, and two recursive ones.
+    assert (fib.invocations, fib.iterations) == (1, 2)
+    assert fib.compiled is None
+
+    assert f"{evaluator.eval(parse('fib(15)'), env)!r}" == "610"
+    assert fib.compiled is not None
+    stats = evaluator.stats()
+    assert stats["python_promotions"] == 1
+    assert stats["interpreted_calls"] == 4
+    # fib(15) is interpreted, and calls fib(14) and fib(13) in Python, which
+    # run the rest of the calls.
+    assert stats["compiled_calls"] == 2
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_functions_that_cannot_be_transpiled_are_compiled_to_closures():
+    source = 'let f = fn(n) { if (n == 0) { "" } else { f(n - 1) + "a" } }; f(5)'
+    evaluator = TieredEvaluator(threshold=2)
+    assert f"{evaluator.eval(parse(source), Environment())!r}" == "aaaaa"
+    assert evaluator.stats()["closure_promotions"] == 1
+    assert evaluator.stats()["python_promotions"] == 0
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_failed_guards_deoptimize():
+    env = Environment()
+    evaluator = TieredEvaluator(threshold=1, max_deoptimizations=2)
+    evaluator.eval(parse("let x = 1; let f = fn(a) { a + x };"), env)
+    f = env.get("f")
+
+    assert f"{evaluator.eval(parse('f(1)'), env)!r}" == "2"
+    assert evaluator.stats()["python_promotions"] == 1
+
+    evaluator.eval(parse('let x = "a";'), env)
+    assert f"{evaluator.eval(parse('f(1)'), env)!r}" == (
+        "ERROR: type mismatch, got 'IntegerObject' and 'StringObject'"
+    )
+    assert evaluator.stats()["deoptimizations"] == 1
+    assert f.compiled is None and f.deoptimizations == 1
+
+    # Promoted again, and deoptimized again.
+    evaluator.eval(parse("f(1)"), env)
+    assert evaluator.stats()["python_promotions"] == 2
+    assert evaluator.stats()["deoptimizations"] == 2
+
+    # No longer transpiled to Python.
+    evaluator.eval(parse("let x = 3;"), env)
+    assert f"{evaluator.eval(parse('f(1)'), env)!r}" == "4"
+    assert evaluator.stats()["closure_promotions"] == 1
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_tail_calls_are_counted():
+    source = "let loop = fn(n) { if (n > 0) { loop(n - 1) } else { n } }; loop(3)"
+    env = Environment()
+    evaluator = TieredEvaluator(threshold=1000)
+    assert f"{evaluator.eval(parse(source), env)!r}" == "0"
+    loop = env.get("loop")
+    # Tail calls are made after the caller returned, and still count as
+    # iterations of the loop.
+    assert (loop.invocations, loop.iterations) == (1, 3)
+    assert evaluator.stats()["interpreted_calls"] == 4
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize("resolved", [False, True])
+@pytest.mark.parametrize(
+    "input, expected",
+    [
+        (
+            "let loop = fn(n, acc) { if (n == 0) { return acc; } "
+            "loop(n - 1, acc + 1) }; loop({n}, 0)",
+            "{n}",
+        ),
+        (
+            'let loop = fn(n, acc) { if (n == 0) { return acc; } loop(n - 1, acc + "") }; '
+            'loop({n}, "a")',
+            "a",
+        ),
+        (
+            "let even = fn(n) { if (n == 0) { true } else { return odd(n - 1); } }; "
+            "let odd = fn(n) { if (n == 0) { false } else { even(n - 1) } }; even({n})",
+            "True",
+        ),
+    ],
+)
+def test_tail_call_loops_deeper_than_the_recursion_limit(input, expected, resolved):
+    # Deeper than Python's recursion limit, if the calls nested.
+    n = f"{sys.getrecursionlimit() * 5}"
+    source = input.replace("{n}", n)
+    program = parse(source) if resolved else helpers.parse(source)
+    evaluator = TieredEvaluator()
+    assert f"{evaluator.eval(program, Environment())!r}" == expected.replace("{n}", n)
+    assert evaluator.stats()["compiled_calls"] == 0
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize("max_deoptimizations", [0, 3])
+def test_tail_call_loops_called_from_compiled_code(max_deoptimizations):
+    # `g` is compiled, and calls a loop deeper than Python's recursion limit.
+    n = sys.getrecursionlimit() * 5
+    source = (
+        "let loop = fn(n) { if (n == 0) { 0 } else { loop(n - 1) } }; "
+        f"let g = fn(n) {{ 1 + loop(n) }}; g(1) + g(1) + g(1) + g({n})"
+    )
+    expected = f"{Evaluator().eval(parse(source), Environment())!r}"
+    assert expected == "4"
+
+    evaluator = TieredEvaluator(threshold=2, max_deoptimizations=max_deoptimizations)
+    assert f"{evaluator.eval(parse(source), Environment())!r}" == expected
+    assert evaluator.stats()["compiled_calls"] > 0
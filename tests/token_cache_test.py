@@ -0,0 +1,107 @@
+import os
+
+import pytest
+from lexer import Lexer, TokenStream
+from token_cache import TokenCache
+
+
+@pytest.mark.sanity
+@pytest.mark.lexer
+def test_token_cache_hit_and_miss(tmp_path):
+    input = 'let add = fn(x, y) { x + y; }; add(1, "two");'
+    cache = TokenCache(str(tmp_path))
+
+    first = cache.lex(input)
+    second = cache.lex(input)
+    assert cache.stats() == {"hits": 1, "misses": 1, "writes": 1, "evictions": 0}
+
+    expected_tokens = list(Lexer(input))
+    for stream in (first, second):
+        assert len(stream) == len(expected_tokens)
+        for index, expected_token in enumerate(expected_tokens):
+            assert stream[index].compare(expected_token)
+
+    assert cache.get(input + " ") is None
+    assert cache.stats()["misses"] == 2
+
+
+@pytest.mark.sanity
+@pytest.mark.lexer
+def test_token_cache_discards_corrupted_entries(tmp_path):
+    input = "let a = 5;"
+    cache = TokenCache(str(tmp_path))
+    cache.lex(input)
+
+    with open(cache.path(input), "r+b") as f:
+        f.truncate(10)
+
+    assert cache.get(input) is None
+    assert not os.path.exists(cache.path(input))
+
+
+@pytest.mark.sanity
+@pytest.mark.lexer
+def test_token_cache_evicts_least_recently_used(tmp_path):
+    inputs = [f"let a{i} = {i};" for i in range(3)]
+    cache = TokenCache(str(tmp_path / "cache"))
+
+    for age, input in enumerate(inputs):
+        cache.put(input, TokenStream.from_source(input))
+        os.utime(cache.path(input), (1000 + age, 1000 + age))
+    entry_size = os.path.getsize(cache.path(inputs[0]))
+
+    # Touch the oldest entry so that the second one becomes least recently used.
+    assert cache.get(inputs[0]) is not None
+
+    cache.max_bytes = entry_size * 3
+    cache.put("let b = 1;", TokenStream.from_source("let b = 1;"))
+
+    assert cache.stats()["evictions"] == 1
+    assert not os.path.exists(cache.path(inputs[1]))
+    assert os.path.exists(cache.path(inputs[0]))
+    assert os.path.exists(cache.path(inputs[2]))
+
+
+@pytest.mark.sanity
+@pytest.mark.lexer
+def test_token_cache_scans_only_when_over_budget(tmp_path, monkeypatch):
+    cache = TokenCache(str(tmp_path))
+    scans = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: scans.append(1) or evict())
+
+    for i in range(5):
+        cache.lex(f"let a{i} = {i};")
+    # The first put measures the directory; later ones track its size.
+    assert len(scans) == 1
+    assert cache.size == sum(
+        os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path)
+    )
+
+    # Rewriting an entry replaces its size instead of adding to it.
+    size = cache.size
+    cache.put("let a0 = 0;", TokenStream.from_source("let a0 = 0;"))
+    assert cache.size == size
+
+    cache.max_bytes = size - 1
+    cache.lex("let b = 1;")
+    assert len(scans) == 2
+    assert cache.stats()["evictions"] == 2
+    assert cache.size <= cache.max_bytes
+
+
+@pytest.mark.sanity
+@pytest.mark.lexer
+def test_token_cache_removes_stale_temporary_files(tmp_path):
+    cache = TokenCache(str(tmp_path))
+    stale = tmp_path / "stale.tmp"
+    fresh = tmp_path / "fresh.tmp"
+    stale.write_bytes(b"partial")
+    fresh.write_bytes(b"partial")
+    os.utime(stale, (1000, 1000))
+
+    cache.evict()
+
+    assert not stale.exists()
+    # Possibly still being written by another process.
+    assert fresh.exists()
@@ -0,0 +1,129 @@
+import eval
+import pytest
+from eval import Evaluator
+from lexer import Lexer
+from object import Environment
+from resolver import resolve
+from tiny_parser import Parser
+from transpiler import GuardFailed, Transpiler
+
+eval.DEBUG = False
+
+
+def define(source: str) -> Environment:
+    parser = Parser(Lexer(source))
+    program = parser.parse_program()
+    assert not parser.errors
+    env = Environment()
+    Evaluator().eval(resolve(program), env)
+    return env
+
+
+def call(source: str, name: str, args: str) -> str:
+    env = define(source + f"; let result = {name}({args});")
+    expected = f"{env.get('result')!r}"
+
+    func = env.get(name)
+    transpiled = Transpiler().transpile_object(func)
+    assert transpiled is not None, f"{name} was not transpiled"
+    values = [define(f"let a = {arg};").get("a") for arg in args.split(", ") if arg]
+    assert f"{transpiled(values, func.env)!r}" == expected
+    return expected
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize(
+    "source, name, args, expected",
+    [
+        (
+            "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }",
+            "fib",
+            "15",
+            "610",
+        ),
+        (
+            "let sum = fn(n, acc) { if (n == 0) { return acc; } sum(n - 1, acc + n) }",
+            "sum",
+            "100, 0",
+            "5050",
+        ),
+        (
+            "let f = fn(a, b) { let c = a * b; let d = c - -a; d * 2 }",
+            "f",
+            "3, 4",
+            "30",
+        ),
+        ("let f = fn(a) { a > 1 == !false }", "f", "3", "True"),
+        ("let f = fn(a) { !a }", "f", "0", "True"),
+        ("let f = fn(a) { 1 + if (a < 0) { 0 - a } else { a } }", "f", "-3", "4"),
+        ("let x = 10; let f = fn(a) { a + x }", "f", "1", "11"),
+        ("let f = fn(a) { if (a) { return 1; } let b = 2; b }", "f", "0", "2"),
+        ("let f = fn() { let t = true; if (t) { 1 } else { 2 } }", "f", "", "1"),
+        (
+            "let g = fn(a) { a * 3 }; let f = fn(a) { g(a) + g(g(1)) }",
+            "f",
+            "2",
+            "15",
+        ),
+    ],
+)
+def test_transpiled_function_evaluates_like_evaluator(source, name, args, expected):
+    assert call(source, name, args) == expected
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize(
+    "source",
+    [
+        'let f = fn(a) { "a" }',
+        "let f = fn(a) { a / 2 }",
+        "let f = fn(a) { a + true }",
+        "let f = fn(a) { let b = 1; let b = true; a }",
+        "let f = fn(a) { if (a) { 1 } }",
+        "let f = fn(a) { let b = a; }",
+        "let f = fn(a) { }",
+        "let f = fn(a) { fn(b) { b } }",
+        "let f = fn(a) { [a][0] }",
+        "let f = fn(a) { a(1) }",
+        "let f = fn(a) { let c = b; let b = 1; c }",
+        "let f = fn(a) { if (a) { let b = 1; } b }",
+        "let f = fn(a) { fn() { a } }",
+    ],
+)
+def test_unsupported_functions_are_not_transpiled(source):
+    assert Transpiler().transpile_object(define(source).get("f")) is None
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_closures_are_not_transpiled():
+    env = define("let make = fn(a) { fn(b) { a + b } }; let add = make(1);")
+    assert Transpiler().transpile_object(env.get("add")) is None
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize(
+    "source, args",
+    [
+        # Arguments of other types, or a different number of them.
+        ("let f = fn(a) { a }", "true"),
+        ("let f = fn(a) { a }", "1, 2"),
+        # Globals that are not integers, or functions that cannot be transpiled.
+        ('let x = "a"; let f = fn(a) { a + x }', "1"),
+        ("let f = fn(a) { a + x }", "1"),
+        ("let g = 5; let f = fn(a) { g(a) }", "1"),
+        ('let g = fn(a) { "a" }; let f = fn(a) { g(a) }', "1"),
+        ("let g = fn(a) { true }; let f = fn(a) { g(a) }", "1"),
+        ("let g = fn(a, b) { a }; let f = fn(a) { g(a) }", "1"),
+    ],
+)
+def test_guards_fail_for_unexpected_values(source, args):
+    env = define(source)
+    transpiled = Transpiler().transpile_object(env.get("f"))
+    assert transpiled is not None
+    values = [define(f"let a = {arg};").get("a") for arg in args.split(", ")]
+    with pytest.raises(GuardFailed):
+        transpiled(values, env)
@@ -0,0 +1,179 @@
+import pytest
+from bytecode import compile_program, disassemble
+from eval import Evaluator
+from helpers import evaluate, parse
+from object import Environment
+from optimizer import optimize
+from vm import VM
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize(
+    "input",
+    [
+        "",
+        "5",
+        "-5 + 10 * 2 - 3 / 2",
+        '"a" + "b" == "ab"',
+        "!0 == !!true",
+        "1 < 2 != 2 > 1",
+        "if (1 > 2) { 10 }",
+        "if (0) { 10 } else { 20 }",
+        "if (true) { }",
+        "let x = 1;",
+        "let x = 1; x",
+        "y",
+        "return 1; 2",
+        "if (true) { return 3; } 4",
+        "-true",
+        '!"a"',
+        "1 + true",
+        "true + false",
+        "true - false",
+        '"a" * "b"',
+        "let f = fn() { let x = 1; }; 1 + f()",
+        "-(2 + true)",
+        "5()",
+        "let f = fn() { 1 }; f(1 + true)",
+        "let f = fn(a, b) { a + b }; f(1, 2)",
+        "let f = fn(a, b) { b }; let b = 3; f(1)",
+        "let f = fn(a) { a }; f(1, 2, 3)",
+        "let f = fn() { if (true) { return 1; } 2 }; f()",
+        "let f = fn() { }; f()",
+        "let adder = fn(a) { fn(b) { fn(c) { a + b + c } } }; adder(1)(2)(3)",
+        "let x = 1; let f = fn() { let y = x; let x = 5; y + x }; f()",
+        "let f = fn() { let g = fn() { y }; let y = 2; g() }; f()",
+        "let f = fn(c) { if (c) { let v = 1; } v }; let v = 7; f(false)",
+        "let f = fn(c) { if (c) { let v = 1; } v }; let v = 7; f(true)",
+        "let f = fn(x) { fn() { let y = x; let x = 3; y } }; f(2)()",
+        "let f = fn(a, a) { a }; f(1, 2)",
+        "-fn() { 1 }",
+        "fn() { 1 } + true",
+        "fn() { 1 } == fn() { 1 }",
+        "let c = [1]; c[fn() { 1 }]",
+        "{1: 2}[fn() { 1 }]",
+        "fn() { 1 }[0]",
+        "let f = fn() { g() }; let g = fn() { 4 }; f()",
+        "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(15)",
+        'let f = fn(s) { s + "b" + "c" }; f("a")',
+        'let f = fn(s) { s - 1 }; f("a")',
+        'let f = fn(a) { a + "b" }; f(1)',
+        "let f = fn(a) { 2 + a - 1 }; f(true)",
+        'let f = fn(a) { if (a == 1) { "one" } else { "other" } }; f(true)',
+        'let f = fn(a, b) { if (a == b) { "same" } else { "other" } }; f("x", "x")',
+        "let f = fn() { if (x < 1) { let x = 0; x } else { x } }; let x = 5; f()",
+        "let f = fn(a) { (if (a) { a } else { 0 }) + 1 }; f(2) + f(false)",
+        "let f = fn(a, b) { b }; let g = fn() { f(1) }; let b = 3; g()",
+        "let f = fn(n) { if (n > 0) { f(n - 1) } }; f(3)",
+    ],
+)
+def test_vm_evaluates_like_evaluator(input):
+    expected = evaluate(Evaluator(), parse(input))
+    assert evaluate(VM(), parse(input)) == expected
+    assert evaluate(VM(), optimize(parse(input))) == expected
+    assert evaluate(VM(), parse(input, lazy_functions=True)) == expected
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+@pytest.mark.parametrize(
+    "input, expected",
+    [
+        ("[1, 2 * 3, 4 + 5]", "[1, 6, 9]"),
+        ("[]", "[]"),
+        ("[1, 2, 3][1]", "2"),
+        ("let a = [1, 2]; a[0] + a[1]", "3"),
+        ("[1, 2][2]", "null"),
+        ("[1, 2][-1]", "null"),
+        ('{"a": 1, 2: "b", true: 3}', "{a: 1, 2: b, True: 3}"),
+        ('{"a": 1}["a"]', "1"),
+        ('{"a": 1}["b"]', "null"),
+        ('{1: 1, "1": 2}["1"]', "2"),
+        ('let f = fn(k) { {"x": k * 2}["x"] }; f(4)', "8"),
+        ('{"a": 1}[[1]]', "ERROR: unusable as hash key: 'ArrayObject'"),
+        (
+            "5[0]",
+            "ERROR: index operator not supported: 'IntegerObject' and "
+            "'IntegerObject'",
+        ),
+    ],
+)
+def test_vm_evaluates_arrays_and_hashes(input, expected):
+    assert f"{VM().eval(parse(input), Environment())!r}" == expected
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_vm_unparsable_lazy_body_evaluates_to_error():
+    program = parse("let f = fn() { let = 1 }; f()", lazy_functions=True)
+    expected = f"{Evaluator().eval(program, Environment())!r}"
+    res = f"{VM().eval(program, Environment())!r}"
+    assert res == expected
+    assert res.startswith("ERROR: ")
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_vm_calls_nest_without_recursion():
+    source = "let count = fn(n) { if (n == 0) { 0 } else { 1 + count(n - 1) } }; "
+    assert f"{VM().eval(parse(source + 'count(20000)'), Environment())!r}" == "20000"
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_vm_keeps_globals_in_environment():
+    env = Environment()
+    vm = VM()
+    vm.eval(parse("let x = 2; let double = fn(a) { a * x };"), env)
+    assert f"{vm.eval(parse('double(21)'), env)!r}" == "42"
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_disassemble():
+    bytecode = compile_program(parse("let x = fn(a) { if (a) { a } }; x(1)"))
+    assert disassemble(bytecode) == "\n".join(
+        [
+            "main:",
+            "  0000 CLOSURE        1 (fn#1(a))",
+            "  0002 SET_GLOBAL     0 (x)",
+            "  0004 GET_GLOBAL     0 (x)",
+            "  0006 CONSTANT       2 (1)",
+            "  0008 CALL           1",
+            "  0010 RETURN",
+            "",
+            "fn#1(a):",
+            "  0000 GET_LOCAL      0 (a)",
+            "  0002 JUMP_IF_FALSE  8",
+            "  0004 GET_LOCAL      0 (a)",
+            "  0006 RETURN",
+            "  0008 NULL",
+            "  0010 RETURN",
+        ]
+    )
+
+
+@pytest.mark.sanity
+@pytest.mark.eval
+def test_disassemble_fused_instructions():
+    source = "let f = fn(n) { if (n < 1) { return 0; } f(n - 1) }; f(3)"
+    disassembly = disassemble(compile_program(parse(source)))
+    assert disassembly.split("\n\n")[1].splitlines() == [
+        "fn#3(n):",
+        "  0000 LOCAL_CONSTANT_JUMP 0 (n)",
+        "  0002 CONSTANT       1 (1)",
+        "  0004 JUMP_IF_NOT_LT",
+        "  0006 JUMP_IF_FALSE  18",
+        "  0008 CONSTANT       2 (0)",
+        "  0010 RETURN",
+        "  0012 JUMP           16",
+        "  0014 NULL",
+        "  0016 POP",
+        "  0018 GET_GLOBAL     0 (f)",
+        "  0020 LOCAL_CONSTANT_OP 0 (n)",
+        "  0022 CONSTANT_OP    1 (1)",
+        "  0024 SUB",
+        "  0026 TAIL_CALL      1",
+        "  0028 RETURN",
+    ]